@@ -0,0 +1,368 @@
+"""
+Module used to derive season level stats locally from the game level rows written by main.write_game_stats.
+
+Team season stats and ranks are aggregated from game_stats_teams rows with vectorized groupbys instead of
+requesting every team's stats from the api, so seasons that have already been scraped can be recomputed
+instantly. Columns match the team_season_stats and team_season_ranks tables written from the api:
+    team rows - record, points, goals, shots, powerplay, penalty kill, shooting and save percentages.
+    event rows (optional) - even strength goal ratio and win % when scoring first or leading after a period.
+    player rows (optional) - faceoffs.
+Player season stats are aggregated the same way from the boxscore rows of game_stats_players, giving the
+'Full Season', 'Home', and 'Away' rows of player_season_stats without a request per player:
+    player rows - games, time on ice, goals, assists, points, shots, hits, blocks, penalties, faceoffs.
+    event rows (optional) - game winning and overtime goals.
+Stats needing rows that weren't given are left out. Like the api, only regular season games are counted.
+
+Usage:
+    team_df = sinks.load_table('nhl_stats.db', 'game_stats_teams', 'sqlite', seasons=[20152016])
+    stats_df = team_season_stats(team_df)
+    ranks_df = team_season_ranks(stats_df)
+    player_stats_df = player_season_stats(player_df)
+"""
+
+import numpy as np
+import pandas as pd
+
+import utils
+
+GAME_TYPE = 'Regular Season'
+# regular season shootouts are recorded as a fifth period, their goals aren't counted
+SHOOTOUT_PERIOD = 5
+# stats ranked with the lowest value 1st
+ASCENDING_RANKS = ['Losses', 'OTL', 'GA Per Game', 'Powerplay GA', 'Shots Allowed', 'Faceoffs Lost']
+
+_GAME_KEY = ['Season', 'Game Type', 'Game Number']
+_TEAM_KEY = _GAME_KEY + ['Team']
+_TEAM_COLS = ['Goals', 'Shots', 'Powerplay Goals', 'Powerplays', 'Final Goals', 'Final Period', 'Shootout']
+_PLAYER_COLS = ['Goals', 'Assists', 'Shots', 'Hits', 'Powerplay Goals', 'Powerplay Assists', 'Shorthanded Goals',
+                'Shorthanded Assists', 'PIMs', 'Blocked Shots', 'Plus Minus', 'Faceoff Win']
+# boxscore time on ice columns and the per game column of each in player_season_stats
+_PLAYER_TOI_COLS = {
+    'TOI': 'TOI per Game',
+    'Even Strength TOI': 'ES TOI per Game',
+    'SH TOI': 'SH TOI per Game',
+    'Powerplay TOI': 'Powerplay TOI per Game',
+}
+# boxscore columns each player_season_stats column is derived from if not the column of the same name,
+# stats of missing columns are left out
+_PLAYER_STAT_SOURCES = {
+    'Games': [],
+    'PIM': ['PIMs'],
+    'Powerplay Points': ['Powerplay Goals', 'Powerplay Assists'],
+    'Faceoff %': ['Faceoff Win'],
+    'Shot %': ['Goals', 'Shots'],
+    'Shorthanded Points': ['Shorthanded Goals', 'Shorthanded Assists'],
+    'Points': ['Goals', 'Assists'],
+    **{per_game: [col] for col, per_game in _PLAYER_TOI_COLS.items()},
+}
+
+
+def _numeric(df, cols):
+    # columns read back from xlsx or sqlite can be objects or 0/1 flags
+    return df[cols].apply(pd.to_numeric, errors='coerce').astype(float)
+
+
+def _same(a, b):
+    # compare the values of two columns, categorical columns read back from parquet have different categories
+    return a.astype(object) == b.astype(object)
+
+
+def team_games(team_df):
+    """
+    Pair every regular season team game row with the row of the opponent in the same game.
+
+    :param team_df: game_stats_teams rows.
+    :type team_df: pd.DataFrame
+    :return: One row per team and game with 'Opp' prefixed opponent columns, goals for and against including
+        shootout winners, and Win, Loss (in regulation), and OTL flags.
+    :rtype: pd.DataFrame
+    """
+    df = team_df[team_df['Game Type'] == GAME_TYPE]
+    cols = [col for col in _TEAM_COLS if col in df.columns]
+    df = df[_TEAM_KEY + cols].reset_index(drop=True)
+    df[cols] = _numeric(df, cols)
+
+    opp = df.rename(columns={col: f'Opp {col}' for col in ['Team'] + cols})
+    games = df.merge(opp, on=_GAME_KEY)
+    games = games[~_same(games['Team'], games['Opp Team'])].reset_index(drop=True)
+
+    if 'Final Goals' in games.columns:
+        games['GF'] = games['Final Goals'].fillna(games['Goals'])
+        games['GA'] = games['Opp Final Goals'].fillna(games['Opp Goals'])
+    else:
+        games['GF'] = games['Goals']
+        games['GA'] = games['Opp Goals']
+    # games decided in overtime or a shootout give the loser a point
+    extra = pd.Series(False, index=games.index)
+    if 'Final Period' in games.columns:
+        extra |= games['Final Period'] > 3
+    if 'Shootout' in games.columns:
+        extra |= games['Shootout'] > 0
+    lost = games['GF'] < games['GA']
+    games['Win'] = games['GF'] > games['GA']
+    games['Loss'] = lost & ~extra
+    games['OTL'] = lost & extra
+    return games
+
+
+def _add_event_stats(games, event_df):
+    # flag the games each team scored first or led after the first and second periods, and count even
+    # strength goals, from the scorer row of every goal event
+    goals = event_df[(event_df['Game Type'] == GAME_TYPE) & (event_df['Event'] == 'Goal') &
+                     (event_df['Outcome'] == 'Scorer')]
+    period = pd.to_numeric(goals['Period'], errors='coerce')
+    goals = goals.assign(Period=period)[period < SHOOTOUT_PERIOD]
+    goals = goals.assign(Seconds=utils.elapsed_seconds(goals['Period'], utils.clock_to_seconds(goals['Period Time'])))
+
+    first = goals.sort_values(_GAME_KEY + ['Seconds']).drop_duplicates(_GAME_KEY)
+    first = first[_TEAM_KEY].rename(columns={'Team': 'First Goal'})
+    count_cols = ['First Period Goals', 'Second Period Goals', 'EV Goals']
+    counts = pd.DataFrame({
+        'First Period Goals': goals['Period'] <= 1,
+        'Second Period Goals': goals['Period'] <= 2,
+        'EV Goals': goals['Strength'] == 'Even' if 'Strength' in goals.columns else False,
+    }).groupby([goals[col] for col in _TEAM_KEY], observed=True).sum().reset_index()
+
+    games = games.merge(first, on=_GAME_KEY, how='left')
+    games = games.merge(counts, on=_TEAM_KEY, how='left')
+    opp_counts = counts.rename(columns={col: f'Opp {col}' for col in ['Team'] + count_cols})
+    games = games.merge(opp_counts, on=_GAME_KEY + ['Opp Team'], how='left')
+    count_cols += [f'Opp {col}' for col in count_cols]
+    games[count_cols] = games[count_cols].fillna(0)
+
+    games['Scored First'] = _same(games['First Goal'], games['Team'])
+    games['Opp Scored First'] = _same(games['First Goal'], games['Opp Team'])
+    games['Lead First'] = games['First Period Goals'] > games['Opp First Period Goals']
+    games['Lead Second'] = games['Second Period Goals'] > games['Opp Second Period Goals']
+    return games
+
+
+def _faceoffs_taken(player_df):
+    # the boxscore keeps the api's faceoffTaken spelling which isn't renamed
+    return next((col for col in ['Faceoff Taken', 'faceoffTaken'] if col in player_df.columns), None)
+
+
+def _add_faceoffs(games, player_df):
+    # faceoffs taken and won by each team's skaters
+    taken = _faceoffs_taken(player_df)
+    if taken is None or 'Faceoff Win' not in player_df.columns:
+        return games
+    df = player_df[player_df['Game Type'] == GAME_TYPE].reset_index(drop=True)
+    faceoffs = _numeric(df, ['Faceoff Win', taken]).rename(columns={'Faceoff Win': 'Faceoffs Won', taken: 'Faceoffs'})
+    faceoffs = faceoffs.groupby([df[col] for col in _TEAM_KEY], observed=True).sum().reset_index()
+    return games.merge(faceoffs, on=_TEAM_KEY, how='left')
+
+
+def _win_pct(games, flag):
+    # share of the games matching flag that were won, NaN if no games match
+    return games['Win'].astype(float).where(flag).groupby([games['Season'], games['Team']]).mean().round(3)
+
+
+def team_season_stats(team_df, event_df=None, player_df=None):
+    """
+    Derive the season stats of every team from game level rows.
+
+    :param team_df: game_stats_teams rows.
+    :type team_df: pd.DataFrame
+    :param event_df: game_stats_events rows, needed for the EV GA Ratio and scoring first or leading stats.
+    :type event_df: pd.DataFrame
+    :param player_df: game_stats_players rows, needed for faceoff stats.
+    :type player_df: pd.DataFrame
+    :return: One row per season and team with the same columns as team_season_stats.
+    :rtype: pd.DataFrame
+    """
+    if team_df.empty:
+        return pd.DataFrame()
+    games = team_games(team_df)
+    has_events = event_df is not None and not event_df.empty
+    if has_events:
+        games = _add_event_stats(games, event_df)
+    if player_df is not None and not player_df.empty:
+        games = _add_faceoffs(games, player_df)
+
+    totals = games.groupby(['Season', 'Team']).sum(numeric_only=True)
+    played = games.groupby(['Season', 'Team']).size()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stats = {
+            'Games Played': played,
+            'Wins': totals['Win'],
+            'Losses': totals['Loss'],
+            'OTL': totals['OTL'],
+            'Points': 2 * totals['Win'] + totals['OTL'],
+            'Points %': ((2 * totals['Win'] + totals['OTL']) / (2 * played) * 100).round(1),
+            'Goals Per Game': (totals['GF'] / played).round(3),
+            'GA Per Game': (totals['GA'] / played).round(3),
+        }
+        if has_events:
+            stats['EV GA Ratio'] = (totals['EV Goals'] / totals['Opp EV Goals']).round(4)
+        # boxscores of some games don't have powerplay or shot stats
+        has_powerplays = {'Powerplay Goals', 'Powerplays'}.issubset(totals.columns)
+        has_shots = 'Shots' in totals.columns
+        if has_powerplays:
+            stats.update({
+                'Powerplay %': (totals['Powerplay Goals'] / totals['Powerplays'] * 100).round(1),
+                'Powerplay Goals': totals['Powerplay Goals'],
+                'Powerplay GA': totals['Opp Powerplay Goals'],
+                'Powerplays': totals['Powerplays'],
+                'PK %': ((1 - totals['Opp Powerplay Goals'] / totals['Opp Powerplays']) * 100).round(1),
+            })
+        if has_shots:
+            stats.update({
+                'Shots Per Game': (totals['Shots'] / played).round(4),
+                'Shots Allowed': (totals['Opp Shots'] / played).round(4),
+            })
+        if has_events:
+            stats.update({
+                'Win % Score First': _win_pct(games, games['Scored First']),
+                'Win % Opp Score First': _win_pct(games, games['Opp Scored First']),
+                'Win % Lead First': _win_pct(games, games['Lead First']),
+                'Win % Lead Second': _win_pct(games, games['Lead Second']),
+            })
+        if has_shots:
+            stats.update({
+                'Win % Outshoot Opp': _win_pct(games, games['Shots'] > games['Opp Shots']),
+                'Win % Outshot By Opp': _win_pct(games, games['Shots'] < games['Opp Shots']),
+            })
+        if 'Faceoffs' in totals.columns:
+            stats.update({
+                'Faceoffs': totals['Faceoffs'],
+                'Faceoffs Won': totals['Faceoffs Won'],
+                'Faceoffs Lost': totals['Faceoffs'] - totals['Faceoffs Won'],
+                'Faceoff Win %': (totals['Faceoffs Won'] / totals['Faceoffs'] * 100).round(1),
+            })
+        if has_shots:
+            stats.update({
+                'Shooting %': (totals['Goals'] / totals['Shots'] * 100).round(1),
+                'Save %': (1 - totals['Opp Goals'] / totals['Opp Shots']).round(3),
+            })
+
+    stats_df = pd.DataFrame(stats).replace([np.inf, -np.inf], np.nan).reset_index()
+    return utils.update_cols(stats_df, ['Season', 'Team'])
+
+
+def _ordinal(rank):
+    # format a rank the way the api does e.g. 1 -> '1st', 22 -> '22nd'
+    if pd.isna(rank):
+        return None
+    rank = int(rank)
+    suffix = 'th' if 10 <= rank % 100 <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(rank % 10, 'th')
+    return f'{rank}{suffix}'
+
+
+def team_season_ranks(stats_df):
+    """
+    Rank every team's season stats within its season, ties share the higher rank.
+
+    :param stats_df: Season stats from team_season_stats.
+    :type stats_df: pd.DataFrame
+    :return: One row per season and team with the same columns as team_season_ranks e.g. '1st'.
+    :rtype: pd.DataFrame
+    """
+    if stats_df.empty:
+        return pd.DataFrame()
+    stats = stats_df.set_index(['Season', 'Team']).drop(columns='Games Played')
+    ranks = {}
+    for col in stats.columns:
+        rank = stats[col].groupby(level='Season').rank(method='min', ascending=col in ASCENDING_RANKS)
+        ranks[col] = rank.map(_ordinal)
+    return pd.DataFrame(ranks, index=stats.index).reset_index()
+
+
+def _player_goal_events(player_df, event_df, key):
+    # game winning and overtime goals of every player in every game, from the scorer row of every goal event
+    goals = event_df[(event_df['Game Type'] == GAME_TYPE) & (event_df['Event'] == 'Goal') &
+                     (event_df['Outcome'] == 'Scorer')]
+    period = pd.to_numeric(goals['Period'], errors='coerce')
+    counts = pd.DataFrame({
+        'GWG': goals['GWG'].fillna(False).astype(bool) if 'GWG' in goals.columns else False,
+        'OT Goals': (period > 3) & (period < SHOOTOUT_PERIOD),
+    }).groupby([goals[col] for col in _GAME_KEY + key], observed=True).sum().reset_index()
+    counts = player_df[_GAME_KEY + key].merge(counts, on=_GAME_KEY + key, how='left')
+    return counts[['GWG', 'OT Goals']].fillna(0)
+
+
+def _player_split(games, key, has_events):
+    # season totals, rates, and time on ice of every player in a subset of their games
+    by = [games[col] for col in ['Season'] + key]
+    totals = games.drop(columns=['Season'] + key).groupby(by, observed=True).sum()
+    present = set(totals.columns)
+    totals = totals.reindex(columns=list(dict.fromkeys([*totals.columns, *_PLAYER_COLS, *_PLAYER_TOI_COLS])))
+    played = games.groupby(by, observed=True).size()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stats = {
+            'TOI': utils.seconds_to_clock(totals['TOI']),
+            'Assists': totals['Assists'],
+            'Goals': totals['Goals'],
+            'PIM': totals['PIMs'],
+            'Shots': totals['Shots'],
+            'Games': played,
+            'Hits': totals['Hits'],
+            'Powerplay Goals': totals['Powerplay Goals'],
+            'Powerplay Points': totals['Powerplay Goals'] + totals['Powerplay Assists'],
+            'Powerplay TOI': utils.seconds_to_clock(totals['Powerplay TOI']),
+            'Even Strength TOI': utils.seconds_to_clock(totals['Even Strength TOI']),
+            'PIMs': totals['PIMs'],
+            'Faceoff %': (totals['Faceoff Win'] / totals['Faceoffs'] * 100).round(2),
+            'Shot %': (totals['Goals'] / totals['Shots'] * 100).round(1),
+        }
+        if has_events:
+            stats['GWG'] = totals['GWG']
+            stats['OT Goals'] = totals['OT Goals']
+        stats.update({
+            'Shorthanded Goals': totals['Shorthanded Goals'],
+            'Shorthanded Points': totals['Shorthanded Goals'] + totals['Shorthanded Assists'],
+            'SH TOI': utils.seconds_to_clock(totals['SH TOI']),
+            'Blocked Shots': totals['Blocked Shots'],
+            'Plus Minus': totals['Plus Minus'],
+            'Points': totals['Goals'] + totals['Assists'],
+        })
+        stats.update({per_game: utils.seconds_to_clock(totals[col] / played)
+                      for col, per_game in _PLAYER_TOI_COLS.items()})
+    stats = {stat: value for stat, value in stats.items() if present.issuperset(_PLAYER_STAT_SOURCES.get(stat, [stat]))}
+    return pd.DataFrame(stats).replace([np.inf, -np.inf], np.nan)
+
+
+def player_season_stats(player_df, event_df=None):
+    """
+    Derive the full season, home, and away stats of every player from boxscore player rows.
+
+    :param player_df: game_stats_players rows.
+    :type player_df: pd.DataFrame
+    :param event_df: game_stats_events rows, needed for game winning and overtime goals.
+    :type event_df: pd.DataFrame
+    :return: One row per season, player id, and stat type with the same columns as the 'Full Season', 'Home',
+        and 'Away' rows of player_season_stats.
+    :rtype: pd.DataFrame
+    :raises ValueError: If the player rows were written before they carried a Player ID.
+    """
+    if player_df.empty:
+        return pd.DataFrame()
+    # player_season_stats is keyed by player id, names aren't unique
+    if 'Player ID' not in player_df.columns:
+        raise ValueError('game_stats_players rows have no Player ID, write the games again with write_game_stats')
+    df = player_df[player_df['Game Type'] == GAME_TYPE].reset_index(drop=True)
+    key = ['Player ID']
+
+    # partial boxscores only have some of the stats
+    games = _numeric(df, [col for col in _PLAYER_COLS if col in df.columns])
+    taken = _faceoffs_taken(df)
+    games['Faceoffs'] = pd.to_numeric(df[taken], errors='coerce') if taken is not None else np.nan
+    for col in [col for col in _PLAYER_TOI_COLS if col in df.columns]:
+        games[col] = utils.clock_to_seconds(df[col]).astype(float)
+    has_events = event_df is not None and not event_df.empty
+    if has_events:
+        event_key = key if 'Player ID' in event_df.columns else ['Player']
+        games[['GWG', 'OT Goals']] = _player_goal_events(df, event_df, event_key)
+    games[['Season'] + key] = df[['Season'] + key]
+
+    home = _same(df['Team'], df['Home']).to_numpy()
+    splits = []
+    for stat_type, rows in [('Full Season', slice(None)), ('Home', home), ('Away', ~home)]:
+        stats = _player_split(games.loc[rows], key, has_events).reset_index()
+        stats['Stat Type'] = stat_type
+        splits.append(stats)
+    stats_df = pd.concat(splits, ignore_index=True)
+    # one row per id even if a player's name is spelled differently in some games, the latest name is kept
+    names = df.groupby('Player ID', observed=True)['Player'].last()
+    stats_df['Player'] = stats_df['Player ID'].map(names).astype(object)
+    return utils.update_cols(stats_df, ['Season', 'Player ID', 'Player', 'Stat Type'])
@@ -1,55 +1,121 @@
-import json
-import os
+import bisect
 
-import requests
+import numpy as np
+import pandas as pd
 
+import client
 import utils
 import values as v
 
+STATS_API = 'https://statsapi.web.nhl.com/api/v1'
+STATS_REST = 'https://api.nhle.com/stats/rest/en'
+PLAYER_STATS_BY = ['homeAndAway', 'goalsByGameSituation', 'statsSingleSeason']
+# game endpoint of every fetch mode, boxscore and linescore documents are a fraction of the size of the
+# full play by play feed but only give team and player rows, or team rows
+FETCH_MODES = {
+    'full': 'feed/live',
+    'boxscore': 'boxscore',
+    'linescore': 'linescore',
+}
+
+# (season, game type, game number) -> game time and state from the schedule, filled by get_season_games
+_game_schedule = {}
+
 
 def get_team_stats(team_id, season=20192020):
-    r = requests.get(f'https://statsapi.web.nhl.com/api/v1/teams/{team_id}?expand=team.stats&season={season}')
-    parsed = json.loads(r.text)
+    parsed = client.get_json(f'{STATS_API}/teams/{team_id}?expand=team.stats&season={season}')
 
     season_values = parsed['teams'][0]['teamStats'][0]['splits'][0]['stat']
-    season_values['Season'] = season
+    season_values['Season'] = int(season)
 
     season_ranks = parsed['teams'][0]['teamStats'][0]['splits'][1]['stat']
-    season_ranks['Season'] = season
+    season_ranks['Season'] = int(season)
 
     return season_values, season_ranks
 
 
+def get_league_team_stats(season=20192020):
+    parsed = client.get_json(f'{STATS_API}/teams?expand=team.stats&season={season}')
+    stats_list = []
+    ranks_list = []
+
+    for team in parsed.get('teams', []):
+        try:
+            season_values = team['teamStats'][0]['splits'][0]['stat']
+            season_ranks = team['teamStats'][0]['splits'][1]['stat']
+        except (KeyError, IndexError):
+            continue
+        # keep team names consistent with the names used by get_team_stats callers
+        team_name = v.all_teams_by_id.get(team['id'], team['name'])
+
+        season_values['Season'] = int(season)
+        season_values['Team'] = team_name
+        stats_list.append(season_values)
+
+        season_ranks['Season'] = int(season)
+        season_ranks['Team'] = team_name
+        ranks_list.append(season_ranks)
+
+    return stats_list, ranks_list
+
+
 def get_player_stats(player_id, stats_by, season=20192020):
-    r = requests.get(f'https://statsapi.web.nhl.com/api/v1/people/{player_id}/stats?stats={stats_by}&season={season}')
-    parsed = json.loads(r.text)
-    players = utils.players_by_id(os.getcwd() + '/NHL_players.xlsx')
+    parsed = client.get_json(f'{STATS_API}/people/{player_id}/stats?stats={stats_by}&season={season}')
+    players = utils.players_by_id(utils.PLAYERS_FILE)
 
     if stats_by == 'homeAndAway':
         values = _home_and_away(parsed)
-        values[0]['Player'] = players[player_id]
-        values[1]['Player'] = players[player_id]
+        for value in values:
+            value['Player ID'] = player_id
+            value['Player'] = players[player_id]
     elif stats_by == 'goalsByGameSituation':
         values = _goals_by_situation(parsed)
+        values['Player ID'] = player_id
         values['Player'] = players[player_id]
     elif stats_by == 'statsSingleSeason':
         values = _season_stats(parsed)
+        values['Player ID'] = player_id
         values['Player'] = players[player_id]
 
     return values
 
 
+def get_player_stats_multi(player_id, season=20192020, stats_by=PLAYER_STATS_BY, player_name=None):
+    parsed = client.get_json(f'{STATS_API}/people/{player_id}/stats?stats={",".join(stats_by)}&season={season}')
+    player = player_name if player_name is not None else utils.players_by_id(utils.PLAYERS_FILE)[player_id]
+    parsers = {
+        'homeAndAway': _home_and_away,
+        'goalsByGameSituation': _goals_by_situation,
+        'statsSingleSeason': _season_stats,
+    }
+
+    values = []
+    for stats in parsed['stats']:
+        # each split is parsed the same way as a single category request
+        try:
+            split_values = parsers[stats['type']['displayName']]({'stats': [stats]})
+        except (KeyError, IndexError):
+            continue
+        if isinstance(split_values, dict):
+            split_values = [split_values]
+        for value in split_values:
+            # names aren't unique, rows are keyed by the player id
+            value['Player ID'] = player_id
+            value['Player'] = player
+            values.append(value)
+
+    return values
+
+
 def get_player_id(player_name, team_id, season):
-    r = requests.get(f'https://statsapi.web.nhl.com/api/v1/teams/{team_id}?expand=team.roster&season={season}')
-    parsed = json.loads(r.text)
+    parsed = client.get_json(f'{STATS_API}/teams/{team_id}?expand=team.roster&season={season}')
     for player in parsed['teams'][0]['roster']['roster']:
         if player['person']['fullName'] == player_name:
             return player['person']['id']
 
 
 def get_roster(team_id, season):
-    r = requests.get(f'https://statsapi.web.nhl.com/api/v1/teams/{team_id}/roster?season={season}')
-    parsed = json.loads(r.text)
+    parsed = client.get_json(f'{STATS_API}/teams/{team_id}/roster?season={season}')
     roster = []
 
     try:
@@ -61,20 +127,30 @@ def get_roster(team_id, season):
     return roster
 
 
+def get_league_rosters(season):
+    parsed = client.get_json(f'{STATS_API}/teams?expand=team.roster&season={season}')
+    roster = []
+
+    for team in parsed.get('teams', []):
+        for player in team.get('roster', {}).get('roster', []):
+            roster.append({'ID': player['person']['id'], 'Player': player['person']['fullName']})
+
+    return roster
+
+
 def get_roster_list(team_id, season):
-    r = requests.get(f'https://statsapi.web.nhl.com/api/v1/teams/{team_id}?expand=team.roster&season={season}')
-    parsed = json.loads(r.text)
+    parsed = client.get_json(f'{STATS_API}/teams/{team_id}?expand=team.roster&season={season}')
     roster_list = [player['person']['fullName'] for player in parsed['teams'][0]['roster']['roster']]
     return roster_list
 
 
 def _home_and_away(parsed):
     home = parsed['stats'][0]['splits'][0]['stat']
-    home['Season'] = parsed['stats'][0]['splits'][0]['season']
+    home['Season'] = int(parsed['stats'][0]['splits'][0]['season'])
     home['Stat Type'] = 'Home'
 
     away = parsed['stats'][0]['splits'][1]['stat']
-    away['Season'] = parsed['stats'][0]['splits'][1]['season']
+    away['Season'] = int(parsed['stats'][0]['splits'][1]['season'])
     away['Stat Type'] = 'Away'
 
     return home, away
@@ -82,7 +158,7 @@ def _home_and_away(parsed):
 
 def _goals_by_situation(parsed):
     goals = parsed['stats'][0]['splits'][0]['stat']
-    goals['Season'] = parsed['stats'][0]['splits'][0]['season']
+    goals['Season'] = int(parsed['stats'][0]['splits'][0]['season'])
     goals['Stat Type'] = 'Situation'
 
     return goals
@@ -90,38 +166,96 @@ def _goals_by_situation(parsed):
 
 def _season_stats(parsed):
     stats = parsed['stats'][0]['splits'][0]['stat']
-    stats['Season'] = parsed['stats'][0]['splits'][0]['season']
+    stats['Season'] = int(parsed['stats'][0]['splits'][0]['season'])
     stats['Stat Type'] = 'Full Season'
 
     return stats
 
 
-def get_game_stats(season, game_type, game_number):
-    r = requests.get(f'https://statsapi.web.nhl.com/api/v1/game/{season}{game_type}{game_number}/feed/live')
-    parsed = json.loads(r.text)
-    try:
-        all_plays = parsed['liveData']['plays']['allPlays']
-    except KeyError:
-        return []
+_GAME_TYPES = {
+    '01': 'Preseason',
+    '02': 'Regular Season',
+    '03': 'Playoffs',
+    '04': 'All Star'
+}
+_EVENT_COLS = ['Team ID', 'Team', 'Player ID', 'Player', 'Event', 'Outcome', 'Period', 'Period Time']
+# event columns that are only present for some plays, in the order they are set
+_EVENT_RESULT_COLS = [('Strength', ('strength', 'name')), ('GWG', ('gameWinningGoal',)), ('Empty Net', ('emptyNet',))]
 
-    stats_list = []
-    _game_type = {
-        '01': 'Preseason',
-        '02': 'Regular Season',
-        '03': 'Playoffs',
-        '04': 'All Star'
-    }
 
+_PLAYER_INFO_COLS = ['Player ID', 'Player', 'First Name', 'Last Name', 'Number', 'Position', 'Position Type', 'Shoots',
+                     'Birth Date', 'Nationality', 'Height', 'Weight']
+_TEAM_INFO_COLS = ['Team ID', 'Team', 'Abbreviation', 'Team Name', 'Location', 'Division', 'Conference', 'Franchise ID']
+_GAME_SHARED_COLS = ['Season', 'Game Type', 'Game Number', 'Home ID', 'Home', 'Away ID', 'Away', 'Game Time']
+
+
+def _game_shared_stats(parsed, season, game_type, game_number):
     full_season = int(f'{season}{int(season) + 1}')
-    shared_stats = {
+    return {
         'Season': full_season,
-        'Game Type': _game_type[game_type],
+        'Game Type': _GAME_TYPES[game_type],
         'Game Number': int(game_number),
+        'Home ID': parsed['gameData']['teams']['home']['id'],
         'Home': parsed['gameData']['teams']['home']['name'],
+        'Away ID': parsed['gameData']['teams']['away']['id'],
         'Away': parsed['gameData']['teams']['away']['name'],
         'Game Time': parsed['gameData']['datetime']['dateTime'],
     }
 
+
+def _player_info(person, position=None):
+    # dimension row of a player, gameData players hold their position while boxscore players hold it alongside
+    position = person.get('primaryPosition', position) or {}
+    return {
+        'Player ID': person['id'],
+        'Player': person['fullName'],
+        'First Name': person.get('firstName'),
+        'Last Name': person.get('lastName'),
+        'Number': person.get('primaryNumber'),
+        'Position': position.get('abbreviation'),
+        'Position Type': position.get('type'),
+        'Shoots': person.get('shootsCatches'),
+        'Birth Date': person.get('birthDate'),
+        'Nationality': person.get('nationality'),
+        'Height': person.get('height'),
+        'Weight': person.get('weight'),
+    }
+
+
+def _team_info(team):
+    # dimension row of a team, division and conference are the ones of the latest game scraped
+    return {
+        'Team ID': team['id'],
+        'Team': team['name'],
+        'Abbreviation': team.get('abbreviation'),
+        'Team Name': team.get('teamName'),
+        'Location': team.get('locationName'),
+        'Division': team.get('division', {}).get('name'),
+        'Conference': team.get('conference', {}).get('name'),
+        'Franchise ID': team.get('franchiseId'),
+    }
+
+
+def _linescore(parsed, side):
+    # final score including shootout winners and how far the game went, used to tell wins and overtime losses
+    linescore = parsed['liveData'].get('linescore', {})
+    return {
+        'Final Goals': linescore.get('teams', {}).get(side, {}).get('goals'),
+        'Final Period': linescore.get('currentPeriod'),
+        'Shootout': linescore.get('hasShootout'),
+    }
+
+
+def get_game_stats(season, game_type, game_number, fetch='full'):
+    parsed = get_game_feed(season, game_type, game_number, fetch)
+    try:
+        all_plays = parsed['liveData']['plays']['allPlays']
+    except KeyError:
+        return []
+
+    stats_list = []
+    shared_stats = _game_shared_stats(parsed, season, game_type, game_number)
+
     events_list = []
     for play in all_plays:
         try:
@@ -130,7 +264,9 @@ def get_game_stats(season, game_type, game_number):
             continue
         for player in players:
             event_data = shared_stats.copy()
+            event_data['Team ID'] = play['team']['id']
             event_data['Team'] = play['team']['name']
+            event_data['Player ID'] = player['player']['id']
             event_data['Player'] = player['player']['fullName']
             event_data['Event'] = play['result']['event']
             event_data['Outcome'] = player['playerType']
@@ -154,15 +290,20 @@ def get_game_stats(season, game_type, game_number):
     player_list = []
     for team in parsed['liveData']['boxscore']['teams']:
         team_data = shared_stats.copy()
+        team_data['Team ID'] = parsed['liveData']['boxscore']['teams'][team]['team']['id']
         team_data['Team'] = parsed['liveData']['boxscore']['teams'][team]['team']['name']
         team_stats = parsed['liveData']['boxscore']['teams'][team]['teamStats']['teamSkaterStats']
         team_data.update(team_stats)
+        team_data.update(_linescore(parsed, team))
         team_list.append(team_data)
 
         for skater in parsed['liveData']['boxscore']['teams'][team]['players']:
             try:
                 player_data = shared_stats.copy()
+                player_data['Team ID'] = parsed['liveData']['boxscore']['teams'][team]['team']['id']
                 player_data['Team'] = parsed['liveData']['boxscore']['teams'][team]['team']['name']
+                player_data['Player ID'] = parsed['liveData']['boxscore']['teams'][team]['players'][skater]['person'][
+                    'id']
                 player_data['Player'] = parsed['liveData']['boxscore']['teams'][team]['players'][skater]['person'][
                     'fullName']
                 player_data.update(
@@ -175,46 +316,344 @@ def get_game_stats(season, game_type, game_number):
     return stats_list
 
 
-def get_all_players(season):
+def get_game_feed(season, game_type, game_number, fetch='full'):
+    if fetch not in FETCH_MODES:
+        raise ValueError(f'Unknown fetch mode: {fetch}')
+    parsed = client.get_json(f'{STATS_API}/game/{season}{game_type}{game_number}/{FETCH_MODES[fetch]}')
+    if fetch == 'full':
+        return parsed
+    return _partial_feed(parsed, fetch, season, game_type, game_number)
+
+
+def game_kind(fetch='full'):
+    # checkpoint and dead letter kind of games scraped with a fetch mode, so a boxscore only run doesn't
+    # skip or retry the games of a full run
+    return 'game' if fetch == 'full' else f'game_{fetch}'
+
+
+def _schedule_game(season, game_type, game_number):
+    # the schedule is only requested if get_season_games hasn't been called for the season in this process
+    game = (season, game_type, game_number)
+    if game not in _game_schedule:
+        get_season_games(utils.convert_season(int(season)))
+    return _game_schedule.get(game, {})
+
+
+def _partial_feed(parsed, fetch, season, game_type, game_number):
+    # wrap a boxscore or linescore document in the shape of a feed/live document without any plays,
+    # the game time and state they don't have are taken from the schedule
+    if fetch == 'boxscore':
+        boxscore = parsed
+        linescore = {}
+    else:
+        linescore = parsed
+        boxscore = {'teams': {
+            side: {
+                'team': team['team'],
+                'teamStats': {'teamSkaterStats': {'goals': team.get('goals'), 'shots': team.get('shotsOnGoal')}},
+                'players': {},
+            } for side, team in parsed.get('teams', {}).items()
+        }}
+    if not boxscore.get('teams'):
+        return {}
+
+    schedule = _schedule_game(season, game_type, game_number)
+    state = 'Final' if linescore.get('currentPeriodTimeRemaining') == 'Final' else schedule.get('abstractGameState')
+    return {
+        'gameData': {
+            'teams': {side: team['team'] for side, team in boxscore['teams'].items()},
+            'datetime': {'dateTime': schedule.get('dateTime')},
+            'status': {'abstractGameState': state},
+        },
+        'liveData': {'plays': {'allPlays': []}, 'boxscore': boxscore, 'linescore': linescore},
+    }
+
+
+def is_final(parsed):
+    # games in progress or not played yet will still change, only finished games are complete
+    try:
+        return parsed['gameData']['status']['abstractGameState'] == 'Final'
+    except (KeyError, TypeError):
+        return False
+
+
+class GameColumns:
+    """
+    Columnar builder for the event, team, and player rows returned by get_game_stats.
+    Values are appended straight into per-column lists for any number of games instead of building a dict
+    for every row, game level values are stored once per game and only broadcast when the frames are built.
+    Every player and team seen is kept once by id for the player_info and team_info dimension tables.
+    Boxscore and linescore documents from get_game_feed are added the same way, they just have no event rows.
+
+    Usage:
+        columns = GameColumns()
+        for game_number in ['0001', '0002']:
+            columns.add_game(get_game_feed('2015', '02', game_number), '2015', '02', game_number)
+        events_df, team_df, player_df = columns.to_frames()
+        player_info_df, team_info_df = columns.dimension_frames()
+    """
+
+    _TABLES = ['events', 'teams', 'players']
+
+    def __init__(self):
+        self.clear()
+
+    def __len__(self):
+        return len(self._games)
+
+    def clear(self):
+        """
+        Drop every game added so far e.g. once its frames have been written.
+        """
+        self._games = []
+        self._counts = {table: [] for table in self._TABLES}
+        self._columns = {table: {} for table in self._TABLES}
+        self._rows = {table: 0 for table in self._TABLES}
+        self._event_columns = [self._columns['events'].setdefault(col, []) for col in _EVENT_COLS]
+        self._sparse = {}
+        self._players = {}
+        self._teams = {}
+
+    def _append_row(self, table, row):
+        # pad with None for columns missing from the row or only first seen in this row
+        columns = self._columns[table]
+        n = self._rows[table]
+        for key, value in row.items():
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = [None] * n
+            column.append(value)
+        for column in columns.values():
+            if len(column) == n:
+                column.append(None)
+        self._rows[table] = n + 1
+
+    def add_game(self, parsed, season, game_type, game_number):
+        """
+        Parse a game feed/live document and append its rows.
+
+        :param parsed: Parsed feed/live document from get_game_feed.
+        :type parsed: dict
+        :param season: Year of the start of the season e.g. '2015'.
+        :type season: str
+        :param game_type: Api game type e.g. '02'.
+        :type game_type: str
+        :param game_number: Game number e.g. '0001'.
+        :type game_number: str
+        :return: False if the document has no game data, True otherwise.
+        :rtype: bool
+        """
+        try:
+            all_plays = parsed['liveData']['plays']['allPlays']
+        except KeyError:
+            return False
+
+        shared_stats = _game_shared_stats(parsed, season, game_type, game_number)
+        players, teams = _game_dimensions(parsed)
+        start = {table: (self._rows[table], list(self._columns[table])) for table in self._TABLES}
+        sparse_start = list(self._sparse)
+        try:
+            self._add_events(all_plays)
+            self._add_boxscore(parsed)
+        except Exception:
+            # drop the partially added game so every column stays aligned
+            self._rollback(start, sparse_start)
+            raise
+
+        self._players.update(players)
+        self._teams.update(teams)
+        self._games.append(shared_stats)
+        for table in self._TABLES:
+            self._counts[table].append(self._rows[table] - start[table][0])
+        return True
+
+    def _add_events(self, all_plays):
+        team_id_col, team_col, player_id_col, player_col, event_col, outcome_col, period_col, time_col = \
+            self._event_columns
+        n = self._rows['events']
+
+        for play in all_plays:
+            players = play.get('players')
+            if players is None:
+                continue
+            k = len(players)
+            result = play['result']
+            about = play['about']
+
+            # values shared by every player in the play are extended once per play
+            team_id_col.extend([play['team']['id']] * k)
+            team_col.extend([play['team']['name']] * k)
+            event_col.extend([result['event']] * k)
+            period_col.extend([about['period']] * k)
+            time_col.extend([about['periodTime']] * k)
+            for player in players:
+                player_id_col.append(player['player']['id'])
+                player_col.append(player['player']['fullName'])
+                outcome_col.append(player['playerType'])
+
+            # match get_game_stats, result values are set in order until the first missing one
+            optional = []
+            for col, path in _EVENT_RESULT_COLS:
+                value = result
+                try:
+                    for key in path:
+                        value = value[key]
+                except KeyError:
+                    break
+                optional.append((col, value))
+            coordinates = play.get('coordinates', {})
+            if 'x' in coordinates:
+                optional.append(('x', coordinates['x']))
+                if 'y' in coordinates:
+                    optional.append(('y', coordinates['y']))
+
+            # optional columns are stored sparsely as row indexes and values, in the order they are first seen
+            for col, value in optional:
+                indexes, values = self._sparse.setdefault(col, ([], []))
+                indexes.extend(range(n, n + k))
+                values.extend([value] * k)
+            n += k
+        self._rows['events'] = n
+
+    def _add_boxscore(self, parsed):
+        for home_away, side in parsed['liveData']['boxscore']['teams'].items():
+            team_id = side['team']['id']
+            team = side['team']['name']
+            self._append_row('teams', {'Team ID': team_id, 'Team': team, **side['teamStats']['teamSkaterStats'],
+                                       **_linescore(parsed, home_away)})
+
+            for skater in side['players'].values():
+                try:
+                    row = {'Team ID': team_id, 'Team': team, 'Player ID': skater['person']['id'],
+                           'Player': skater['person']['fullName'], **skater['stats']['skaterStats']}
+                except KeyError:
+                    continue
+                self._append_row('players', row)
+
+    def _rollback(self, start, sparse_start):
+        for table, (n, columns) in start.items():
+            self._rows[table] = n
+            for col in list(self._columns[table]):
+                if col in columns:
+                    del self._columns[table][col][n:]
+                else:
+                    del self._columns[table][col]
+        n = start['events'][0]
+        for col in list(self._sparse):
+            if col not in sparse_start:
+                del self._sparse[col]
+                continue
+            indexes, values = self._sparse[col]
+            cut = bisect.bisect_left(indexes, n)
+            del indexes[cut:]
+            del values[cut:]
+
+    def to_frames(self):
+        """
+        Build DataFrames from every game added so far.
+
+        :return: Event, team, and player DataFrames with the same columns as get_game_stats rows.
+        :rtype: (pd.DataFrame, pd.DataFrame, pd.DataFrame)
+        """
+        frames = []
+        shared = pd.DataFrame(self._games, columns=_GAME_SHARED_COLS)
+        for table in self._TABLES:
+            index = shared.index.repeat(self._counts[table])
+            df = shared.loc[index].reset_index(drop=True)
+            for col, values in self._columns[table].items():
+                df[col] = values
+            if table == 'events':
+                for col, (indexes, values) in self._sparse.items():
+                    column = np.full(len(df), None, dtype=object)
+                    column[indexes] = values
+                    df[col] = pd.Series(column).infer_objects()
+            frames.append(df)
+        return tuple(frames)
+
+    def dimension_frames(self):
+        """
+        Build the player and team dimension DataFrames of every game added so far.
+
+        :return: Player info and team info DataFrames, one row per id.
+        :rtype: (pd.DataFrame, pd.DataFrame)
+        """
+        return (pd.DataFrame(list(self._players.values()), columns=_PLAYER_INFO_COLS),
+                pd.DataFrame(list(self._teams.values()), columns=_TEAM_INFO_COLS))
+
+
+def _game_dimensions(parsed):
+    # player and team dimension rows by id, boxscore players fill in players missing from gameData
     players = {}
-    for team_id in v.recent_teams_by_id:
-        players.update(get_roster(team_id, season))
+    for side in parsed['liveData']['boxscore']['teams'].values():
+        for skater in side['players'].values():
+            if 'id' in skater.get('person', {}):
+                players[skater['person']['id']] = _player_info(skater['person'], skater.get('position'))
+    for person in parsed['gameData'].get('players', {}).values():
+        players[person['id']] = _player_info(person)
+    teams = {team['id']: _team_info(team) for team in parsed['gameData']['teams'].values()}
+    return players, teams
+
+
+def get_game_frames(season, game_type, game_number, fetch='full'):
+    columns = GameColumns()
+    parsed = get_game_feed(season, game_type, game_number, fetch)
+    if not columns.add_game(parsed, season, game_type, game_number):
+        return []
+    return columns.to_frames()
 
-    return players
+
+def get_season_games(season, game_types='R,P'):
+    parsed = client.get_json(f'{STATS_API}/schedule?season={season}&gameType={game_types}')
+    games = set()
+    # postponed games are listed under both their original and rescheduled dates
+    for date in parsed.get('dates', []):
+        for game in date['games']:
+            game_id = str(game['gamePk'])
+            key = (game_id[:4], game_id[4:6], game_id[6:])
+            games.add(key)
+            _game_schedule[key] = {
+                'dateTime': game.get('gameDate'),
+                'abstractGameState': game.get('status', {}).get('abstractGameState'),
+            }
+
+    return sorted(games)
+
+
+def get_all_players(season):
+    # the league wide roster request only holds the teams that played in the season
+    return get_league_rosters(season)
 
 
 def get_shift_data(season, game_type, game_number):
-    r = requests.get(
-        f'https://api.nhle.com/stats/rest/en/shiftcharts?cayenneExp=gameId={season}{game_type}{game_number}')
-    parsed = json.loads(r.text)
+    parsed = client.get_json(f'{STATS_REST}/shiftcharts?cayenneExp=gameId={season}{game_type}{game_number}')
+    return parse_shift_data(parsed, season, game_type, game_number)
+
+
+def parse_shift_data(parsed, season, game_type, game_number):
     try:
         all_shifts = parsed['data']
     except KeyError:
         return []
 
     shift_list = []
-    _game_type = {
-        '01': 'Preseason',
-        '02': 'Regular Season',
-        '03': 'Playoffs',
-        '04': 'All Star'
-    }
 
     full_season = int(f'{season}{int(season) + 1}')
     shared_stats = {
         'Season': full_season,
-        'Game Type': _game_type[game_type],
+        'Game Type': _GAME_TYPES[game_type],
         'Game Number': int(game_number),
     }
 
     for shift in all_shifts:
         shift_data = shared_stats.copy()
+        shift_data['Player ID'] = shift.get('playerId')
         shift_data['Player Name'] = f'{shift["firstName"]} {shift["lastName"]}'
         shift_data['Period'] = shift['period']
         shift_data['Shift Number'] = shift['shiftNumber']
         shift_data['Shift Start Time'] = shift['startTime']
         shift_data['Shift End Time'] = shift['endTime']
         shift_data['Shift Duration'] = shift['duration']
+        shift_data['Team ID'] = shift.get('teamId')
         shift_data['Team'] = shift['teamName']
         shift_list.append(shift_data)
 
@@ -0,0 +1,140 @@
+"""
+Module used for scraping game level api data concurrently with asyncio.
+
+Requests are made through the same api_parse functions used by main.py so the returned rows are
+identical, but up to `concurrency` games are in flight at once and the request rate is capped by the
+client token bucket instead of sleeping a fixed second between every game.
+Games that still fail after the client retries them are recorded with dead_letter and skipped.
+
+Contains functions used to get data for:
+    game_stats - gets the event, team, and player data for a list of games.
+    shift_data - gets the shift information for a list of games.
+
+Usage:
+    games = api_parse.get_season_games(20152016)
+    events_df, team_df, player_df = asyncio.run(game_stats(games, concurrency=8, rate=5)).to_frames()
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import api_parse as api
+import client
+import dead_letter
+import telemetry
+
+CONCURRENCY = 8
+# requests per second allowed across every in flight request
+RATE = 5
+
+
+async def _ordered(func, args_list, concurrency):
+    """
+    Run func for every set of args on a thread pool with at most concurrency calls running at once.
+    A new call starts as soon as any call finishes, results are yielded in the same order as args_list
+    as soon as the calls before them have finished too.
+
+    :param func: Blocking function to run.
+    :type func: callable
+    :param args_list: List of positional argument tuples to call func with.
+    :type args_list: list of tuple
+    :param concurrency: Maximum number of calls running at once.
+    :type concurrency: int
+    :return: (args, result) of every call, in the same order as args_list.
+    :rtype: async iterator of (tuple, object)
+    """
+    loop = asyncio.get_running_loop()
+
+    # the executor's workers are the only limit on calls running at once
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        async def _run(index, args):
+            return index, await loop.run_in_executor(executor, func, *args)
+
+        finished = {}
+        next_index = 0
+        for task in asyncio.as_completed([_run(index, args) for index, args in enumerate(args_list)]):
+            index, result = await task
+            finished[index] = result
+            # hold results back until every earlier call has finished
+            while next_index in finished:
+                yield args_list[next_index], finished.pop(next_index)
+                next_index += 1
+
+
+def _fetch_game(kind, func):
+    # wrap a game fetcher so a failed request is recorded and returns None instead of cancelling the other games
+    def _fetch(season, game_type, game_number):
+        try:
+            return func(season, game_type, game_number)
+        except requests.exceptions.RequestException:
+            dead_letter.add(kind, {'season': season, 'game_type': game_type, 'game_number': game_number})
+            return None
+
+    return _fetch
+
+
+def _configure(concurrency, rate):
+    # keep enough pooled connections open for every in flight request, the client settings used by
+    # the rest of the process are restored once the scrape finishes
+    return client.configured(pool_size=max(concurrency, client.POOL_SIZE), rate=rate, burst=concurrency)
+
+
+async def game_stats(games, columns=None, concurrency=CONCURRENCY, rate=RATE, done=None, fetch='full'):
+    """
+    Concurrently get the game data for every game given and add it to a columnar builder.
+    Games are parsed in order as soon as they and the games before them finish, a new request starts as soon
+    as any request finishes. Games that return no data are skipped.
+
+    :param games: List of (season, game_type, game_number) e.g. from api_parse.get_season_games.
+    :type games: list of (str, str, str)
+    :param columns: Builder to add the games to, a new one is created if not given.
+    :type columns: api_parse.GameColumns
+    :param concurrency: Maximum number of requests in flight at once.
+    :type concurrency: int
+    :param rate: Maximum requests per second.
+    :type rate: float
+    :param done: Checkpoint to mark every finished game added to the builder in.
+    :type done: checkpoint.Checkpoint
+    :param fetch: 'full' play by play, or only the 'boxscore' or 'linescore', see api_parse.FETCH_MODES.
+    :type fetch: str
+    :return: Builder holding the event, team, and player data for every game found.
+    :rtype: api_parse.GameColumns
+    """
+    if columns is None:
+        columns = api.GameColumns()
+
+    fetch_game = _fetch_game(api.game_kind(fetch), functools.partial(api.get_game_feed, fetch=fetch))
+    with _configure(concurrency, rate):
+        async for game, parsed in _ordered(fetch_game, games, concurrency):
+            if parsed is None:
+                continue
+            with telemetry.timer('parse'):
+                added = columns.add_game(parsed, *game)
+            if not added:
+                continue
+            if done is not None and api.is_final(parsed):
+                done.mark(game)
+
+    return columns
+
+
+async def shift_data(games, concurrency=CONCURRENCY, rate=RATE):
+    """
+    Concurrently get the shift data for every game given.
+    Games without shift data return an empty list.
+
+    :param games: List of (season, game_type, game_number) e.g. from api_parse.get_season_games.
+    :type games: list of (str, str, str)
+    :param concurrency: Maximum number of requests in flight at once.
+    :type concurrency: int
+    :param rate: Maximum requests per second.
+    :type rate: float
+    :return: List of shift lists for every game, in game order.
+    :rtype: list of list of dict
+    """
+    with _configure(concurrency, rate):
+        return [shifts or [] async for _, shifts in _ordered(_fetch_game('shift', api.get_shift_data), games,
+                                                               concurrency)]
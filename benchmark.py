@@ -0,0 +1,312 @@
+"""
+Script used to benchmark the parsing and writing hot paths against recorded api fixtures.
+
+Recorded game feeds and shift charts (see fixtures.py) are repeated to the size of 1, 10, and 25 seasons,
+then parsed and written in chunks of main.CHUNK_GAMES games the same way the writers do.
+xlsx sheets can't hold more than XLSX_MAX_ROWS rows, only that many rows of every table are written to
+xlsx and the rows written to each output are saved with the results.
+Without recorded fixtures, or with --synthetic, generated documents of a typical size are used instead
+so the benchmark also runs offline on a fresh checkout.
+Every stage is timed with telemetry and the results are saved to RESULTS_DIR so later runs can be
+compared against them.
+
+Timed stages:
+    parse - GameColumns.add_game for every game feed.
+    frames - main._game_frames building, renaming, and typing the game and dimension DataFrames.
+    shifts - flattening shift charts with api_parse.parse_shift_data.
+    write_{output} - writing every chunk to each sink and closing it.
+
+Usage:
+    # record some fixtures first
+    client.configure(mode='record')
+    main.write_game_stats(filename, 2019)
+    main.write_shift_data(filename, 2019)
+
+    python benchmark.py --seasons 1 10 25 --outputs xlsx parquet sqlite
+    python benchmark.py --seasons 1 --compare benchmarks/20200101-000000.json
+    python benchmark.py --seasons 1 --synthetic
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import tempfile
+
+import pandas as pd
+
+import api_parse as api
+import fixtures
+import main
+import schema
+import sinks
+import telemetry
+import utils
+import values as v
+
+RESULTS_DIR = os.getcwd() + '/benchmarks/'
+SEASONS = [1, 10, 25]
+OUTPUTS = ['xlsx', 'parquet', 'sqlite']
+# regular season games in a 32 team league
+GAMES_PER_SEASON = 1312
+# xlsx sheets can't hold more rows than this
+XLSX_MAX_ROWS = 1048575
+# generated games repeated when there are no recorded fixtures, and the size of each
+SYNTHETIC_GAMES = 20
+SYNTHETIC_PLAYS = 330
+SYNTHETIC_SHIFTS = 800
+
+
+def load_fixtures(fixture_dir=fixtures.FIXTURE_DIR):
+    """
+    Load every recorded game feed and shift chart.
+
+    :param fixture_dir: Directory fixtures are stored in.
+    :type fixture_dir: str
+    :return: Lists of game feed documents and shift chart documents.
+    :rtype: (list of dict, list of dict)
+    """
+    feeds = []
+    shifts = []
+    for entry in fixtures.iter_fixtures(fixture_dir):
+        if re.search(r'/game/\d+/feed/live', entry['url']) and 'liveData' in entry['document']:
+            feeds.append(entry['document'])
+        elif 'shiftcharts' in entry['url'] and entry['document'].get('data'):
+            shifts.append(entry['document'])
+    return feeds, shifts
+
+
+def _synthetic_feed(rnd, home, away):
+    # feed/live document with roughly as many plays, players, and optional fields as a real game
+    rosters = {team['id']: [team['id'] * 100 + i for i in range(20)] for team in [home, away]}
+    plays = []
+    for i in range(SYNTHETIC_PLAYS):
+        team = rnd.choice([home, away])
+        event = rnd.choice(['Faceoff', 'Shot', 'Missed Shot', 'Blocked Shot', 'Hit', 'Giveaway', 'Goal', 'Stoppage'])
+        clock = f'{rnd.randint(0, 19):02d}:{rnd.randint(0, 59):02d}'
+        play = {'result': {'event': event}, 'about': {'period': 1 + i * 3 // SYNTHETIC_PLAYS, 'periodTime': clock}}
+        if event != 'Stoppage':
+            play['team'] = team
+            play['players'] = [{'player': {'id': player_id, 'fullName': f'Player {player_id}'}, 'playerType': role}
+                               for player_id, role in zip(rnd.sample(rosters[team['id']], 2), ['Shooter', 'Goalie'])]
+            play['coordinates'] = {'x': rnd.randint(-99, 99), 'y': rnd.randint(-42, 42)}
+        if event == 'Goal':
+            play['result'].update({'strength': {'name': 'Even'}, 'gameWinningGoal': False, 'emptyNet': False})
+        plays.append(play)
+
+    def side(team):
+        players = {}
+        for player_id in rosters[team['id']]:
+            stats = {'timeOnIce': f'{rnd.randint(5, 25)}:{rnd.randint(0, 59):02d}', 'assists': rnd.randint(0, 2),
+                     'goals': rnd.randint(0, 1), 'shots': rnd.randint(0, 6), 'hits': rnd.randint(0, 5),
+                     'powerPlayGoals': 0, 'powerPlayAssists': 0, 'penaltyMinutes': rnd.choice([0, 2]),
+                     'faceOffWins': rnd.randint(0, 8), 'faceoffTaken': rnd.randint(8, 16), 'takeaways': 1,
+                     'giveaways': 1, 'shortHandedGoals': 0, 'shortHandedAssists': 0, 'blocked': 1, 'plusMinus': 0,
+                     'evenTimeOnIce': '12:00', 'powerPlayTimeOnIce': '1:30', 'shortHandedTimeOnIce': '0:45'}
+            players[f'ID{player_id}'] = {'person': {'id': player_id, 'fullName': f'Player {player_id}'},
+                                         'position': {'abbreviation': 'C', 'type': 'Forward'},
+                                         'stats': {'skaterStats': stats}}
+        team_stats = {'goals': rnd.randint(0, 6), 'pim': 8, 'shots': rnd.randint(20, 40), 'hits': 20,
+                      'powerPlayGoals': 1.0, 'powerPlayOpportunities': 3.0, 'blocked': 12}
+        return {'team': team, 'teamStats': {'teamSkaterStats': team_stats}, 'players': players}
+
+    teams = {'away': side(away), 'home': side(home)}
+    goals = {key: {'goals': team['teamStats']['teamSkaterStats']['goals']} for key, team in teams.items()}
+    linescore = {'currentPeriod': 3, 'hasShootout': False, 'teams': goals}
+    return {
+        'gameData': {'teams': {'away': away, 'home': home}, 'datetime': {'dateTime': '2019-10-02T23:00:00Z'},
+                     'status': {'abstractGameState': 'Final'}},
+        'liveData': {'plays': {'allPlays': plays}, 'boxscore': {'teams': teams}, 'linescore': linescore},
+    }
+
+
+def _synthetic_shifts(rnd, home, away):
+    # shift chart with a typical number of shifts for both teams
+    shifts = []
+    for i in range(SYNTHETIC_SHIFTS):
+        team = rnd.choice([home, away])
+        start = rnd.randint(0, 1150)
+        shifts.append({'playerId': team['id'] * 100 + rnd.randint(0, 19), 'firstName': 'Player', 'lastName': str(i),
+                       'period': 1 + i * 3 // SYNTHETIC_SHIFTS, 'shiftNumber': i % 30 + 1,
+                       'startTime': f'{start // 60:02d}:{start % 60:02d}',
+                       'endTime': f'{(start + 45) // 60:02d}:{(start + 45) % 60:02d}', 'duration': '00:45',
+                       'teamId': team['id'], 'teamName': team['name']})
+    return {'data': shifts, 'total': len(shifts)}
+
+
+def synthetic_fixtures(games=SYNTHETIC_GAMES, seed=0):
+    """
+    Generate game feeds and shift charts of a typical size, used when no fixtures have been recorded.
+
+    :param games: Number of different games to generate.
+    :type games: int
+    :param seed: Random seed, the same seed always generates the same documents.
+    :type seed: int
+    :return: Lists of game feed documents and shift chart documents.
+    :rtype: (list of dict, list of dict)
+    """
+    rnd = random.Random(seed)
+    teams = [{'id': team_id, 'name': name} for team_id, name in list(v.all_teams_by_id.items())[:32]]
+    feeds = []
+    shifts = []
+    for _ in range(games):
+        home, away = rnd.sample(teams, 2)
+        feeds.append(_synthetic_feed(rnd, home, away))
+        shifts.append(_synthetic_shifts(rnd, home, away))
+    return feeds, shifts
+
+
+def _games(seasons):
+    # synthetic game keys, every season gets a different start year so rows don't share a natural key
+    for season in range(seasons):
+        for game_number in range(1, GAMES_PER_SEASON + 1):
+            yield str(2000 + season), '02', f'{game_number:04d}'
+
+
+def _open_sinks(outputs, directory):
+    opened = {}
+    for output in outputs:
+        filename = {'xlsx': 'bench.xlsx', 'parquet': 'bench_parquet', 'sqlite': 'bench.db'}[output]
+        opened[output] = sinks.open_sink(os.path.join(directory, filename), output)
+    return opened
+
+
+def run(feeds, shifts, seasons, outputs=OUTPUTS):
+    """
+    Benchmark parsing and writing a number of seasons of games.
+
+    :param feeds: Recorded game feed documents, repeated for every game.
+    :type feeds: list of dict
+    :param shifts: Recorded shift chart documents, repeated for every game.
+    :type shifts: list of dict
+    :param seasons: Number of seasons to scale the fixtures to.
+    :type seasons: int
+    :param outputs: Sinks to write to.
+    :type outputs: list of str
+    :return: Seconds per stage, games parsed, rows per table, and rows written to each output per table.
+    :rtype: dict
+    """
+    telemetry.reset()
+    games = list(_games(seasons))
+
+    directory = tempfile.mkdtemp(prefix='nhl_benchmark_')
+    try:
+        opened = _open_sinks(outputs, directory)
+        written = {}
+        output_rows = {output: {} for output in opened}
+        columns = api.GameColumns()
+        for i in range(0, len(games), main.CHUNK_GAMES):
+            chunk = games[i:i + main.CHUNK_GAMES]
+            with telemetry.timer('parse'):
+                for j, game in enumerate(chunk):
+                    columns.add_game(feeds[(i + j) % len(feeds)], *game)
+            # the frames the writers build, timed as the frames stage
+            tables = dict(zip(main.GAME_TABLES['full'], main._game_frames(columns)))
+
+            shift_rows = []
+            if shifts:
+                with telemetry.timer('shifts'):
+                    for j, game in enumerate(chunk):
+                        shift_rows.extend(api.parse_shift_data(shifts[(i + j) % len(shifts)], *game))
+                    shift_df = utils.rename_cols(pd.DataFrame(shift_rows).drop_duplicates())
+                    shift_df = utils.add_clock_seconds(shift_df, main.SHIFT_CLOCKS)
+                    tables['shift_data'] = schema.apply('shift_data', shift_df)
+            for table, df in tables.items():
+                written[table] = written.get(table, 0) + len(df)
+
+            for output, sink in opened.items():
+                with telemetry.timer(f'write_{output}'):
+                    for table, df in tables.items():
+                        if output == 'xlsx':
+                            # the rest of a table that doesn't fit in a sheet is left out of the workbook
+                            df = df.iloc[:max(XLSX_MAX_ROWS - output_rows[output].get(table, 0), 0)]
+                        sink.write(table, df)
+                        output_rows[output][table] = output_rows[output].get(table, 0) + len(df)
+            print(f'{seasons} seasons: {i + len(chunk)}/{len(games)} games')
+
+        for output, sink in opened.items():
+            with telemetry.timer(f'write_{output}'):
+                sink.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    # the sinks' own write stage is left out as it adds every output together
+    stages = {stage: stats['seconds'] for stage, stats in telemetry.snapshot()['stages'].items() if stage != 'write'}
+    return {'games': len(games), 'rows': written, 'output_rows': output_rows, 'seconds': stages}
+
+
+def compare(results, previous):
+    """
+    Print how much slower or faster every stage is than in a previous run.
+
+    :param results: Results from this run.
+    :type results: dict
+    :param previous: Results loaded from a previous run.
+    :type previous: dict
+    """
+    for seasons, result in results['results'].items():
+        old = previous['results'].get(seasons)
+        if old is None:
+            continue
+        for stage, seconds in result['seconds'].items():
+            old_seconds = old['seconds'].get(stage)
+            if old_seconds:
+                print(f'{seasons} seasons {stage}: {old_seconds:.2f}s -> {seconds:.2f}s ({seconds / old_seconds:.2f}x)')
+
+
+def save(results, results_dir=RESULTS_DIR):
+    """
+    Save benchmark results to a timestamped json file.
+
+    :param results: Benchmark results.
+    :type results: dict
+    :param results_dir: Directory to save the results in.
+    :type results_dir: str
+    :return: Path of the saved file.
+    :rtype: str
+    """
+    os.makedirs(results_dir, exist_ok=True)
+    filename = os.path.join(results_dir, f'{results["timestamp"]}.json')
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2)
+    return filename
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark parsing and writing recorded NHL api fixtures.')
+    parser.add_argument('--seasons', type=int, nargs='+', default=SEASONS)
+    parser.add_argument('--outputs', nargs='+', default=OUTPUTS, choices=OUTPUTS)
+    parser.add_argument('--fixture-dir', default=fixtures.FIXTURE_DIR)
+    parser.add_argument('--results-dir', default=RESULTS_DIR)
+    parser.add_argument('--compare', help='previous results file to compare against')
+    parser.add_argument('--synthetic', action='store_true', help='use generated documents instead of fixtures')
+    args = parser.parse_args()
+
+    synthetic = args.synthetic
+    game_feeds, shift_charts = ([], []) if synthetic else load_fixtures(args.fixture_dir)
+    if not game_feeds:
+        if not synthetic:
+            print(f'no recorded game feeds in {args.fixture_dir}, using generated documents instead')
+        synthetic = True
+        game_feeds, shift_charts = synthetic_fixtures()
+
+    results = {
+        'timestamp': datetime.datetime.now().strftime('%Y%m%d-%H%M%S'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'fixtures': {'feeds': len(game_feeds), 'shifts': len(shift_charts), 'synthetic': synthetic},
+        'results': {},
+    }
+    for n in args.seasons:
+        results['results'][str(n)] = run(game_feeds, shift_charts, n, args.outputs)
+        for stage, stage_seconds in results['results'][str(n)]['seconds'].items():
+            print(f'{n} seasons {stage}: {stage_seconds:.2f}s')
+
+    print(f'saved {save(results, args.results_dir)}')
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
@@ -0,0 +1,184 @@
+"""
+Module containing the on-disk response cache used by the client for api documents.
+
+Documents are stored gzip compressed in CACHE_DIR, one file per url. How long a document is kept
+depends on what it describes:
+    past seasons - never expire, rosters, stats, and games from finished seasons don't change.
+    finished games - never expire once the game state is 'Final'.
+    current season - expire after CURRENT_TTL seconds.
+
+Once the cache grows past MAX_BYTES the least recently used documents are deleted.
+
+Usage:
+    parsed = cache.get(url)
+    if parsed is None:
+        parsed = fetch(url)
+        cache.put(url, parsed)
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+import utils
+
+CACHE_DIR = os.getcwd() + '/api_cache/'
+# seconds to keep documents for the season currently being played
+CURRENT_TTL = 60 * 60
+MAX_BYTES = 2 * 1024 ** 3
+
+_SEASON_PATTERNS = [
+    re.compile(r'season=(\d{4})\d{4}'),
+    re.compile(r'/game/(\d{4})\d{6}/'),
+    re.compile(r'gameId=(\d{4})\d{6}'),
+]
+
+_lock = threading.Lock()
+_size = None
+
+
+def _path(url):
+    return CACHE_DIR + hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json.gz'
+
+
+def ttl(url, document):
+    """
+    Return how many seconds a document should be cached for, None if it never expires.
+
+    :param url: Api url the document was requested from.
+    :type url: str
+    :param document: Parsed json document.
+    :type document: dict
+    :return: Seconds to keep the document, or None to keep it forever.
+    :rtype: int or None
+    """
+    try:
+        if document['gameData']['status']['abstractGameState'] == 'Final':
+            return None
+    except (KeyError, TypeError):
+        pass
+
+    for pattern in _SEASON_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            if int(match.group(1)) < utils.current_season():
+                return None
+            break
+
+    return CURRENT_TTL
+
+
+def get(url):
+    """
+    Return the cached document for the given url, None if it isn't cached or has expired.
+
+    :param url: Api url to look up.
+    :type url: str
+    :return: Parsed json document.
+    :rtype: dict or None
+    """
+    path = _path(url)
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if entry['url'] != url or (entry['expires'] is not None and entry['expires'] < time.time()):
+        return None
+
+    # touch the file so eviction removes the least recently used documents first
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return entry['document']
+
+
+def put(url, document):
+    """
+    Store a document for the given url and evict old documents if the cache is over MAX_BYTES.
+
+    :param url: Api url the document was requested from.
+    :type url: str
+    :param document: Parsed json document.
+    :type document: dict
+    """
+    global _size
+    seconds = ttl(url, document)
+    entry = {
+        'url': url,
+        'expires': None if seconds is None else time.time() + seconds,
+        'document': document,
+    }
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _path(url)
+    # every thread and worker process writes its own temporary file, the last one replaced is kept
+    with tempfile.NamedTemporaryFile(dir=CACHE_DIR, suffix='.tmp', delete=False) as raw:
+        with gzip.open(raw, 'wt', encoding='utf-8') as f:
+            json.dump(entry, f)
+
+    with _lock:
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        os.replace(raw.name, path)
+        if _size is None:
+            _size = _dir_size()
+        else:
+            _size += os.path.getsize(path) - replaced
+        if _size > MAX_BYTES:
+            _size = evict(int(MAX_BYTES * 0.9))
+
+
+def _dir_size():
+    try:
+        return sum(entry.stat().st_size for entry in os.scandir(CACHE_DIR) if entry.is_file())
+    except OSError:
+        return 0
+
+
+def evict(max_bytes=MAX_BYTES):
+    """
+    Delete the least recently used documents until the cache is at most max_bytes.
+
+    :param max_bytes: Size in bytes to shrink the cache to.
+    :type max_bytes: int
+    :return: Size of the cache in bytes after evicting.
+    :rtype: int
+    """
+    try:
+        files = [entry for entry in os.scandir(CACHE_DIR) if entry.is_file()]
+    except OSError:
+        return 0
+
+    files = sorted(files, key=lambda entry: entry.stat().st_mtime)
+    size = sum(entry.stat().st_size for entry in files)
+    for entry in files:
+        if size <= max_bytes:
+            break
+        entry_size = entry.stat().st_size
+        try:
+            os.remove(entry.path)
+            size -= entry_size
+        except OSError:
+            pass
+
+    return size
+
+
+def clear():
+    """
+    Delete every document in the cache.
+    """
+    global _size
+    with _lock:
+        evict(0)
+        _size = 0
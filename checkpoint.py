@@ -0,0 +1,112 @@
+"""
+Module used to checkpoint the units of work a scrape job has finished so a restarted job can resume.
+
+A unit is a single game for game level writers, a season for team and roster writers, and a player
+season for player stats. Units are marked as they are scraped but only committed to FILENAME once the
+writer has written their rows to its output, so a job that dies never skips data it didn't write.
+Checkpoints are kept per output file and kind, writing the same seasons to a new file starts over.
+
+Usage:
+    done = checkpoint.Checkpoint(filename, 'game')
+    for game in games:
+        if done.is_done(game):
+            continue
+        ...
+        done.mark(game)
+    sink.close()
+    done.commit()
+"""
+
+import json
+import os
+import threading
+
+FILENAME = os.getcwd() + '/checkpoint.json'
+
+_lock = threading.Lock()
+
+
+def _load(filename):
+    if not os.path.exists(filename):
+        return {}
+    with open(filename) as f:
+        return json.load(f)
+
+
+def _unit(unit):
+    # games are passed as (season, game_type, game_number) and stored as their game id
+    if isinstance(unit, (tuple, list)):
+        return ''.join(str(part) for part in unit)
+    return str(unit)
+
+
+class Checkpoint:
+    """
+    Completed units of one kind of work written to one output.
+
+    :param target: Output file or directory the units are written to.
+    :type target: str
+    :param kind: Type of work e.g. 'game', 'shift', 'player', 'team', 'roster'.
+    :type kind: str
+    :param filename: Path of the checkpoint json file.
+    :type filename: str
+    """
+
+    def __init__(self, target, kind, filename=FILENAME):
+        self.target = os.path.abspath(target)
+        self.kind = kind
+        self.filename = filename
+        with _lock:
+            self._done = set(_load(filename).get(self.target, {}).get(kind, []))
+        self._pending = set()
+
+    def is_done(self, unit):
+        """
+        Check if a unit was committed by a previous run.
+
+        :param unit: Game tuple, season, or any other unit id.
+        :type unit: tuple or str or int
+        :return: True if the unit can be skipped.
+        :rtype: bool
+        """
+        return _unit(unit) in self._done
+
+    def mark(self, unit):
+        """
+        Mark a unit as scraped. It is only skipped by later runs after commit is called.
+
+        :param unit: Game tuple, season, or any other unit id.
+        :type unit: tuple or str or int
+        """
+        self._pending.add(_unit(unit))
+
+    def commit(self):
+        """
+        Save every marked unit, call once their rows have been written to the output.
+        The file is re-read before saving so checkpoints of other writers aren't lost.
+        """
+        if not self._pending:
+            return
+        with _lock:
+            saved = _load(self.filename)
+            units = set(saved.setdefault(self.target, {}).get(self.kind, [])) | self._done | self._pending
+            saved[self.target][self.kind] = sorted(units)
+            # write to a temporary file first so a crash mid-write can't corrupt every checkpoint
+            tmp = f'{self.filename}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(saved, f)
+            os.replace(tmp, self.filename)
+        self._done |= self._pending
+        self._pending = set()
+
+    def reset(self):
+        """
+        Forget every committed unit so the next run scrapes everything again.
+        """
+        with _lock:
+            saved = _load(self.filename)
+            saved.get(self.target, {}).pop(self.kind, None)
+            with open(self.filename, 'w') as f:
+                json.dump(saved, f)
+        self._done = set()
+        self._pending = set()
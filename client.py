@@ -0,0 +1,374 @@
+"""
+Module containing the shared http client used by api_parse for every request to the NHL apis.
+
+A single requests.Session is created lazily and reused by every fetcher so connections to
+statsapi.web.nhl.com and api.nhle.com are pooled and kept alive between calls instead of doing
+a fresh TCP + TLS handshake for every game, player, or team requested.
+Parsed documents are also stored in the on-disk response cache (see cache.py) so documents that
+can no longer change are only ever downloaded once.
+
+The client can also record every response to a fixture directory, replay recorded responses without
+any network access, or send requests to a local stand-in server instead of the real apis (see fixtures.py).
+
+Usage:
+    parsed = client.get_json('https://statsapi.web.nhl.com/api/v1/teams')
+
+    # optionally tune the client before scraping
+    client.configure(timeout=(5, 60), pool_size=20)
+
+    # or only for the requests made in a block
+    with client.configured(rate=5, burst=8):
+        ...
+
+    # record responses, then replay them offline
+    client.configure(mode='record')
+    client.configure(mode='replay')
+"""
+
+import contextlib
+import email.utils
+import multiprocessing
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import cache
+import fixtures
+import telemetry
+
+# (connect, read) timeout in seconds passed to every request
+TIMEOUT = (5, 30)
+# number of hosts to keep connection pools for and number of connections kept per host
+POOL_HOSTS = 4
+POOL_SIZE = 10
+HEADERS = {
+    'Accept': 'application/json',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+}
+# read and write api documents through the on-disk response cache
+CACHE = True
+# requests per second made over the network, cached documents don't count towards the limit
+RATE = 1
+# failed requests are retried with exponential backoff, doubling from BACKOFF_BASE up to BACKOFF_MAX seconds
+MAX_RETRIES = 6
+BACKOFF_BASE = 2
+BACKOFF_MAX = 300
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# 'live' makes real requests, 'record' also saves every response to FIXTURE_DIR,
+# 'replay' only serves responses from FIXTURE_DIR and never touches the network
+MODE = 'live'
+FIXTURE_DIR = fixtures.FIXTURE_DIR
+# send requests to e.g. 'http://localhost:8765' instead of the api hosts, used with the fixtures stand-in server
+BASE_URL = None
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket used to cap the number of requests made per second.
+    Tokens refill continuously at the given rate up to burst, every request takes one token
+    and blocks until one is available.
+
+    :param rate: Requests allowed per second.
+    :type rate: float
+    :param burst: Maximum number of requests that can be made back to back.
+    :type burst: int
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take a token from the bucket, sleeping until one is available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # reserve the token now so concurrent callers queue up behind this one
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+    def slow_down(self, factor=0.5, minimum=0.1):
+        """
+        Reduce the allowed request rate, used when the api responds with 429 Too Many Requests.
+
+        :param factor: Multiplier applied to the current rate.
+        :type factor: float
+        :param minimum: Lowest rate in requests per second the limiter can be reduced to.
+        :type minimum: float
+        """
+        with self._lock:
+            self.rate = max(minimum, self.rate * factor)
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    Token bucket kept in shared memory so every process it is passed to draws from one request budget.
+    Create it in the parent process and hand it to the workers through the pool initializer,
+    see configure(limiter=...). Slowing down after a 429 slows down every process.
+
+    :param rate: Requests allowed per second across every process.
+    :type rate: float
+    :param burst: Maximum number of requests that can be made back to back.
+    :type burst: int
+    """
+
+    def __init__(self, rate, burst=1):
+        self.burst = burst
+        # [tokens, time of the last refill, rate], wall clock time as every process has to agree on it
+        self._state = multiprocessing.Array('d', [burst, time.time(), rate])
+
+    @property
+    def rate(self):
+        return self._state[2]
+
+    def acquire(self):
+        """
+        Take a token from the shared bucket, sleeping until one is available.
+        """
+        state = self._state
+        with state.get_lock():
+            now = time.time()
+            tokens = min(self.burst, state[0] + (now - state[1]) * state[2])
+            state[1] = now
+            # reserve the token now so other processes queue up behind this one
+            state[0] = tokens - 1
+            wait = (1 - tokens) / state[2] if tokens < 1 else 0
+        if wait:
+            time.sleep(wait)
+
+    def slow_down(self, factor=0.5, minimum=0.1):
+        """
+        Reduce the allowed request rate of every process.
+
+        :param factor: Multiplier applied to the current rate.
+        :type factor: float
+        :param minimum: Lowest rate in requests per second the limiter can be reduced to.
+        :type minimum: float
+        """
+        with self._state.get_lock():
+            self._state[2] = max(minimum, self._state[2] * factor)
+
+
+_rate_limiter = RateLimiter(RATE)
+
+
+def configure(timeout=None, pool_size=None, headers=None, rate=None, burst=1, use_cache=None, mode=None,
+              fixture_dir=None, base_url=None, limiter=None):
+    """
+    Update the client settings used for all following requests.
+    The current session is closed and will be recreated with the new settings on the next request.
+    Passing a rate limits every request made through the client, rate=0 removes the limit.
+
+    :param timeout: (connect, read) timeout in seconds, or a single number for both.
+    :type timeout: tuple of float or float
+    :param pool_size: Maximum number of connections kept alive per host.
+    :type pool_size: int
+    :param headers: Extra headers to send with every request.
+    :type headers: dict
+    :param rate: Maximum requests per second across all threads.
+    :type rate: float
+    :param burst: Number of requests allowed back to back when rate limited.
+    :type burst: int
+    :param use_cache: Whether get_json should use the on-disk response cache.
+    :type use_cache: bool
+    :param mode: 'live', 'record', or 'replay'.
+    :type mode: str
+    :param fixture_dir: Directory responses are recorded to and replayed from.
+    :type fixture_dir: str
+    :param base_url: Url of a stand-in server to send requests to instead of the api hosts, '' to reset.
+    :type base_url: str
+    :param limiter: Rate limiter to use instead of one created from rate e.g. a SharedRateLimiter.
+    :type limiter: RateLimiter
+    """
+    global TIMEOUT, POOL_SIZE, CACHE, RATE, MODE, FIXTURE_DIR, BASE_URL, _rate_limiter
+    if timeout is not None:
+        TIMEOUT = timeout
+    if pool_size is not None:
+        POOL_SIZE = pool_size
+    if headers is not None:
+        HEADERS.update(headers)
+    if rate is not None:
+        RATE = rate
+        _rate_limiter = RateLimiter(rate, burst) if rate else None
+    if limiter is not None:
+        RATE = limiter.rate
+        _rate_limiter = limiter
+    if use_cache is not None:
+        CACHE = use_cache
+    if mode is not None:
+        MODE = mode
+    if fixture_dir is not None:
+        FIXTURE_DIR = fixture_dir
+    if base_url is not None:
+        BASE_URL = base_url or None
+    close()
+
+
+@contextlib.contextmanager
+def configured(**settings):
+    """
+    Context manager applying configure settings for the duration of its block only.
+    The previous settings, including the rate limiter itself, are restored when the block exits.
+
+    :param settings: Keyword arguments passed to configure.
+    :type settings: dict
+    """
+    global TIMEOUT, POOL_SIZE, CACHE, RATE, MODE, FIXTURE_DIR, BASE_URL, _rate_limiter
+    previous = (TIMEOUT, POOL_SIZE, dict(HEADERS), CACHE, RATE, MODE, FIXTURE_DIR, BASE_URL, _rate_limiter)
+    configure(**settings)
+    try:
+        yield
+    finally:
+        TIMEOUT, POOL_SIZE, headers, CACHE, RATE, MODE, FIXTURE_DIR, BASE_URL, _rate_limiter = previous
+        HEADERS.clear()
+        HEADERS.update(headers)
+        close()
+
+
+def get_session():
+    """
+    Return the shared session, creating it on first use.
+
+    :return: Session with pooled keep-alive connections for every host.
+    :rtype: requests.Session
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers.update(HEADERS)
+            adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_SIZE)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+
+def close():
+    """
+    Close the shared session and release all pooled connections.
+    """
+    global _session
+    if _session is not None:
+        _session.close()
+        _session = None
+
+
+def _backoff(attempt):
+    # exponential backoff with jitter so concurrent requests don't all retry at the same moment
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _retry_after(r):
+    # Retry-After can either be a number of seconds or an http date
+    value = r.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _rewrite(url):
+    # https://statsapi.web.nhl.com/api/v1/... -> {BASE_URL}/statsapi.web.nhl.com/api/v1/...
+    if BASE_URL is None:
+        return url
+    parts = urlsplit(url)
+    query = f'?{parts.query}' if parts.query else ''
+    return f'{BASE_URL.rstrip("/")}/{parts.netloc}{parts.path}{query}'
+
+
+def get(url):
+    """
+    Make a GET request to the given url through the shared session.
+    Connection errors, timeouts, and RETRY_STATUS responses are retried up to MAX_RETRIES times with
+    exponential backoff, honouring the Retry-After header when the api sends one.
+    A 429 response also lowers the client request rate for the rest of the run.
+
+    :param url: Full api url to request.
+    :type url: str
+    :return: Response from the api.
+    :rtype: requests.Response
+    :raises requests.exceptions.RequestException: If the request still fails after every retry.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        if _rate_limiter is not None:
+            _rate_limiter.acquire()
+        start = time.perf_counter()
+        try:
+            r = get_session().get(_rewrite(url), timeout=TIMEOUT)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            telemetry.observe_request(url, time.perf_counter() - start, error=True)
+            if attempt == MAX_RETRIES:
+                raise
+            delay = _backoff(attempt)
+        else:
+            telemetry.observe_request(url, time.perf_counter() - start, len(r.content), not r.ok)
+            if r.status_code not in RETRY_STATUS:
+                return r
+            if attempt == MAX_RETRIES:
+                r.raise_for_status()
+            if r.status_code == 429 and _rate_limiter is not None:
+                _rate_limiter.slow_down()
+            delay = _retry_after(r)
+            if delay is None:
+                delay = _backoff(attempt)
+        telemetry.count('retries')
+        print(f'retrying in {delay:.1f}s: {url}')
+        time.sleep(delay)
+
+
+def get_json(url):
+    """
+    Make a GET request to the given url and return the parsed json document.
+    Documents found in the response cache are returned without making a request.
+    In replay mode the recorded document is returned instead.
+
+    :param url: Full api url to request.
+    :type url: str
+    :return: Parsed json response.
+    :rtype: dict
+    :raises requests.exceptions.ConnectionError: In replay mode if the url was never recorded.
+    """
+    if MODE == 'replay':
+        entry = fixtures.load(url, FIXTURE_DIR)
+        if entry is None:
+            raise requests.exceptions.ConnectionError(f'no fixture recorded for {url}')
+        return entry['document']
+
+    # always go to the api when recording so every response ends up in the fixtures
+    if CACHE and MODE != 'record':
+        parsed = cache.get(url)
+        if parsed is not None:
+            telemetry.count('cache_hits')
+            return parsed
+
+    r = get(url)
+    with telemetry.timer('json'):
+        parsed = r.json()
+    if CACHE and r.ok:
+        cache.put(url, parsed)
+    if MODE == 'record':
+        fixtures.save(url, parsed, r.status_code, FIXTURE_DIR)
+    return parsed
@@ -0,0 +1,154 @@
+"""
+Module used to keep track of api requests that still failed after the client retried them.
+
+Scrapers add the arguments of a failed fetch under a kind e.g. 'game' or 'player' and keep going
+instead of stalling the whole run. At the end of a run the failed requests are retried once and any
+that still fail are saved to FILENAME so a later run can retry only those.
+
+Requests saved by an older version of a scraper are fitted to the arguments its fetch function takes now,
+keys that can't be fitted are logged and dropped instead of aborting the retry.
+
+Usage:
+    dead_letter.add('game', {'season': '2015', 'game_type': '02', 'game_number': '0001'})
+    for key, stats in dead_letter.retry('game', api.get_game_stats):
+        ...
+    dead_letter.save()
+"""
+
+import inspect
+import json
+import os
+import threading
+
+import requests
+
+FILENAME = os.getcwd() + '/dead_letter.json'
+
+_failed = {}
+_lock = threading.Lock()
+
+
+def _add(kind, key):
+    with _lock:
+        keys = _failed.setdefault(kind, [])
+        if key not in keys:
+            keys.append(key)
+
+
+def add(kind, key):
+    """
+    Record a failed request.
+
+    :param kind: Type of request that failed e.g. 'game', 'shift', 'player', 'team', 'roster'.
+    :type kind: str
+    :param key: Keyword arguments the fetch function was called with.
+    :type key: dict
+    """
+    _add(kind, key)
+    print(f'failed {kind}: {key}')
+
+
+def pop(kind, seasons=None):
+    """
+    Remove and return the failed requests of a kind, optionally only those from the given seasons.
+
+    :param kind: Type of request.
+    :type kind: str
+    :param seasons: Seasons to return keys for, all keys are returned if not given.
+    :type seasons: list of str
+    :return: List of keyword arguments for every failed request.
+    :rtype: list of dict
+    """
+    with _lock:
+        keys = _failed.get(kind, [])
+        if seasons is None:
+            _failed[kind] = []
+            return keys
+        seasons = [str(season)[:4] for season in seasons]
+        popped = [key for key in keys if str(key['season'])[:4] in seasons]
+        _failed[kind] = [key for key in keys if key not in popped]
+        return popped
+
+
+def _fit(fetch, key):
+    """
+    Fit a saved key to the keyword arguments a fetch function takes, dropping arguments it no longer takes
+    e.g. the team_id of teams that used to be requested one at a time.
+
+    :param fetch: Function the key is retried with.
+    :type fetch: callable
+    :param key: Keyword arguments of the failed request.
+    :type key: dict
+    :return: Keyword arguments fetch can be called with, None if the key is missing some it needs.
+    :rtype: dict
+    """
+    signature = inspect.signature(fetch)
+    if not any(param.kind == param.VAR_KEYWORD for param in signature.parameters.values()):
+        key = {name: value for name, value in key.items() if name in signature.parameters}
+    try:
+        signature.bind(**key)
+    except TypeError:
+        return None
+    return key
+
+
+def retry(kind, fetch, seasons=None):
+    """
+    Retry every failed request of a kind once. Requests that fail again are added back.
+
+    :param kind: Type of request.
+    :type kind: str
+    :param fetch: Function to call with the keyword arguments of each failed request.
+    :type fetch: callable
+    :param seasons: Only retry requests from these seasons.
+    :type seasons: list of str
+    :return: List of (key, result) for every request that succeeded.
+    :rtype: list of (dict, object)
+    """
+    results = []
+    keys = []
+    for saved in pop(kind, seasons):
+        key = _fit(fetch, saved)
+        if key is None:
+            print(f'dropping {kind}: {saved} does not match the arguments it is retried with')
+        elif key not in keys:
+            keys.append(key)
+    for key in keys:
+        try:
+            results.append((key, fetch(**key)))
+        except requests.exceptions.RequestException:
+            add(kind, key)
+    return results
+
+
+def load(filename=FILENAME):
+    """
+    Load previously saved failed requests, merging them with any already recorded.
+    Writers load the saved requests at the start of a run so saving at the end keeps every kind.
+
+    :param filename: Path of the saved json file.
+    :type filename: str
+    """
+    if not os.path.exists(filename):
+        return
+    with open(filename) as f:
+        saved = json.load(f)
+    for kind, keys in saved.items():
+        for key in keys:
+            _add(kind, key)
+
+
+def save(filename=FILENAME):
+    """
+    Save every failed request not yet retried successfully, removing the file if there are none.
+
+    :param filename: Path to save the json file to.
+    :type filename: str
+    """
+    with _lock:
+        failed = {kind: keys for kind, keys in _failed.items() if keys}
+    if failed:
+        with open(filename, 'w') as f:
+            json.dump(failed, f, indent=2)
+    elif os.path.exists(filename):
+        os.remove(filename)
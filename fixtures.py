@@ -0,0 +1,166 @@
+"""
+Module used for recording api responses to a fixture directory and serving them back offline.
+
+Fixtures are written by the client when it is configured with mode='record' and can be replayed
+either in-process with mode='replay' or over http with the stand-in server in this module, which
+lets the scrapers be benchmarked and tested on machines with no network.
+
+Usage:
+    # record real responses while scraping
+    client.configure(mode='record')
+    main.write_game_stats(filename, 2015)
+
+    # replay them in-process
+    client.configure(mode='replay')
+
+    # or serve them over http with 50ms of latency and 5% of requests failing
+    python fixtures.py --port 8765 --latency 0.05 --error-rate 0.05
+    client.configure(base_url='http://localhost:8765')
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+FIXTURE_DIR = os.getcwd() + '/fixtures/'
+
+
+def path(url, fixture_dir=FIXTURE_DIR):
+    """
+    Return the fixture file path for a url. Fixtures are grouped in a directory per api host.
+
+    :param url: Api url.
+    :type url: str
+    :param fixture_dir: Directory fixtures are stored in.
+    :type fixture_dir: str
+    :return: Path of the fixture file.
+    :rtype: str
+    """
+    host = urlsplit(url).netloc
+    return os.path.join(fixture_dir, host, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json.gz')
+
+
+def save(url, document, status=200, fixture_dir=FIXTURE_DIR):
+    """
+    Record an api response.
+
+    :param url: Api url the document was requested from.
+    :type url: str
+    :param document: Parsed json document.
+    :type document: dict
+    :param status: Http status code of the response.
+    :type status: int
+    :param fixture_dir: Directory fixtures are stored in.
+    :type fixture_dir: str
+    """
+    fixture = path(url, fixture_dir)
+    os.makedirs(os.path.dirname(fixture), exist_ok=True)
+    with gzip.open(fixture, 'wt', encoding='utf-8') as f:
+        json.dump({'url': url, 'status': status, 'document': document}, f)
+
+
+def load(url, fixture_dir=FIXTURE_DIR):
+    """
+    Load a recorded api response.
+
+    :param url: Api url to look up.
+    :type url: str
+    :param fixture_dir: Directory fixtures are stored in.
+    :type fixture_dir: str
+    :return: Recorded entry with 'url', 'status', and 'document' keys, None if the url wasn't recorded.
+    :rtype: dict or None
+    """
+    try:
+        with gzip.open(path(url, fixture_dir), 'rt', encoding='utf-8') as f:
+            return json.load(f)
+    except OSError:
+        return None
+
+
+def iter_fixtures(fixture_dir=FIXTURE_DIR):
+    """
+    Iterate over every recorded api response.
+
+    :param fixture_dir: Directory fixtures are stored in.
+    :type fixture_dir: str
+    :return: Recorded entries with 'url', 'status', and 'document' keys.
+    :rtype: iterator of dict
+    """
+    for root, _, files in os.walk(fixture_dir):
+        for name in sorted(files):
+            if name.endswith('.json.gz'):
+                with gzip.open(os.path.join(root, name), 'rt', encoding='utf-8') as f:
+                    yield json.load(f)
+
+
+def _handler(fixture_dir, latency, error_rate, error_status):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        # the client requests {base_url}/{api host}/{path} so the original url can be rebuilt
+        def do_GET(self):
+            time.sleep(latency)
+            if random.random() < error_rate:
+                self._send(error_status, {'message': 'Injected error'}, {'Retry-After': '1'})
+                return
+
+            url = 'https:/' + self.path
+            entry = load(url, fixture_dir)
+            if entry is None:
+                self._send(404, {'message': 'Object not found'})
+            else:
+                self._send(entry['status'], entry['document'])
+
+        def _send(self, status, document, headers=None):
+            body = json.dumps(document).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FixtureHandler
+
+
+def serve(port=8765, fixture_dir=FIXTURE_DIR, latency=0.0, error_rate=0.0, error_status=503):
+    """
+    Serve recorded fixtures over http as a local stand-in for the NHL apis.
+    Point the client at the server with client.configure(base_url=f'http://localhost:{port}').
+
+    :param port: Port to listen on.
+    :type port: int
+    :param fixture_dir: Directory fixtures are stored in.
+    :type fixture_dir: str
+    :param latency: Seconds to wait before answering every request.
+    :type latency: float
+    :param error_rate: Fraction of requests, from 0 to 1, answered with error_status instead.
+    :type error_rate: float
+    :param error_status: Http status code returned for injected errors e.g. 429 or 503.
+    :type error_status: int
+    """
+    server = ThreadingHTTPServer(('localhost', port), _handler(fixture_dir, latency, error_rate, error_status))
+    print(f'serving {fixture_dir} on http://localhost:{port}')
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve recorded NHL api fixtures.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--fixture-dir', default=FIXTURE_DIR)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds of latency added to every response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with an error')
+    parser.add_argument('--error-status', type=int, default=503)
+    args = parser.parse_args()
+    serve(args.port, args.fixture_dir, args.latency, args.error_rate, args.error_status)
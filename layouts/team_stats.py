@@ -40,11 +40,16 @@ STATS = [i for i in DATA.columns if i not in ['Season', 'Team', 'Games Played']]
 with sqlite3.connect('../nhl_stats.db') as connection:
     cursor = connection.cursor()
     cursor.execute('SELECT * FROM team_season_stats')
-    GAME_DATA = pd.read_sql_query('SELECT * FROM game_stats_teams', connection)
+    # boxscore and linescore only scrapes write their team rows to their own tables, use those without full rows
+    tables = [row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+    GAME_TABLE = next((table for table in ['game_stats_teams', 'game_stats_teams_boxscore',
+                                           'game_stats_teams_linescore'] if table in tables), 'game_stats_teams')
+    GAME_DATA = pd.read_sql_query(f'SELECT * FROM {GAME_TABLE}', connection)
 
 GAME_DATA = GAME_DATA.sort_values(by=['Season', 'Team'])
 GAME_STATS = [i for i in GAME_DATA.columns if i not in
-              ['Season', 'Game Type', 'Game Number', 'Home', 'Away', 'Team', 'Game Time']]
+              ['Season', 'Game Type', 'Game Number', 'Home ID', 'Home', 'Away ID', 'Away', 'Team ID', 'Team',
+               'Game Time', 'Final Goals', 'Final Period', 'Shootout']]
 
 team_layout = html.Div([
     # Page Links
@@ -355,8 +360,8 @@ def all_team_stats(team, stats, scale):
 )
 def all_team_stats(season, team, opponent, gametype, stat):
     # query and get api data for chosen team and season
-    query = """
-        SELECT * FROM game_stats_teams 
+    query = f"""
+        SELECT * FROM {GAME_TABLE}
         WHERE Season=:season 
         AND Team=:team
         """
@@ -373,13 +378,16 @@ def all_team_stats(season, team, opponent, gametype, stat):
         query += ' AND (Home=:opponent OR Away=:opponent)'
         params['opponent'] = opponent
 
+    # upserted games are inserted again at the end of the table, keep the running average in game order
+    query += ' ORDER BY "Game Time"'
+
+    # game times are stored as the api's UTC text
     with sqlite3.connect('../nhl_stats.db') as c:
-        df = pd.read_sql_query(query, con=c, params=params)
+        df = pd.read_sql_query(query, con=c, params=params, parse_dates={'Game Time': {'utc': True}})
 
     # set hover text for game specific data
     # TODO update hovertext to specify 'individual' stat
     cols = ['Home', 'Away', 'Game Time', stat]
-    df['Game Time'] = pd.to_datetime(df['Game Time'], infer_datetime_format=True)
     hovertext = df[cols].to_dict('records')
     hovertext = [''.join([f'{j}: {i[j]}<br>' for j in i]) for i in hovertext]
     # create bool mask for color coding points for home/away games
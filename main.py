@@ -1,9 +1,13 @@
 """
 Module used for writing large amounts of api data to different xlsx spreadsheets for personal use.
+Every writer can also write partitioned parquet datasets instead with output='parquet', or straight
+into the SQLite database read by the dashboard with output='sqlite', see sinks.py.
 
 Contains functions used to get data for:
     write_season_team_stats - get all team data for given seasons.
+    write_derived_team_stats - derive team season stats and ranks from already scraped game data.
     write_season_player_stats - get all season stats for all players.
+    write_derived_player_stats - derive full season, home, and away player stats from already scraped game data.
     write_game_stats - gets all game specific data for all games in given seasons.
     write_player_ids - gets the full rosters from every team for all seasons given.
     write_shift_data - gets the shift information from every game for given seasons.
@@ -15,65 +19,181 @@ NOTE:
 
     Shift data does not appear to be collected prior to 2010.
     Trying to get data before 2010 will result in an empty dataframe
+
+    Requests that still fail after the client retries them are skipped and recorded with dead_letter.
+    They are retried at the end of the run and anything still failing is saved to dead_letter.FILENAME.
+    Passing retry_only=True to a writer retries only those saved requests for the given seasons.
+
+    Finished games, past seasons, and player seasons are checkpointed with checkpoint once written,
+    a writer restarted for the same file and seasons skips them. Pass resume=False to scrape them again.
+
+    Game and shift writers write their rows to the sink every CHUNK_GAMES games. With output='parquet'
+    memory use stays flat however many seasons are scraped, xlsx files can only be written whole so
+    their rows are still kept in memory until the end of the run.
+    Passing processes scrapes and parses the chunks in worker processes sharing PROCESS_RATE requests
+    per second, the rows are still written in season and game order.
+
+    Event 'Period Time' and shift start, end, and duration 'mm:ss' clocks are kept and get integer
+    seconds columns next to them, plus seconds since the start of the game, see EVENT_CLOCKS and SHIFT_CLOCKS.
+    Game level tables are converted to the compact column types declared in schema.py before being written.
+    Game level rows carry the api's integer player and team ids next to their names, every player and team
+    seen is written once to the player_info and team_info dimension tables.
+    write_game_stats(..., fetch='boxscore') only requests every game's boxscore instead of its much larger
+    play by play, its team and player rows are written to their own game_stats_teams_boxscore and
+    game_stats_players_boxscore tables so they never replace the rows of a full run, see GAME_TABLES.
+    The derived stats writers read those tables back for the games a full run didn't write.
+
+    Request latency, bytes, retries, parse and write time, and rows written are collected with telemetry
+    and saved to telemetry.FILENAME and telemetry.PROMETHEUS_FILENAME at the end of every writer.
 """
 
+import asyncio
+import collections
+import functools
 import os
-import time
+from concurrent.futures import ProcessPoolExecutor
 
 import pandas as pd
 import requests
 
+import aggregate
 import api_parse as api
+import async_scrape
+import checkpoint
+import client
+import dead_letter
+import schema
+import sinks
+import telemetry
 import utils
-import values as v
 
 ROOT = os.getcwd() + '/csv_data/'
 START_SEASON = 2005
 END_SEASON = 2019
-MAX_GAMES = 1271
+# games scraped before their rows are written to the sink, keeps memory use flat however many seasons are scraped
+CHUNK_GAMES = 100
+# requests per second shared by every worker process when scraping with processes
+PROCESS_RATE = 5
+# 'mm:ss' clock columns converted to (seconds, seconds since the start of the game) columns at ingest
+EVENT_CLOCKS = {'Period Time': ('Period Seconds', 'Game Seconds')}
+SHIFT_CLOCKS = {
+    'Shift Start Time': ('Shift Start Seconds', 'Shift Start Game Seconds'),
+    'Shift End Time': ('Shift End Seconds', 'Shift End Game Seconds'),
+    'Shift Duration': ('Shift Duration Seconds', None),
+}
+# tables the event, team, player, player info, and team info rows of every fetch mode are written to,
+# boxscore and linescore rows get their own tables so they never replace the rows of a full fetch
+GAME_TABLES = {
+    'full': ['game_stats_events', 'game_stats_teams', 'game_stats_players', 'player_info', 'team_info'],
+    'boxscore': [None, 'game_stats_teams_boxscore', 'game_stats_players_boxscore', None, None],
+    'linescore': [None, 'game_stats_teams_linescore', None, None, None],
+}
+
+
+def _completed_season(season):
+    # current season stats keep changing so only past seasons are checkpointed
+    return int(str(season)[:4]) < utils.current_season()
+
+
+def _season_games(season, done=None):
+    """
+    Get every regular season and playoff game in the season schedule not already checkpointed,
+    split into chunks of CHUNK_GAMES games.
 
+    :param season: Year of the start of the season.
+    :type season: str
+    :param done: Checkpoint of finished games to skip.
+    :type done: checkpoint.Checkpoint
+    :return: Chunks of (season, game_type, game_number) tuples.
+    :rtype: list of list of (str, str, str)
+    """
+    games = api.get_season_games(utils.convert_season(int(season)))
+    if done is not None:
+        games = [game for game in games if not done.is_done(game)]
+    return [games[i:i + CHUNK_GAMES] for i in range(0, len(games), CHUNK_GAMES)]
 
-def _game_stats(season):
+
+def _game_stats(season, columns=None, concurrency=None, done=None, flush=None, fetch='full'):
     """
-    Scrape the api and return lists of dicts containing game level data.
-    Gets the game data for every game in the season for regular season and playoffs.
-    Returns lists of all event data, team data, and player data.
+    Scrape the api and collect game level data into a columnar builder.
+    Gets the game data for every game in the season schedule for regular season and playoffs.
+    Event data, team data, and player data are appended straight into per-column lists.
+    If concurrency is given, games are requested concurrently with async_scrape instead of one at a time.
+    If flush is given it is called with the builder after every chunk of CHUNK_GAMES games.
 
     Usage:
-        events_data, team_data, player_data = _game_stats(20152016)
+        events_df, team_df, player_df = _game_stats('2015').to_frames()
 
-    :param season: Season to scrape data for.
+    :param season: Year of the start of the season to scrape data for.
     :type season: str
-    :return: List of dicts for event data per game, team stats per game, and player data per game
-    :rtype: (list of dict, list of dict, list of dict)
+    :param columns: Builder to add the games to, a new one is created if not given.
+    :type columns: api_parse.GameColumns
+    :param concurrency: Number of games to request at once.
+    :type concurrency: int
+    :param done: Checkpoint of finished games, games in it are skipped and new ones marked.
+    :type done: checkpoint.Checkpoint
+    :param flush: Function writing the games in the builder and clearing it.
+    :type flush: callable
+    :param fetch: 'full' play by play, or only the 'boxscore' or 'linescore', see api_parse.FETCH_MODES.
+    :type fetch: str
+    :return: Builder holding event data per game, team stats per game, and player data per game
+    :rtype: api_parse.GameColumns
     """
-    # TODO add logic for passing playoff game numbers to collect playoff data
-    game_types = ['02']
-    event_data = []
-    team_data = []
-    player_data = []
-
-    for game_type in game_types:
-        for game in range(1, MAX_GAMES + 1):
-            # request for game needs to be in format 0001
-            game_number = str(game).zfill(4)
-            print(f'{game_type} - {game_number}')
-            stats = api.get_game_stats(season, game_type, game_number)
-            if stats:
-                event_data.extend(stats[0])
-                team_data.extend(stats[1])
-                player_data.extend(stats[2])
-                time.sleep(1)
-            else:
-                break
-
-    return event_data, team_data, player_data
+    if columns is None:
+        columns = api.GameColumns()
+
+    chunks = _season_games(season, done)
+    progress = telemetry.Progress(f'{season} games', sum(len(games) for games in chunks))
+    for games in chunks:
+        if concurrency:
+            asyncio.run(async_scrape.game_stats(games, columns, concurrency, done=done, fetch=fetch))
+        else:
+            for game in _scrape_games(games, columns, fetch):
+                if done is not None:
+                    done.mark(game)
+        if flush is not None:
+            flush(columns)
+        progress.update(len(games))
+
+    return columns
+
+
+def _scrape_games(games, columns, fetch='full'):
+    """
+    Get the game data for every game given one at a time and add it to a columnar builder.
+    Games that fail are recorded with dead_letter and skipped.
+
+    :param games: List of (season, game_type, game_number).
+    :type games: list of (str, str, str)
+    :param columns: Builder to add the games to.
+    :type columns: api_parse.GameColumns
+    :param fetch: 'full' play by play, or only the 'boxscore' or 'linescore', see api_parse.FETCH_MODES.
+    :type fetch: str
+    :return: Games added that are finished and can be checkpointed.
+    :rtype: list of (str, str, str)
+    """
+    finished = []
+    for _season, game_type, game_number in games:
+        print(f'{game_type} - {game_number}')
+        try:
+            parsed = api.get_game_feed(_season, game_type, game_number, fetch)
+        except requests.exceptions.RequestException:
+            # skip the game for now, it is retried at the end of the run
+            dead_letter.add(api.game_kind(fetch),
+                            {'season': _season, 'game_type': game_type, 'game_number': game_number})
+            continue
+        with telemetry.timer('parse'):
+            added = columns.add_game(parsed, _season, game_type, game_number)
+        if added and api.is_final(parsed):
+            finished.append((_season, game_type, game_number))
+    return finished
 
 
 def _season_team_stats(season):
     """
     Scrape the api and return lists of dicts containing season stats for each team.
     Returns lists of all team stats for raw values and season ranks (1st, 3rd, etc.).
+    Every team's stats come from a single league wide request.
 
     Usage:
         stats, ranks = _season_team_stats(20152016)
@@ -83,26 +203,34 @@ def _season_team_stats(season):
     :return: List of dicts for all team stats and all team stat ranks
     :rtype: (list of dict, list of dict)
     """
-    stats_list = []
-    ranks_list = []
-    # dynamically find teams by season instead?
-    # not sure if api lists teams per season - wasting time on api calls
-    for team_id in v.all_teams_by_id:
-        try:
-            stats, ranks = api.get_team_stats(team_id, season=season)
-            time.sleep(1)
-            stats['Team'] = v.all_teams_by_id[team_id]
-            stats_list.append(stats)
+    try:
+        return api.get_league_team_stats(season)
+    except requests.exceptions.RequestException:
+        dead_letter.add('team', {'season': season})
+        return [], []
 
-            ranks_list.append(ranks)
-            ranks['Team'] = v.all_teams_by_id[team_id]
-        except KeyError:
-            pass
 
-    return stats_list, ranks_list
+def _player_stats(player_id, season, player_name=None):
+    """
+    Get every category of season stats for a single player with one request.
+    Home and away stats are returned as two separate rows.
+
+    :param player_id: Api id of the player.
+    :type player_id: int
+    :param season: Season to get stats for.
+    :type season: str
+    :param player_name: Name of the player, looked up from NHL_players.xlsx if not given.
+    :type player_name: str
+    :return: List of dicts of player stats, empty if the player has no stats for the season.
+    :rtype: list of dict
+    """
+    try:
+        return api.get_player_stats_multi(player_id, season, player_name=player_name)
+    except (KeyError, IndexError):
+        return []
 
 
-def _season_player_stats(season):
+def _season_player_stats(season, done=None):
     """
     Scrape the api and return lists of dicts containing season stats for each player.
     Collects player stats for:
@@ -113,89 +241,242 @@ def _season_player_stats(season):
 
     :param season: Season to scrape data for.
     :type season: str
+    :param done: Checkpoint of finished player seasons, players in it are skipped and new ones marked.
+    :type done: checkpoint.Checkpoint
     :return: List of dicts for all player stats.
     :rtype: list of dict
     """
-    # get all players for season so don't have to load from xlsx?
-    # Slower and lots of requests but don't need xlsx dependency
-    players = utils.players_by_id(os.getcwd() + '/NHL_players.xlsx')
-    # different categories of stats for each player
-    stats_by = [
-        'homeAndAway',
-        'goalsByGameSituation',
-        'statsSingleSeason',
-    ]
+    # only request players on the rosters of teams that played this season
+    # instead of every player in NHL_players.xlsx for every season
+    players = {player['ID']: player['Player'] for player in api.get_league_rosters(season)}
     stats_list = []
 
-    def _get_stats(_player_id, _by, _season):
-        try:
-            stats = api.get_player_stats(_player_id, _by, _season)
-            if by == 'homeAndAway':
-                stats_list.append(stats[0])
-                stats_list.append(stats[1])
-            else:
-                stats_list.append(stats)
-        except (KeyError, IndexError):
-            pass
-
-    for player_id in players:
+    progress = telemetry.Progress(f'{season} players', len(players))
+    for player_id, player_name in players.items():
+        progress.update()
+        if done is not None and done.is_done(f'{season}-{player_id}'):
+            continue
         print(player_id)
-        for by in stats_by:
-            # makes LOTS of requests for every player, for different situations, for every season
-            # while loop to to make requests until getting kicked out
-            # pause for the timeout then try to resume
-            while True:
-                try:
-                    _get_stats(player_id, by, season)
-                    break
-                except requests.exceptions.ConnectionError:
-                    print('sleeping')
-                    time.sleep(1800)
+        # every category of stats (home and away, situation, full season) comes back in a single request
+        # the client backs off when being rate limited, anything still failing is retried at the end of the run
+        try:
+            stats_list.extend(_player_stats(player_id, season, player_name))
+        except requests.exceptions.RequestException:
+            dead_letter.add('player', {'player_id': player_id, 'season': season, 'player_name': player_name})
+            continue
+        if done is not None and _completed_season(season):
+            done.mark(f'{season}-{player_id}')
 
     return stats_list
 
 
-def _shift_data(season):
+def _shift_data(season, shifts=None, concurrency=None, done=None, flush=None):
     """
     Scrape the api and return lists of dicts containing shift details for each player.
+    Gets the shifts for every game in the season schedule for regular season and playoffs.
+    If concurrency is given, games are requested concurrently with async_scrape instead of one at a time.
+    If flush is given it is called with the shift list after every chunk of CHUNK_GAMES games.
 
     Usage:
-        shifts = _shift_data(20152016)
+        shifts = _shift_data('2015')
 
-    :param season: Season to scrape data for.
+    :param season: Year of the start of the season to scrape data for.
     :type season: str
+    :param shifts: List to add the shifts to, a new one is created if not given.
+    :type shifts: list of dict
+    :param concurrency: Number of games to request at once.
+    :type concurrency: int
+    :param done: Checkpoint of finished games, games in it are skipped and new ones marked.
+    :type done: checkpoint.Checkpoint
+    :param flush: Function writing the shifts in the list and clearing it.
+    :type flush: callable
     :return: List of dicts for all shift information for every player.
     :rtype: list of dict
     """
-    game_types = ['02']
-    shifts = []
-
-    def _get_stats(_season, _game_type, _game):
-        game_number = str(_game).zfill(4)
-        print(f'{_game_type} - {game_number}')
-        stats = api.get_shift_data(_season, _game_type, game_number)
-        if stats:
-            shifts.extend(stats)
-            time.sleep(1)
-
-    for game_type in game_types:
-        for game in range(1, MAX_GAMES + 1):
-            while True:
-                try:
-                    _get_stats(season, game_type, game)
-                    break
-                except requests.exceptions.ConnectionError:
-                    print('sleeping')
-                    time.sleep(1800)
+    if shifts is None:
+        shifts = []
+
+    chunks = _season_games(season, done)
+    progress = telemetry.Progress(f'{season} shifts', sum(len(games) for games in chunks))
+    for games in chunks:
+        if concurrency:
+            results = asyncio.run(async_scrape.shift_data(games, concurrency))
+        else:
+            results = _scrape_shifts(games)
+        _add_shifts(games, results, shifts, done)
+        if flush is not None:
+            flush(shifts)
+        progress.update(len(games))
 
     return shifts
 
 
-def write_season_team_stats(filename, start_season, end_season=None):
+def _scrape_shifts(games):
+    """
+    Get the shift data for every game given one at a time.
+    Games that fail are recorded with dead_letter and return an empty list.
+
+    :param games: List of (season, game_type, game_number).
+    :type games: list of (str, str, str)
+    :return: List of shift lists for every game, in game order.
+    :rtype: list of list of dict
+    """
+    results = []
+    for _season, game_type, game_number in games:
+        print(f'{game_type} - {game_number}')
+        try:
+            results.append(api.get_shift_data(_season, game_type, game_number))
+        except requests.exceptions.RequestException:
+            dead_letter.add('shift', {'season': _season, 'game_type': game_type, 'game_number': game_number})
+            results.append([])
+    return results
+
+
+def _add_shifts(games, results, shifts, done=None):
+    # shifts of games still in progress keep changing so only games from past seasons are checkpointed
+    for game, stats in zip(games, results):
+        shifts.extend(stats)
+        if stats and done is not None and _completed_season(game[0]):
+            done.mark(game)
+
+
+def _game_frames(columns):
+    """
+    Build the event, team, player, and player and team dimension DataFrames of every game in a columnar
+    builder and clear the builder.
+
+    :param columns: Builder holding the games.
+    :type columns: api_parse.GameColumns
+    :return: Event, team, player, player info, and team info DataFrames with 'prettier' column names.
+    :rtype: (pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame)
+    """
+    with telemetry.timer('frames'):
+        event_df, team_df, player_df = columns.to_frames()
+        player_info_df, team_info_df = columns.dimension_frames()
+    columns.clear()
+    # rename cols from api json format to 'prettier' format, and change col order
+    event_df = utils.rename_cols(event_df)
+    event_df = utils.update_cols(event_df, ['Season', 'Game Type', 'Game Number', 'Player ID', 'Player', 'Team ID',
+                                            'Team'])
+    event_df = utils.add_clock_seconds(event_df, EVENT_CLOCKS)
+    event_df = schema.apply('game_stats_events', event_df)
+
+    team_df = utils.rename_cols(team_df)
+    team_df = utils.update_cols(team_df, ['Season', 'Game Type', 'Game Number', 'Team ID', 'Team'])
+    team_df = schema.apply('game_stats_teams', team_df)
+
+    player_df = utils.rename_cols(player_df)
+    player_df = utils.update_cols(player_df, ['Season', 'Game Type', 'Game Number', 'Player ID', 'Player', 'Team ID',
+                                              'Team'])
+    player_df = schema.apply('game_stats_players', player_df)
+
+    player_info_df = schema.apply('player_info', player_info_df)
+    team_info_df = schema.apply('team_info', team_info_df)
+    return event_df, team_df, player_df, player_info_df, team_info_df
+
+
+def _write_game_stats(sink, frames, fetch='full'):
+    """
+    Write the event, team, player, and dimension DataFrames of a chunk of games to the GAME_TABLES of a
+    fetch mode in a sink.
+
+    :param sink: Sink to write the event, team, player, player info, and team info tables to.
+    :type sink: sinks.ExcelSink or sinks.ParquetSink or sinks.SQLiteSink
+    :param frames: Event, team, player, player info, and team info DataFrames from _game_frames.
+    :type frames: (pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame)
+    :param fetch: Fetch mode the games were scraped with, see api_parse.FETCH_MODES.
+    :type fetch: str
+    """
+    for table, df in zip(GAME_TABLES[fetch], frames):
+        # partial documents only hold some of the rows, and only sparse player and team dimensions
+        if table is not None:
+            sink.write(table, df)
+
+
+def _write_shift_data(sink, shifts):
+    """
+    Write every shift in a list to a sink and clear the list.
+
+    :param sink: Sink to write the shift table to.
+    :type sink: sinks.ExcelSink or sinks.ParquetSink or sinks.SQLiteSink
+    :param shifts: List of shift dicts to write.
+    :type shifts: list of dict
+    """
+    # create dataframes, rename cols from api json format to 'prettier' format, and change col order
+    shift_df = pd.DataFrame(shifts).drop_duplicates()
+    shifts.clear()
+    shift_df = utils.rename_cols(shift_df)
+    shift_df = utils.add_clock_seconds(shift_df, SHIFT_CLOCKS)
+    shift_df = schema.apply('shift_data', shift_df)
+
+    sink.write('shift_data', shift_df)
+
+
+def _init_worker(limiter, mode, fixture_dir, base_url, use_cache):
+    # every worker process shares the parent's request budget and client settings
+    client.configure(limiter=limiter, mode=mode, fixture_dir=fixture_dir, base_url=base_url or '',
+                     use_cache=use_cache)
+    # forked workers start with a copy of the parent's metrics which are already counted there
+    telemetry.reset()
+
+
+def _game_stats_worker(games, fetch='full'):
+    # runs in a worker process, dead letters and metrics are kept per process so they are returned
+    columns = api.GameColumns()
+    finished = _scrape_games(games, columns, fetch)
+    return (_game_frames(columns), finished, dead_letter.pop(api.game_kind(fetch))), telemetry.collect()
+
+
+def _shift_data_worker(games):
+    # runs in a worker process, dead letters and metrics are kept per process so they are returned
+    return (_scrape_shifts(games), dead_letter.pop('shift')), telemetry.collect()
+
+
+def _scrape_parallel(worker, seasons, processes, done=None):
+    """
+    Run a worker on every chunk of CHUNK_GAMES games of the given seasons in a pool of processes.
+    Every process draws from one shared budget of PROCESS_RATE requests per second.
+    Results are returned in season and game order whatever order the workers finish in, so the rows
+    written are the same as scraping one game at a time. Only a few chunks are kept in flight at once.
+
+    :param worker: Function run in the worker processes with a list of games.
+    :type worker: callable
+    :param seasons: Seasons to scrape.
+    :type seasons: list of str
+    :param processes: Number of worker processes.
+    :type processes: int
+    :param done: Checkpoint of finished games to skip.
+    :type done: checkpoint.Checkpoint
+    :return: (games, worker result) for every chunk of games.
+    :rtype: iterator of (list of (str, str, str), object)
+    """
+    chunks = [games for season in seasons for games in _season_games(season[:4], done)]
+    progress = telemetry.Progress('games', sum(len(games) for games in chunks))
+
+    def _result(games, future):
+        result, metrics = future.result()
+        telemetry.merge(metrics)
+        progress.update(len(games))
+        return games, result
+
+    limiter = client.SharedRateLimiter(PROCESS_RATE, burst=processes)
+    initargs = (limiter, client.MODE, client.FIXTURE_DIR, client.BASE_URL, client.CACHE)
+    with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=initargs) as executor:
+        pending = collections.deque()
+        for games in chunks:
+            pending.append((games, executor.submit(worker, games)))
+            if len(pending) > 2 * processes:
+                yield _result(*pending.popleft())
+        while pending:
+            yield _result(*pending.popleft())
+
+
+def write_season_team_stats(filename, start_season, end_season=None, retry_only=False, output='xlsx',
+                            resume=True):
     """
     Function used to write all team stats for every specified season to provided xlsx file.
     Can optionally provide a single season or a start and end season if wanting to scrape a range of seasons.
-    If the provided filename already exists, will append new data to file.
+    If the provided filename already exists, new data is added to it, replacing existing rows with the same key.
     Output xlsx will write data to individual 'Stats' and 'Ranks' tabs.
 
     :param filename: Complete filepath to write data to.
@@ -204,26 +485,48 @@ def write_season_team_stats(filename, start_season, end_season=None):
     :type start_season: int or str
     :param end_season: Final season to get data from (inclusive).
     :type end_season: int or str
+    :param retry_only: Only retry the failed requests saved by a previous run.
+    :type retry_only: bool
+    :param output: 'xlsx' to write a single xlsx file, 'parquet' to write partitioned parquet datasets
+        to the filename directory, 'sqlite' to write tables to the filename SQLite database.
+    :type output: str
+    :param resume: Skip the games and seasons a previous run already wrote to filename.
+    :type resume: bool
     """
-    writer = pd.ExcelWriter(filename, engine='xlsxwriter')
+    sink = sinks.open_sink(filename, output)
 
     # format seasons to be api-friendly
     if end_season is not None:
         seasons = utils.get_season_list(start_season, end_season)
     else:
         seasons = utils.get_season_list(start_season, start_season)
+    dead_letter.load()
+    done = checkpoint.Checkpoint(filename, 'team')
+    if not resume:
+        done.reset()
 
     stats_list = []
     ranks_list = []
 
     try:
-        for season in seasons:
+        for season in seasons if not retry_only else []:
+            if done.is_done(season):
+                continue
             print(season)
             stats, ranks = _season_team_stats(season)
             stats_list.extend(stats)
             ranks_list.extend(ranks)
+            if stats and _completed_season(season):
+                done.mark(season)
+
+        for key, (stats, ranks) in dead_letter.retry('team', api.get_league_team_stats, seasons):
+            stats_list.extend(stats)
+            ranks_list.extend(ranks)
+            if _completed_season(key['season']):
+                done.mark(key['season'])
     # make sure to write whatever function has managed to scrape in event of error
     finally:
+        dead_letter.save()
         # create dataframes, rename cols from api json format to 'prettier' format, and change col order
         df_stats = pd.DataFrame(stats_list)
         df_stats = utils.rename_cols(df_stats)
@@ -233,24 +536,71 @@ def write_season_team_stats(filename, start_season, end_season=None):
         df_ranks = utils.rename_cols(df_ranks)
         df_ranks = utils.update_cols(df_ranks, ['Season', 'Team'])
 
-        if os.path.exists(filename):
-            # load previous dataframe and append newest data
-            og_stats = pd.read_excel(filename, sheet_name='Stats')
-            df_stats = og_stats.append(df_stats, ignore_index=True).drop_duplicates()
+        sink.write('team_season_stats', df_stats)
+        sink.write('team_season_ranks', df_ranks)
+        sink.close()
+        # only checkpoint what has actually been written
+        done.commit()
+        telemetry.save()
 
-            og_ranks = pd.read_excel(filename, sheet_name='Ranks')
-            df_ranks = og_ranks.append(df_ranks, ignore_index=True).drop_duplicates()
 
-        df_stats.to_excel(writer, index=False, sheet_name='Stats')
-        df_ranks.to_excel(writer, index=False, sheet_name='Ranks')
-        writer.close()
+def write_derived_team_stats(filename, games_filename, start_season, end_season=None, output='xlsx',
+                             games_output=None):
+    """
+    Function used to write team stats and ranks for every specified season to provided xlsx file, derived
+    from the game level data a previous write_game_stats run wrote to games_filename instead of the api.
+    Games only scraped with fetch='boxscore' or 'linescore' are read from their own tables, see
+    sinks.load_game_table.
+    Only regular season games are counted and no requests are made, so seasons can be recomputed at any time.
+    If the provided filename already exists, new data is added to it, replacing existing rows with the same key.
+    Output xlsx will write data to individual 'Stats' and 'Ranks' tabs.
+
+    :param filename: Complete filepath to write data to.
+    :type filename: str
+    :param games_filename: Complete filepath write_game_stats wrote the game data to, can be the same as
+        filename for parquet and sqlite output.
+    :type games_filename: str
+    :param start_season: Start season to derive stats for.
+    :type start_season: int or str
+    :param end_season: Final season to derive stats for (inclusive).
+    :type end_season: int or str
+    :param output: 'xlsx' to write a single xlsx file, 'parquet' to write partitioned parquet datasets
+        to the filename directory, 'sqlite' to write tables to the filename SQLite database.
+    :type output: str
+    :param games_output: Output format of games_filename, same as output if not given.
+    :type games_output: str
+    """
+    if end_season is None:
+        end_season = start_season
+    seasons = utils.get_season_list(start_season, end_season)
+    games_output = games_output or output
+
+    team_df = sinks.load_game_table(games_filename, 'game_stats_teams', games_output, seasons)
+    event_df = sinks.load_table(games_filename, 'game_stats_events', games_output, seasons,
+                                columns=['Season', 'Game Type', 'Game Number', 'Team', 'Event', 'Outcome', 'Period',
+                                         'Period Time', 'Strength'])
+    player_df = sinks.load_game_table(games_filename, 'game_stats_players', games_output, seasons,
+                                      columns=['Season', 'Game Type', 'Game Number', 'Team', 'Faceoff Win',
+                                               'Faceoff Taken', 'faceoffTaken'])
+    with telemetry.timer('aggregate'):
+        df_stats = aggregate.team_season_stats(team_df, event_df, player_df)
+        df_ranks = aggregate.team_season_ranks(df_stats)
+
+    sink = sinks.open_sink(filename, output)
+    try:
+        sink.write('team_season_stats', df_stats)
+        sink.write('team_season_ranks', df_ranks)
+    finally:
+        sink.close()
+        telemetry.save()
 
 
-def write_season_player_stats(filename, start_season, end_season=None):
+def write_season_player_stats(filename, start_season, end_season=None, retry_only=False, output='xlsx',
+                              resume=True):
     """
     Function used to write all player stats for every specified season to provided xlsx file.
     Can optionally provide a single season or a start and end season if wanting to scrape a range of seasons.
-    If the provided filename already exists, will append new data to file.
+    If the provided filename already exists, new data is added to it, replacing existing rows with the same key.
     Output xlsx will write data to a 'Player Stats' tab.
 
     :param filename: Complete filepath to write data to.
@@ -259,44 +609,105 @@ def write_season_player_stats(filename, start_season, end_season=None):
     :type start_season: int or str
     :param end_season: Final season to get data from (inclusive).
     :type end_season: int or str
+    :param retry_only: Only retry the failed requests saved by a previous run.
+    :type retry_only: bool
+    :param output: 'xlsx' to write a single xlsx file, 'parquet' to write partitioned parquet datasets
+        to the filename directory, 'sqlite' to write tables to the filename SQLite database.
+    :type output: str
+    :param resume: Skip the games and seasons a previous run already wrote to filename.
+    :type resume: bool
     """
-    writer = pd.ExcelWriter(filename, engine='xlsxwriter')
+    sink = sinks.open_sink(filename, output)
 
     # format seasons to be api-friendly
     if end_season is not None:
         seasons = utils.get_season_list(start_season, end_season)
     else:
         seasons = utils.get_season_list(start_season, start_season)
+    dead_letter.load()
+    done = checkpoint.Checkpoint(filename, 'player')
+    if not resume:
+        done.reset()
 
     stats_list = []
     try:
-        for season in seasons:
+        for season in seasons if not retry_only else []:
             print(season)
-            stats = _season_player_stats(season)
+            stats = _season_player_stats(season, done)
+            stats_list.extend(stats)
+
+        for key, stats in dead_letter.retry('player', _player_stats, seasons):
             stats_list.extend(stats)
+            if _completed_season(key['season']):
+                done.mark(f'{key["season"]}-{key["player_id"]}')
     # make sure to write whatever function has managed to scrape in event of error
     finally:
+        dead_letter.save()
         # create dataframes, rename cols from api json format to 'prettier' format, and change col order
         stats_df = pd.DataFrame(stats_list)
         stats_df = utils.rename_cols(stats_df)
-        stats_df = utils.update_cols(stats_df, ['Season', 'Player', 'Stat Type'])
+        stats_df = utils.update_cols(stats_df, ['Season', 'Player ID', 'Player', 'Stat Type'])
 
-        if os.path.exists(filename):
-            # load previous dataframe and append newest data
-            og_stats = pd.read_excel(filename)
-            og_stats = utils.rename_cols(og_stats)
-            stats_df = og_stats.append(stats_df, ignore_index=True).drop_duplicates()
-        stats_df.to_excel(writer, index=False, sheet_name='Player Stats')
+        sink.write('player_season_stats', stats_df)
+        sink.close()
+        # only checkpoint what has actually been written
+        done.commit()
+        telemetry.save()
 
-        writer.close()
 
+def write_derived_player_stats(filename, games_filename, start_season, end_season=None, output='xlsx',
+                               games_output=None):
+    """
+    Function used to write full season, home, and away player stats for every specified season to provided
+    xlsx file, derived from the boxscore rows a previous write_game_stats run wrote to games_filename instead
+    of requesting the stats of every player. Situation stats need the api and are only written by
+    write_season_player_stats. Only regular season games are counted and no requests are made.
+    Games only scraped with fetch='boxscore' are read from their own table, see sinks.load_game_table.
+    If the provided filename already exists, new data is added to it, replacing existing rows with the same key.
+    Output xlsx will write data to a 'Player Stats' tab.
 
-def write_game_stats(filename, start_season, end_season=None):
+    :param filename: Complete filepath to write data to.
+    :type filename: str
+    :param games_filename: Complete filepath write_game_stats wrote the game data to, can be the same as
+        filename for parquet and sqlite output.
+    :type games_filename: str
+    :param start_season: Start season to derive stats for.
+    :type start_season: int or str
+    :param end_season: Final season to derive stats for (inclusive).
+    :type end_season: int or str
+    :param output: 'xlsx' to write a single xlsx file, 'parquet' to write partitioned parquet datasets
+        to the filename directory, 'sqlite' to write tables to the filename SQLite database.
+    :type output: str
+    :param games_output: Output format of games_filename, same as output if not given.
+    :type games_output: str
+    """
+    if end_season is None:
+        end_season = start_season
+    seasons = utils.get_season_list(start_season, end_season)
+    games_output = games_output or output
+
+    player_df = sinks.load_game_table(games_filename, 'game_stats_players', games_output, seasons)
+    event_df = sinks.load_table(games_filename, 'game_stats_events', games_output, seasons,
+                                columns=['Season', 'Game Type', 'Game Number', 'Player ID', 'Player', 'Event',
+                                         'Outcome', 'Period', 'GWG'])
+    with telemetry.timer('aggregate'):
+        df_stats = aggregate.player_season_stats(player_df, event_df)
+
+    sink = sinks.open_sink(filename, output)
+    try:
+        sink.write('player_season_stats', df_stats)
+    finally:
+        sink.close()
+        telemetry.save()
+
+
+def write_game_stats(filename, start_season, end_season=None, concurrency=None, retry_only=False,
+                     output='xlsx', resume=True, processes=None, fetch='full'):
     """
     Function used to write all game specific stats for every specified season to provided xlsx file.
     Can optionally provide a single season or a start and end season if wanting to scrape a range of seasons.
-    If the provided filename already exists, will append new data to file.
-    Output xlsx will write data to individual 'Events', 'Teams', and 'Players' tabs.
+    If the provided filename already exists, new data is added to it, replacing existing rows with the same key.
+    Output xlsx will write data to individual 'Events', 'Teams', 'Players', 'Player Info', and 'Team Info' tabs.
 
     :param filename: Complete filepath to write data to.
     :type filename: str
@@ -304,60 +715,81 @@ def write_game_stats(filename, start_season, end_season=None):
     :type start_season: int or str
     :param end_season: Final season to get data from (inclusive).
     :type end_season: int or str
+    :param concurrency: Number of games to request at once, scrapes one game at a time if not given.
+    :type concurrency: int
+    :param retry_only: Only retry the failed requests saved by a previous run.
+    :type retry_only: bool
+    :param output: 'xlsx' to write a single xlsx file, 'parquet' to write partitioned parquet datasets
+        to the filename directory, 'sqlite' to write tables to the filename SQLite database.
+    :type output: str
+    :param resume: Skip the games and seasons a previous run already wrote to filename.
+    :type resume: bool
+    :param processes: Number of worker processes scraping chunks of games in parallel, replaces concurrency.
+    :type processes: int
+    :param fetch: 'full' to request the play by play of every game, 'boxscore' or 'linescore' to only request
+        that much smaller document when events aren't needed, its rows are then written to the separate
+        tables in GAME_TABLES.
+    :type fetch: str
     """
-    writer = pd.ExcelWriter(filename, engine='xlsxwriter')
+    sink = sinks.open_sink(filename, output)
 
     # format seasons to be api-friendly
     if end_season is not None:
         seasons = utils.get_season_list(start_season, end_season)
     else:
         seasons = utils.get_season_list(start_season, start_season)
+    dead_letter.load()
+    # every fetch mode is checkpointed separately so a boxscore run doesn't skip games a full run still needs
+    kind = api.game_kind(fetch)
+    done = checkpoint.Checkpoint(filename, kind)
+    if not resume:
+        done.reset()
+
+    # games are parsed into a columnar builder that is written to the sink and cleared every chunk of games
+    columns = api.GameColumns()
+
+    def flush(columns):
+        _write_game_stats(sink, _game_frames(columns), fetch)
+        # parquet rows are saved as soon as they're written so their games can be checkpointed straight away
+        if sink.streaming:
+            done.commit()
 
-    events_data = []
-    team_data = []
-    player_data = []
     try:
-        for season in seasons:
+        for season in seasons if not retry_only and not processes else []:
             season = season[:4]
             print(season)
-            events, team, player = _game_stats(season)
-            events_data.extend(events)
-            team_data.extend(team)
-            player_data.extend(player)
+            _game_stats(season, columns, concurrency, done, flush, fetch)
+
+        # chunks of games are scraped and parsed in worker processes and written here in game order
+        parallel = _scrape_parallel(functools.partial(_game_stats_worker, fetch=fetch), seasons, processes, done)
+        for games, (frames, finished, failed) in parallel if processes and not retry_only else []:
+            for key in failed:
+                dead_letter.add(kind, key)
+            for game in finished:
+                done.mark(game)
+            _write_game_stats(sink, frames, fetch)
+            if sink.streaming:
+                done.commit()
+
+        for key, parsed in dead_letter.retry(kind, functools.partial(api.get_game_feed, fetch=fetch), seasons):
+            if columns.add_game(parsed, **key) and api.is_final(parsed):
+                done.mark((key['season'], key['game_type'], key['game_number']))
     # make sure to write whatever function has managed to scrape in event of error
     finally:
-        # create dataframes, rename cols from api json format to 'prettier' format, and change col order
-        event_df = pd.DataFrame(events_data)
-        event_df = utils.rename_cols(event_df)
-        event_df = utils.update_cols(event_df, ['Season', 'Game Type', 'Game Number', 'Player', 'Team'])
-
-        team_df = pd.DataFrame(team_data)
-        team_df = utils.rename_cols(team_df)
-        team_df = utils.update_cols(team_df, ['Season', 'Game Type', 'Game Number', 'Team'])
-
-        player_df = pd.DataFrame(player_data)
-        player_df = utils.rename_cols(player_df)
-        player_df = utils.update_cols(player_df, ['Season', 'Game Type', 'Game Number', 'Player', 'Team'])
-
-        if os.path.exists(filename):
-            # load previous dataframe and append newest data
-            og_data = pd.read_excel(filename, sheet_name=None)
-            event_df = og_data['Events'].append(event_df, ignore_index=True).drop_duplicates()
-            team_df = og_data['Teams'].append(team_df, ignore_index=True).drop_duplicates()
-            player_df = og_data['Players'].append(player_df, ignore_index=True).drop_duplicates()
+        dead_letter.save()
+        _write_game_stats(sink, _game_frames(columns), fetch)
+        sink.close()
+        # only checkpoint what has actually been written
+        done.commit()
+        telemetry.save()
 
-        event_df.to_excel(writer, index=False, sheet_name='Events')
-        team_df.to_excel(writer, index=False, sheet_name='Teams')
-        player_df.to_excel(writer, index=False, sheet_name='Players')
 
-        writer.close()
-
-
-def write_player_ids(filename, start_season, end_season=None):
+def write_player_ids(filename, start_season, end_season=None, retry_only=False, output='xlsx',
+                     resume=True):
     """
     Function used to write all player names and ids for every specified season to provided xlsx file.
     Can optionally provide a single season or a start and end season if wanting to scrape a range of seasons.
-    If the provided filename already exists, will append new data to file.
+    If the provided filename already exists, new data is added to it, replacing existing rows with the same key.
     Output xlsx will write data to a 'Players' tab.
 
     :param filename: Complete filepath to write data to.
@@ -366,44 +798,66 @@ def write_player_ids(filename, start_season, end_season=None):
     :type start_season: int or str
     :param end_season: Final season to get data from (inclusive).
     :type end_season: int or str
+    :param retry_only: Only retry the failed requests saved by a previous run.
+    :type retry_only: bool
+    :param output: 'xlsx' to write a single xlsx file, 'parquet' to write partitioned parquet datasets
+        to the filename directory, 'sqlite' to write tables to the filename SQLite database.
+    :type output: str
+    :param resume: Skip the games and seasons a previous run already wrote to filename.
+    :type resume: bool
     """
-    writer = pd.ExcelWriter(filename, engine='xlsxwriter')
+    sink = sinks.open_sink(filename, output)
 
     # format seasons to be api-friendly
     if end_season is not None:
         seasons = utils.get_season_list(start_season, end_season)
     else:
         seasons = utils.get_season_list(start_season, start_season)
+    dead_letter.load()
+    done = checkpoint.Checkpoint(filename, 'roster')
+    if not resume:
+        done.reset()
 
     player_data = []
     try:
-        for season in seasons:
+        for season in seasons if not retry_only else []:
+            if done.is_done(season):
+                continue
             print(season)
-            for team in v.all_teams_by_id:
-                roster = api.get_roster(team, season)
-                player_data.extend(roster)
-                time.sleep(1)
+            # every team's roster comes from a single league wide request
+            try:
+                roster = api.get_league_rosters(season)
+            except requests.exceptions.RequestException:
+                dead_letter.add('roster', {'season': season})
+                continue
+            player_data.extend(roster)
+            if roster and _completed_season(season):
+                done.mark(season)
+
+        for key, roster in dead_letter.retry('roster', api.get_league_rosters, seasons):
+            player_data.extend(roster)
+            if roster and _completed_season(key['season']):
+                done.mark(key['season'])
     # make sure to write whatever function has managed to scrape in event of error
     finally:
+        dead_letter.save()
         # create dataframes, rename cols from api json format to 'prettier' format, and change col order
         player_df = pd.DataFrame(player_data).drop_duplicates()
         player_df = utils.rename_cols(player_df)
 
-        if os.path.exists(filename):
-            # load previous dataframe and append newest data
-            og_data = pd.read_excel(filename)
-            player_df = og_data.append(player_df, ignore_index=True).drop_duplicates()
-
-        player_df.to_excel(writer, index=False, sheet_name='Players')
+        sink.write('players', player_df)
+        sink.close()
+        # only checkpoint what has actually been written
+        done.commit()
+        telemetry.save()
 
-        writer.close()
 
-
-def write_shift_data(filename, start_season, end_season=None):
+def write_shift_data(filename, start_season, end_season=None, concurrency=None, retry_only=False,
+                     output='xlsx', resume=True, processes=None):
     """
     Function used to write all shift information for every game and for every specified season to provided xlsx file.
     Can optionally provide a single season or a start and end season if wanting to scrape a range of seasons.
-    If the provided filename already exists, will append new data to file.
+    If the provided filename already exists, new data is added to it, replacing existing rows with the same key.
     Output xlsx will write data to a 'Players' tab.
 
     :param filename: Complete filepath to write data to.
@@ -412,37 +866,65 @@ def write_shift_data(filename, start_season, end_season=None):
     :type start_season: int or str
     :param end_season: Final season to get data from (inclusive).
     :type end_season: int or str
+    :param concurrency: Number of games to request at once, scrapes one game at a time if not given.
+    :type concurrency: int
+    :param retry_only: Only retry the failed requests saved by a previous run.
+    :type retry_only: bool
+    :param output: 'xlsx' to write a single xlsx file, 'parquet' to write partitioned parquet datasets
+        to the filename directory, 'sqlite' to write tables to the filename SQLite database.
+    :type output: str
+    :param resume: Skip the games and seasons a previous run already wrote to filename.
+    :type resume: bool
+    :param processes: Number of worker processes scraping chunks of games in parallel, replaces concurrency.
+    :type processes: int
     """
-    writer = pd.ExcelWriter(filename, engine='xlsxwriter')
+    sink = sinks.open_sink(filename, output)
 
     # format seasons to be api-friendly
     if end_season is not None:
         seasons = utils.get_season_list(start_season, end_season)
     else:
         seasons = utils.get_season_list(start_season, start_season)
+    dead_letter.load()
+    done = checkpoint.Checkpoint(filename, 'shift')
+    if not resume:
+        done.reset()
 
+    # shifts are written to the sink and cleared every chunk of games
     shift_data = []
+
+    def flush(shifts):
+        _write_shift_data(sink, shifts)
+        # parquet rows are saved as soon as they're written so their games can be checkpointed straight away
+        if sink.streaming:
+            done.commit()
+
     try:
-        for season in seasons:
+        for season in seasons if not retry_only and not processes else []:
             season = season[:4]
             print(season)
-            shifts = _shift_data(season)
+            _shift_data(season, shift_data, concurrency, done, flush)
+
+        # chunks of games are scraped in worker processes and written here in game order
+        parallel = _scrape_parallel(_shift_data_worker, seasons, processes, done)
+        for games, (results, failed) in parallel if processes and not retry_only else []:
+            for key in failed:
+                dead_letter.add('shift', key)
+            _add_shifts(games, results, shift_data, done)
+            flush(shift_data)
+
+        for key, shifts in dead_letter.retry('shift', api.get_shift_data, seasons):
             shift_data.extend(shifts)
-            time.sleep(1)
+            if shifts and _completed_season(key['season']):
+                done.mark((key['season'], key['game_type'], key['game_number']))
     # make sure to write whatever function has managed to scrape in event of error
     finally:
-        # create dataframes, rename cols from api json format to 'prettier' format, and change col order
-        shift_df = pd.DataFrame(shift_data).drop_duplicates()
-        shift_df = utils.rename_cols(shift_df)
-
-        if os.path.exists(filename):
-            # load previous dataframe and append newest data
-            og_data = pd.read_excel(filename)
-            shift_df = og_data.append(shift_df, ignore_index=True).drop_duplicates()
-
-        shift_df.to_excel(writer, index=False, sheet_name='Players')
-
-        writer.close()
+        dead_letter.save()
+        _write_shift_data(sink, shift_data)
+        sink.close()
+        # only checkpoint what has actually been written
+        done.commit()
+        telemetry.save()
 
 
 if __name__ == '__main__':
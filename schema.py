@@ -0,0 +1,119 @@
+"""
+Module declaring the column types of the game level and dimension tables main.py writes, applied at ingest.
+
+Tables are built from python dicts so without a schema every string column is a python object, every
+number is 64 bits wide, and Game Time stays a string that has to be parsed again by every reader.
+Every table in TABLES maps column names to:
+    'category' - low cardinality strings e.g. teams, players, event names, game type.
+    small numpy ints - columns that are always set e.g. period or game number.
+    small nullable ints - columns that can be missing e.g. clock seconds or player and team ids.
+    float32 - rink coordinates.
+    TIMESTAMP - parsed as UTC timestamps.
+Columns a table doesn't declare, and declared columns a DataFrame doesn't have, are left alone.
+
+Usage:
+    event_df = schema.apply('game_stats_events', event_df)
+"""
+
+import pandas as pd
+
+TIMESTAMP = 'timestamp'
+
+_GAME_COLS = {
+    'Season': 'int32',
+    'Game Type': 'category',
+    'Game Number': 'int16',
+}
+_GAME_SHARED_COLS = {
+    **_GAME_COLS,
+    'Home ID': 'Int16',
+    'Home': 'category',
+    'Away ID': 'Int16',
+    'Away': 'category',
+    'Game Time': TIMESTAMP,
+}
+TABLES = {
+    'game_stats_events': {
+        **_GAME_SHARED_COLS,
+        'Player ID': 'Int32',
+        'Player': 'category',
+        'Team ID': 'Int16',
+        'Team': 'category',
+        'Event': 'category',
+        'Outcome': 'category',
+        'Period': 'int8',
+        'Period Seconds': 'Int16',
+        'Game Seconds': 'Int16',
+        'Strength': 'category',
+        'GWG': 'boolean',
+        'Empty Net': 'boolean',
+        'x': 'float32',
+        'y': 'float32',
+    },
+    'game_stats_teams': {
+        **_GAME_SHARED_COLS,
+        'Team ID': 'Int16',
+        'Team': 'category',
+        'Final Goals': 'Int8',
+        'Final Period': 'Int8',
+        'Shootout': 'boolean',
+    },
+    'game_stats_players': {
+        **_GAME_SHARED_COLS,
+        'Player ID': 'Int32',
+        'Player': 'category',
+        'Team ID': 'Int16',
+        'Team': 'category',
+    },
+    'shift_data': {
+        **_GAME_COLS,
+        'Player ID': 'Int32',
+        'Player Name': 'category',
+        'Period': 'int8',
+        'Shift Number': 'int16',
+        'Shift Start Seconds': 'Int16',
+        'Shift Start Game Seconds': 'Int16',
+        'Shift End Seconds': 'Int16',
+        'Shift End Game Seconds': 'Int16',
+        'Shift Duration Seconds': 'Int16',
+        'Team ID': 'Int16',
+        'Team': 'category',
+    },
+    'player_info': {
+        'Player ID': 'Int32',
+        'Position': 'category',
+        'Position Type': 'category',
+        'Shoots': 'category',
+        'Weight': 'Int16',
+    },
+    'team_info': {
+        'Team ID': 'Int16',
+        'Franchise ID': 'Int16',
+    },
+}
+# team and player rows of the boxscore and linescore fetch modes are typed like the rows of a full fetch
+TABLES['game_stats_teams_boxscore'] = TABLES['game_stats_teams']
+TABLES['game_stats_players_boxscore'] = TABLES['game_stats_players']
+TABLES['game_stats_teams_linescore'] = TABLES['game_stats_teams']
+
+
+def apply(table, df):
+    """
+    Convert the columns of a table to their declared types.
+
+    :param table: Name of the table in TABLES.
+    :type table: str
+    :param df: Rows of the table.
+    :type df: pd.DataFrame
+    :return: DataFrame with typed columns.
+    :rtype: pd.DataFrame
+    """
+    dtypes = {col: dtype for col, dtype in TABLES.get(table, {}).items() if col in df.columns}
+    timestamps = [col for col, dtype in dtypes.items() if dtype == TIMESTAMP]
+    df = df.astype({col: dtype for col, dtype in dtypes.items() if dtype != TIMESTAMP})
+    # columns without any values would get float categories, keep them strings like the columns that have values
+    for col in [col for col, dtype in dtypes.items() if dtype == 'category' and df[col].isna().all()]:
+        df[col] = df[col].astype(pd.CategoricalDtype(pd.Index([], dtype='string')))
+    for col in timestamps:
+        df[col] = pd.to_datetime(df[col], utc=True)
+    return df
@@ -0,0 +1,519 @@
+"""
+Module containing the output sinks the main.py writers write their tables to.
+
+Every table written by main.py has a name and is described in TABLES by:
+    sheet - xlsx tab the table is written to.
+    partition - columns the parquet dataset is partitioned by.
+    key - natural key columns, written rows replace every existing row with the same key.
+
+Available sinks:
+    ExcelSink - writes every table to a tab of a single xlsx file, upserting into the file if it exists.
+    ParquetSink - writes every table to a compressed parquet dataset at {root}/{table}/ partitioned
+        by season and game type, each write adds new files and only rewrites existing files holding
+        rows with the same key as the new rows.
+    SQLiteSink - writes every table to the table of the same name in a SQLite database e.g. the
+        nhl_stats.db read by the dashboard, upserting rows in batched transactions.
+
+Usage:
+    sink = sinks.open_sink(filename, output='parquet')
+    sink.write('game_stats_events', event_df)
+    sink.close()
+"""
+
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+import schema
+import telemetry
+import utils
+
+_GAME_KEY = ['Season', 'Game Type', 'Game Number']
+TABLES = {
+    'team_season_stats': {'sheet': 'Stats', 'partition': ['Season'], 'key': ['Season', 'Team']},
+    'team_season_ranks': {'sheet': 'Ranks', 'partition': ['Season'], 'key': ['Season', 'Team']},
+    'player_season_stats': {'sheet': 'Player Stats', 'partition': ['Season'],
+                            'key': ['Season', 'Player ID', 'Stat Type']},
+    'game_stats_events': {'sheet': 'Events', 'partition': ['Season', 'Game Type'], 'key': _GAME_KEY},
+    'game_stats_teams': {'sheet': 'Teams', 'partition': ['Season', 'Game Type'], 'key': _GAME_KEY},
+    'game_stats_players': {'sheet': 'Players', 'partition': ['Season', 'Game Type'], 'key': _GAME_KEY},
+    'game_stats_teams_boxscore': {'sheet': 'Boxscore Teams', 'partition': ['Season', 'Game Type'], 'key': _GAME_KEY},
+    'game_stats_players_boxscore': {'sheet': 'Boxscore Players', 'partition': ['Season', 'Game Type'],
+                                    'key': _GAME_KEY},
+    'game_stats_teams_linescore': {'sheet': 'Linescore Teams', 'partition': ['Season', 'Game Type'],
+                                   'key': _GAME_KEY},
+    'players': {'sheet': 'Players', 'partition': [], 'key': ['ID']},
+    'shift_data': {'sheet': 'Players', 'partition': ['Season', 'Game Type'], 'key': _GAME_KEY},
+    'player_info': {'sheet': 'Player Info', 'partition': [], 'key': ['Player ID']},
+    'team_info': {'sheet': 'Team Info', 'partition': [], 'key': ['Team ID']},
+}
+# tables the boxscore and linescore fetch modes write the rows of a game table to, and the column telling the
+# team or player rows of a game apart, see load_game_table
+PARTIAL_TABLES = {
+    'game_stats_teams': (['game_stats_teams_boxscore', 'game_stats_teams_linescore'], 'Team'),
+    'game_stats_players': (['game_stats_players_boxscore'], 'Player ID'),
+}
+PARQUET_COMPRESSION = 'zstd'
+# indexes for the queries the dashboard runs, every table also gets an index on its key
+SQLITE_INDEXES = {
+    'team_season_stats': [['Season', 'Team']],
+    'game_stats_teams': [['Season', 'Team'], ['Season', 'Home'], ['Season', 'Away']],
+    'game_stats_players': [['Season', 'Player']],
+    'player_season_stats': [['Season', 'Player']],
+}
+# rows inserted per executemany call
+SQLITE_BATCH = 10000
+# timestamps are stored as text in the same format the api returns them in
+SQLITE_TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+def _key_isin(df, new_df, key):
+    """
+    Check which rows of a DataFrame share a natural key with any row of another.
+
+    :param df: Rows to check.
+    :type df: pd.DataFrame
+    :param new_df: Rows holding the keys to look for.
+    :type new_df: pd.DataFrame
+    :param key: Key columns.
+    :type key: list of str
+    :return: Boolean mask of the rows of df with a key found in new_df.
+    :rtype: np.ndarray
+    """
+    df, new_df = df[key], new_df[key]
+    # keys read back from a file can have another type than the rows being written e.g. text and integer seasons
+    text = [col for col in key if df[col].dtype != new_df[col].dtype and
+            not (pd.api.types.is_numeric_dtype(df[col]) and pd.api.types.is_numeric_dtype(new_df[col]))]
+    if text:
+        df = df.astype({col: str for col in text})
+        new_df = new_df.astype({col: str for col in text})
+    return pd.MultiIndex.from_frame(df).isin(pd.MultiIndex.from_frame(new_df))
+
+
+def _latest_writes(frames, key):
+    """
+    Concatenate the frames written to a table, keeping only the rows of the last frame written for every key
+    so rows written again e.g. the same player in every chunk of games replace the earlier ones.
+
+    :param frames: Frames in the order they were written.
+    :type frames: list of pd.DataFrame
+    :param key: Key columns.
+    :type key: list of str
+    :return: Concatenated rows.
+    :rtype: pd.DataFrame
+    """
+    df = pd.concat(frames, ignore_index=True)
+    if len(frames) < 2 or not set(key).issubset(df.columns):
+        return df
+    order = pd.Series(np.repeat(np.arange(len(frames)), [len(frame) for frame in frames]))
+    latest = order.groupby([df[col] for col in key], dropna=False, observed=True).transform('max')
+    return df[(order == latest).to_numpy()].reset_index(drop=True)
+
+
+class ExcelSink:
+    """
+    Sink writing every table to its own tab of a single xlsx file.
+    Tables are collected in memory and written when the sink is closed, if the file already exists
+    the previous data is loaded and the new data upserted into it by the table key.
+    xlsx can't be appended to so the whole file is still rewritten, use ParquetSink for large histories.
+
+    :param filename: Complete filepath of the xlsx file.
+    :type filename: str
+    """
+
+    # rows are only saved once the sink is closed
+    streaming = False
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._frames = {}
+
+    def write(self, table, df):
+        """
+        Add rows to a table.
+
+        :param table: Name of the table in TABLES.
+        :type table: str
+        :param df: Rows to write.
+        :type df: pd.DataFrame
+        """
+        self._frames.setdefault(table, []).append(df)
+        telemetry.add_rows(table, len(df))
+
+    @telemetry.timed('write')
+    def close(self):
+        """
+        Write every table to the xlsx file.
+        """
+        og_data = {}
+        if os.path.exists(self.filename):
+            og_data = pd.read_excel(self.filename, sheet_name=None)
+
+        writer = pd.ExcelWriter(self.filename, engine='xlsxwriter')
+        for table, frames in self._frames.items():
+            sheet = TABLES[table]['sheet']
+            df = _latest_writes(frames, TABLES[table]['key'])
+            # excel can't store timezones, timestamps are written as naive UTC
+            for col in df.columns:
+                if isinstance(df[col].dtype, pd.DatetimeTZDtype):
+                    df[col] = df[col].dt.tz_convert('UTC').dt.tz_localize(None)
+            if sheet in og_data:
+                # load previous dataframe, drop the rows being replaced, and append newest data
+                og_df = utils.rename_cols(og_data[sheet])
+                key = TABLES[table]['key']
+                if df.empty:
+                    df = og_df
+                elif set(key).issubset(og_df.columns) and set(key).issubset(df.columns):
+                    og_df = og_df[~_key_isin(og_df, df, key)]
+                    df = pd.concat([og_df, df], ignore_index=True)
+                else:
+                    df = pd.concat([og_df, df], ignore_index=True).drop_duplicates()
+            df.to_excel(writer, index=False, sheet_name=sheet)
+        # tables not written this time are kept as they were
+        written = {TABLES[table]['sheet'] for table in self._frames}
+        for sheet, og_df in og_data.items():
+            if sheet not in written:
+                og_df.to_excel(writer, index=False, sheet_name=sheet)
+        writer.close()
+
+
+class ParquetSink:
+    """
+    Sink writing every table to a parquet dataset at {root}/{table}/ partitioned by the table's
+    partition columns e.g. game_stats_events/Season=20152016/Game Type=Playoffs/.
+    Every write adds new files to the dataset. Existing files in the partitions being written are
+    checked by reading only their key columns, files holding rows with a key being written again are
+    rewritten without those rows, so the cost of a write depends on the new data, not the history.
+
+    :param root: Directory to write the datasets to.
+    :type root: str
+    :param compression: Parquet compression codec.
+    :type compression: str
+    """
+
+    # rows are saved as soon as they are written
+    streaming = True
+
+    def __init__(self, root, compression=PARQUET_COMPRESSION):
+        self.root = root
+        self.compression = compression
+
+    @telemetry.timed('write')
+    def write(self, table, df):
+        """
+        Add rows to a table.
+
+        :param table: Name of the table in TABLES.
+        :type table: str
+        :param df: Rows to write.
+        :type df: pd.DataFrame
+        """
+        if df.empty:
+            return
+        telemetry.add_rows(table, len(df))
+        partition = TABLES[table]['partition']
+        # chunks of games without e.g. coordinates or goals don't have every column, every file gets all of the
+        # table's declared columns with their declared types so the files of a dataset share one schema
+        declared = schema.TABLES.get(table, {})
+        df = schema.apply(table, df.reindex(columns=[*df.columns, *[col for col in declared if col not in df]]))
+        # infer proper nullable types for the other columns built from python objects so every column is typed,
+        # partition columns are left alone as they are read back from the directory names,
+        # categorical partition columns are written as their plain values so every category isn't a partition
+        cols = [col for col in df.columns if col not in partition]
+        inferred = [col for col in cols if col not in declared]
+        partition_df = df[partition].astype(
+            {col: object for col in partition if isinstance(df[col].dtype, pd.CategoricalDtype)})
+        df = pd.concat([partition_df, df[cols].astype({col: df[col].convert_dtypes().dtype for col in inferred})],
+                       axis=1)
+        self._delete_keys(table, df)
+        # unpartitioned tables are still written as datasets so every write adds a file instead of replacing it
+        df.to_parquet(os.path.join(self.root, table), engine='pyarrow', compression=self.compression,
+                      partition_cols=partition, index=False)
+
+    def _delete_keys(self, table, df):
+        """
+        Remove the rows of the existing dataset files that share a key with the rows being written.
+
+        :param table: Name of the table in TABLES.
+        :type table: str
+        :param df: Rows being written.
+        :type df: pd.DataFrame
+        """
+        # pyarrow is only needed for parquet output
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+
+        path = os.path.join(self.root, table)
+        if not os.path.exists(path):
+            return
+        partition = TABLES[table]['partition']
+        key = TABLES[table]['key']
+        # partition columns aren't stored in the files, their values come from the directory names
+        file_key = [col for col in key if col not in partition]
+
+        dataset = ds.dataset(path, format='parquet', partitioning='hive' if partition else None)
+        for fragment in dataset.get_fragments():
+            new_df = df
+            for col, value in ds.get_partition_keys(fragment.partition_expression).items():
+                new_df = new_df[new_df[col].astype(str) == str(value)]
+            if new_df.empty:
+                continue
+
+            parquet_file = pq.ParquetFile(fragment.path)
+            keys = parquet_file.read(columns=file_key).to_pandas()
+            replaced = _key_isin(keys, new_df, file_key)
+            if not replaced.any():
+                continue
+
+            kept = parquet_file.read().filter(pa.array(~replaced))
+            parquet_file.close()
+            if kept.num_rows:
+                pq.write_table(kept, fragment.path, compression=self.compression)
+            else:
+                os.remove(fragment.path)
+
+    def close(self):
+        pass
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sqlite_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+
+class SQLiteSink:
+    """
+    Sink writing every table to the table of the same name in a SQLite database.
+    Tables are created on first write and new columns added as they appear. Every write replaces the
+    rows with the same key and inserts the new rows in batches within a single transaction.
+    The database is opened in WAL mode so the dashboard can keep reading while a scrape is writing.
+
+    :param filename: Path of the SQLite database e.g. nhl_stats.db.
+    :type filename: str
+    :param batch: Rows inserted per executemany call.
+    :type batch: int
+    """
+
+    # rows are saved as soon as they are written
+    streaming = True
+
+    def __init__(self, filename, batch=SQLITE_BATCH):
+        self.batch = batch
+        self._connection = sqlite3.connect(filename)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        # WAL is still consistent after a crash with NORMAL, only the last transactions can be lost
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+
+    def _columns(self, table):
+        return [row[1] for row in self._connection.execute(f'PRAGMA table_info({_quote(table)})')]
+
+    def _create(self, table, df):
+        # create the table and its indexes, or add the columns it doesn't have yet
+        columns = self._columns(table)
+        if not columns:
+            cols = ', '.join(f'{_quote(col)} {_sqlite_type(dtype)}' for col, dtype in df.dtypes.items())
+            self._connection.execute(f'CREATE TABLE {_quote(table)} ({cols})')
+        for col, dtype in df.dtypes.items():
+            if columns and col not in columns:
+                self._connection.execute(
+                    f'ALTER TABLE {_quote(table)} ADD COLUMN {_quote(col)} {_sqlite_type(dtype)}')
+
+        for index in [TABLES[table]['key']] + SQLITE_INDEXES.get(table, []):
+            if not set(index).issubset(df.columns) and not set(index).issubset(columns):
+                continue
+            name = _quote(f'{table}_{"_".join(index)}'.replace(' ', '_').lower())
+            cols = ', '.join(_quote(col) for col in index)
+            self._connection.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {_quote(table)} ({cols})')
+
+    @telemetry.timed('write')
+    def write(self, table, df):
+        """
+        Upsert rows into a table.
+
+        :param table: Name of the table in TABLES.
+        :type table: str
+        :param df: Rows to write.
+        :type df: pd.DataFrame
+        """
+        if df.empty:
+            return
+        telemetry.add_rows(table, len(df))
+        # sqlite only binds python types, NaN and NA are stored as NULL
+        df = df.convert_dtypes()
+        for col in df.columns:
+            if pd.api.types.is_datetime64_any_dtype(df[col].dtype):
+                df[col] = df[col].dt.strftime(SQLITE_TIME_FORMAT)
+        values = df.astype(object).where(df.notna(), None)
+        key = [col for col in TABLES[table]['key'] if col in df.columns]
+
+        with self._connection:
+            self._create(table, df)
+            if key:
+                where = ' AND '.join(f'{_quote(col)}=?' for col in key)
+                keys = values[key].drop_duplicates().itertuples(index=False, name=None)
+                self._connection.executemany(f'DELETE FROM {_quote(table)} WHERE {where}', keys)
+
+            cols = ', '.join(_quote(col) for col in df.columns)
+            insert = f'INSERT INTO {_quote(table)} ({cols}) VALUES ({", ".join("?" * len(df.columns))})'
+            for i in range(0, len(values), self.batch):
+                rows = values.iloc[i:i + self.batch].itertuples(index=False, name=None)
+                self._connection.executemany(insert, rows)
+
+    def close(self):
+        self._connection.close()
+
+
+def open_sink(filename, output='xlsx'):
+    """
+    Create the sink for an output format.
+
+    :param filename: xlsx filepath, the dataset root directory for parquet, or the SQLite database path.
+    :type filename: str
+    :param output: 'xlsx', 'parquet', or 'sqlite'.
+    :type output: str
+    :return: Sink to write tables to.
+    :rtype: ExcelSink or ParquetSink or SQLiteSink
+    """
+    if output == 'xlsx':
+        return ExcelSink(filename)
+    if output == 'parquet':
+        return ParquetSink(filename)
+    if output == 'sqlite':
+        return SQLiteSink(filename)
+    raise ValueError(f'Unknown output format: {output}')
+
+
+def read_table(root, table, filters=None):
+    """
+    Read a table back from a parquet dataset written by ParquetSink.
+    Files missing some of the dataset's columns, e.g. written before a column was added, read them as missing.
+
+    :param root: Directory the datasets were written to.
+    :type root: str
+    :param table: Name of the table in TABLES.
+    :type table: str
+    :param filters: Optional pyarrow filters e.g. [('Season', '=', 20152016)].
+    :type filters: list of tuple
+    :return: Table rows.
+    :rtype: pd.DataFrame
+    """
+    # pyarrow is only needed for parquet output
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    path = os.path.join(root, table)
+    dataset = ds.dataset(path, format='parquet', partitioning='hive' if TABLES[table]['partition'] else None)
+    # the dataset schema only comes from one of its files, merge the columns of every file
+    unified = pa.unify_schemas([dataset.schema, *[fragment.physical_schema for fragment in dataset.get_fragments()]],
+                               promote_options='permissive')
+    return pd.read_parquet(path, engine='pyarrow', filters=filters, schema=unified)
+
+
+def load_table(filename, table, output='xlsx', seasons=None, columns=None):
+    """
+    Read a table back from any output written by a sink e.g. to derive season stats from game level rows.
+    Missing files, tables, and columns are skipped so the result can be empty.
+
+    :param filename: xlsx filepath, the dataset root directory for parquet, or the SQLite database path.
+    :type filename: str
+    :param table: Name of the table in TABLES.
+    :type table: str
+    :param output: 'xlsx', 'parquet', or 'sqlite'.
+    :type output: str
+    :param seasons: Full season numbers to read e.g. [20152016], every season is read if not given.
+    :type seasons: list of int
+    :param columns: Columns to read, every column is read if not given.
+    :type columns: list of str
+    :return: Table rows.
+    :rtype: pd.DataFrame
+    """
+    if output not in ('xlsx', 'parquet', 'sqlite'):
+        raise ValueError(f'Unknown output format: {output}')
+    path = os.path.join(filename, table) if output == 'parquet' else filename
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    seasons = [int(season) for season in seasons] if seasons is not None else None
+
+    if output == 'sqlite':
+        with sqlite3.connect(filename) as connection:
+            names = [row[1] for row in connection.execute(f'PRAGMA table_info({_quote(table)})')]
+            if not names:
+                return pd.DataFrame()
+            cols = ', '.join(_quote(col) for col in names if columns is None or col in columns)
+            query = f'SELECT {cols} FROM {_quote(table)}'
+            if seasons is None or 'Season' not in names:
+                return pd.read_sql_query(query, connection)
+            query += f' WHERE "Season" IN ({", ".join("?" * len(seasons))})'
+            return pd.read_sql_query(query, connection, params=seasons)
+
+    if output == 'parquet':
+        # pyarrow is only needed for parquet output
+        import pyarrow.dataset as ds
+
+        partition = TABLES[table]['partition']
+        names = ds.dataset(path, format='parquet', partitioning='hive' if partition else None).schema.names
+        filters = [('Season', 'in', seasons)] if seasons is not None and 'Season' in names else None
+        df = read_table(filename, table, filters=filters)
+        # partition columns are read back from their directory names, make them plain columns like the others
+        cols = [col for col in partition if col in df.columns]
+        df[cols] = df[cols].astype(object).infer_objects()
+        return df[[col for col in columns if col in df.columns]] if columns is not None else df
+
+    try:
+        df = pd.read_excel(filename, sheet_name=TABLES[table]['sheet'])
+    except ValueError:
+        # the workbook doesn't have the table's sheet
+        return pd.DataFrame()
+    df = utils.rename_cols(df)
+    if seasons is not None and 'Season' in df.columns:
+        df = df[df['Season'].isin(seasons)].reset_index(drop=True)
+    return df[[col for col in columns if col in df.columns]] if columns is not None else df
+
+
+def load_game_table(filename, table, output='xlsx', seasons=None, columns=None):
+    """
+    Read a game table back like load_table, filled in from the rows the boxscore and linescore fetch modes
+    wrote to their own PARTIAL_TABLES. Rows of a full fetch are kept as they are, games only fetched in a
+    partial mode are added and the columns missing from their rows are taken from the other partial mode
+    e.g. the final goals of boxscore team rows from the linescore rows of the same game.
+
+    :param filename: xlsx filepath, the dataset root directory for parquet, or the SQLite database path.
+    :type filename: str
+    :param table: Name of the game table in TABLES.
+    :type table: str
+    :param output: 'xlsx', 'parquet', or 'sqlite'.
+    :type output: str
+    :param seasons: Full season numbers to read e.g. [20152016], every season is read if not given.
+    :type seasons: list of int
+    :param columns: Columns to read, every column is read if not given.
+    :type columns: list of str
+    :return: Table rows.
+    :rtype: pd.DataFrame
+    """
+    partials, row = PARTIAL_TABLES.get(table, ([], None))
+    key = TABLES[table]['key'] + [row] if row is not None else []
+    read_columns = list(dict.fromkeys(key + columns)) if columns is not None else None
+    df = load_table(filename, table, output, seasons, read_columns)
+    for partial in partials:
+        partial_df = load_table(filename, partial, output, seasons, read_columns)
+        if partial_df.empty or not set(key).issubset(partial_df.columns):
+            continue
+        if df.empty:
+            df = partial_df
+        elif set(key).issubset(df.columns):
+            # values already read win, the partial rows only add games and fill in missing values, both are
+            # typed first as columns a table never had a value in are read back without a type
+            order = list(dict.fromkeys([*df.columns, *partial_df.columns]))
+            df, partial_df = schema.apply(table, df).set_index(key), schema.apply(table, partial_df).set_index(key)
+            df = schema.apply(table, df.combine_first(partial_df).reset_index()[order])
+    return df[[col for col in columns if col in df.columns]] if columns is not None else df
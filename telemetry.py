@@ -0,0 +1,301 @@
+"""
+Module used to collect metrics about a scrape so a slow run can be traced to the network, parsing, or writing.
+
+Collected metrics:
+    requests - latency histogram, bytes downloaded, and errors per api endpoint e.g. /api/v1/game/{id}/feed/live.
+    counters - retries, cache hits, and anything else counted with count.
+    stages - time spent and number of calls per stage e.g. 'json', 'parse', 'write'.
+    rows - rows written per table.
+
+Snapshots can be saved as json or Prometheus text, and Progress prints a progress line with an ETA.
+Metrics are kept per process, worker processes send theirs back with collect and the parent merges them.
+
+Usage:
+    with telemetry.timer('parse'):
+        columns.add_game(parsed, season, game_type, game_number)
+    telemetry.add_rows('game_stats_events', len(event_df))
+    telemetry.save()
+"""
+
+import contextlib
+import functools
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+FILENAME = os.getcwd() + '/telemetry.json'
+PROMETHEUS_FILENAME = os.getcwd() + '/telemetry.prom'
+# upper bounds in seconds of the request latency histogram buckets
+BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+# seconds between progress lines
+PROGRESS_INTERVAL = 10
+
+_lock = threading.Lock()
+_metrics = {'requests': {}, 'counters': {}, 'stages': {}, 'rows': {}}
+_start = time.time()
+
+
+def endpoint(url):
+    """
+    Group a url by its api endpoint by replacing every id in its path.
+
+    :param url: Api url.
+    :type url: str
+    :return: Endpoint e.g. /api/v1/game/{id}/feed/live.
+    :rtype: str
+    """
+    return re.sub(r'/\d+(?=/|$)', '/{id}', urlsplit(url).path)
+
+
+def observe_request(url, seconds, size=0, error=False):
+    """
+    Record a single request made to the api.
+
+    :param url: Api url requested.
+    :type url: str
+    :param seconds: Time taken by the request.
+    :type seconds: float
+    :param size: Bytes downloaded.
+    :type size: int
+    :param error: True if the request failed or returned an error status.
+    :type error: bool
+    """
+    with _lock:
+        stats = _metrics['requests'].setdefault(endpoint(url), {
+            'count': 0, 'errors': 0, 'bytes': 0, 'seconds': 0.0, 'buckets': [0] * (len(BUCKETS) + 1)})
+        stats['count'] += 1
+        stats['errors'] += int(error)
+        stats['bytes'] += size
+        stats['seconds'] += seconds
+        # last bucket counts requests slower than every bound (+Inf)
+        bucket = next((i for i, bound in enumerate(BUCKETS) if seconds <= bound), len(BUCKETS))
+        stats['buckets'][bucket] += 1
+
+
+def count(name, n=1):
+    """
+    Increase a counter e.g. 'retries' or 'cache_hits'.
+
+    :param name: Counter name.
+    :type name: str
+    :param n: Amount to increase it by.
+    :type n: int
+    """
+    with _lock:
+        _metrics['counters'][name] = _metrics['counters'].get(name, 0) + n
+
+
+def add_rows(table, n):
+    """
+    Record rows written to a table.
+
+    :param table: Name of the table.
+    :type table: str
+    :param n: Number of rows.
+    :type n: int
+    """
+    with _lock:
+        _metrics['rows'][table] = _metrics['rows'].get(table, 0) + n
+
+
+@contextlib.contextmanager
+def timer(stage):
+    """
+    Context manager adding the time spent in its block to a stage.
+
+    :param stage: Stage name e.g. 'parse' or 'write'.
+    :type stage: str
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        with _lock:
+            stats = _metrics['stages'].setdefault(stage, {'count': 0, 'seconds': 0.0})
+            stats['count'] += 1
+            stats['seconds'] += seconds
+
+
+def timed(stage):
+    """
+    Decorator adding the time spent in every call of the function to a stage.
+
+    :param stage: Stage name e.g. 'parse' or 'write'.
+    :type stage: str
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def collect():
+    """
+    Return the raw metrics recorded so far and reset them, used to send metrics back from worker processes.
+
+    :return: Raw metrics to pass to merge.
+    :rtype: dict
+    """
+    global _metrics
+    with _lock:
+        metrics = _metrics
+        _metrics = {'requests': {}, 'counters': {}, 'stages': {}, 'rows': {}}
+    return metrics
+
+
+def merge(metrics):
+    """
+    Add raw metrics returned by collect in another process to this process's metrics.
+
+    :param metrics: Raw metrics from collect.
+    :type metrics: dict
+    """
+    with _lock:
+        for url_endpoint, stats in metrics['requests'].items():
+            own = _metrics['requests'].setdefault(url_endpoint, {
+                'count': 0, 'errors': 0, 'bytes': 0, 'seconds': 0.0, 'buckets': [0] * (len(BUCKETS) + 1)})
+            for key in ['count', 'errors', 'bytes', 'seconds']:
+                own[key] += stats[key]
+            own['buckets'] = [a + b for a, b in zip(own['buckets'], stats['buckets'])]
+        for name, n in metrics['counters'].items():
+            _metrics['counters'][name] = _metrics['counters'].get(name, 0) + n
+        for stage, stats in metrics['stages'].items():
+            own = _metrics['stages'].setdefault(stage, {'count': 0, 'seconds': 0.0})
+            own['count'] += stats['count']
+            own['seconds'] += stats['seconds']
+        for table, n in metrics['rows'].items():
+            _metrics['rows'][table] = _metrics['rows'].get(table, 0) + n
+
+
+def reset():
+    """
+    Forget every metric and restart the throughput clock.
+    """
+    global _start
+    collect()
+    _start = time.time()
+
+
+def snapshot():
+    """
+    Return every metric with per endpoint latency averages and overall throughput.
+
+    :return: Json serializable metrics.
+    :rtype: dict
+    """
+    with _lock:
+        metrics = json.loads(json.dumps(_metrics))
+    elapsed = time.time() - _start
+
+    for stats in metrics['requests'].values():
+        stats['mean_seconds'] = stats['seconds'] / stats['count'] if stats['count'] else 0.0
+        stats['buckets'] = dict(zip([str(bound) for bound in BUCKETS] + ['+Inf'], stats['buckets']))
+    requests = sum(stats['count'] for stats in metrics['requests'].values())
+    size = sum(stats['bytes'] for stats in metrics['requests'].values())
+    rows = sum(metrics['rows'].values())
+    metrics['elapsed_seconds'] = elapsed
+    metrics['throughput'] = {
+        'requests_per_second': requests / elapsed if elapsed else 0.0,
+        'bytes_per_second': size / elapsed if elapsed else 0.0,
+        'rows_per_second': rows / elapsed if elapsed else 0.0,
+    }
+    return metrics
+
+
+def prometheus():
+    """
+    Return every metric in the Prometheus text exposition format.
+
+    :return: Prometheus metrics.
+    :rtype: str
+    """
+    metrics = snapshot()
+    lines = ['# TYPE nhl_request_seconds histogram']
+    for url_endpoint, stats in metrics['requests'].items():
+        cumulative = 0
+        for bound, n in stats['buckets'].items():
+            cumulative += n
+            lines.append(f'nhl_request_seconds_bucket{{endpoint="{url_endpoint}",le="{bound}"}} {cumulative}')
+        lines.append(f'nhl_request_seconds_sum{{endpoint="{url_endpoint}"}} {stats["seconds"]}')
+        lines.append(f'nhl_request_seconds_count{{endpoint="{url_endpoint}"}} {stats["count"]}')
+
+    lines.append('# TYPE nhl_request_bytes_total counter')
+    lines += [f'nhl_request_bytes_total{{endpoint="{url_endpoint}"}} {stats["bytes"]}'
+              for url_endpoint, stats in metrics['requests'].items()]
+    lines.append('# TYPE nhl_request_errors_total counter')
+    lines += [f'nhl_request_errors_total{{endpoint="{url_endpoint}"}} {stats["errors"]}'
+              for url_endpoint, stats in metrics['requests'].items()]
+    for name, n in metrics['counters'].items():
+        lines.append(f'# TYPE nhl_{name}_total counter')
+        lines.append(f'nhl_{name}_total {n}')
+    lines.append('# TYPE nhl_stage_seconds_total counter')
+    lines += [f'nhl_stage_seconds_total{{stage="{stage}"}} {stats["seconds"]}'
+              for stage, stats in metrics['stages'].items()]
+    lines.append('# TYPE nhl_rows_total counter')
+    lines += [f'nhl_rows_total{{table="{table}"}} {n}' for table, n in metrics['rows'].items()]
+    return '\n'.join(lines) + '\n'
+
+
+def save(filename=FILENAME, prometheus_filename=PROMETHEUS_FILENAME):
+    """
+    Save a snapshot of every metric as json and as Prometheus text.
+
+    :param filename: Path to save the json snapshot to.
+    :type filename: str
+    :param prometheus_filename: Path to save the Prometheus text to, not saved if None.
+    :type prometheus_filename: str
+    """
+    with open(filename, 'w') as f:
+        json.dump(snapshot(), f, indent=2)
+    if prometheus_filename is not None:
+        with open(prometheus_filename, 'w') as f:
+            f.write(prometheus())
+
+
+class Progress:
+    """
+    Prints a progress line with throughput and ETA at most every PROGRESS_INTERVAL seconds.
+
+    Usage:
+        progress = Progress('2015 games', total=1312)
+        for game in games:
+            ...
+            progress.update()
+
+    :param label: Name of the work being done.
+    :type label: str
+    :param total: Number of units of work.
+    :type total: int
+    """
+
+    def __init__(self, label, total):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self._start = time.time()
+        self._printed = self._start
+
+    def update(self, n=1):
+        """
+        Mark units of work as done, printing the progress line if it is due or the work is finished.
+
+        :param n: Number of units finished.
+        :type n: int
+        """
+        self.done += n
+        now = time.time()
+        if now - self._printed < PROGRESS_INTERVAL and self.done < self.total:
+            return
+        self._printed = now
+        elapsed = now - self._start
+        rate = self.done / elapsed if elapsed else 0.0
+        eta = (self.total - self.done) / rate if rate else 0.0
+        minutes, seconds = divmod(int(eta), 60)
+        print(f'{self.label}: {self.done}/{self.total} ({rate:.1f}/s, ETA {minutes}:{seconds:02d})')
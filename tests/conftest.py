@@ -0,0 +1,107 @@
+import functools
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import checkpoint  # noqa: E402
+import dead_letter  # noqa: E402
+import fixtures  # noqa: E402
+import telemetry  # noqa: E402
+
+HOME = {'id': 6, 'name': 'Boston Bruins'}
+AWAY = {'id': 10, 'name': 'Toronto Maple Leafs'}
+
+
+def _play(event, period, clock, team, players, result=None, coordinates=None):
+    play = {'result': {'event': event, **(result or {})}, 'about': {'period': period, 'periodTime': clock}}
+    if players:
+        play['team'] = team
+        play['players'] = [{'player': {'id': player_id, 'fullName': f'Player {player_id}'}, 'playerType': kind}
+                           for player_id, kind in players]
+    if coordinates:
+        play['coordinates'] = coordinates
+    return play
+
+
+def _side(team, first_id, goals):
+    players = {
+        f'ID{player_id}': {
+            'person': {'id': player_id, 'fullName': f'Player {player_id}', 'shootsCatches': 'L'},
+            'position': {'abbreviation': 'C', 'type': 'Forward'},
+            'stats': {'skaterStats': {'timeOnIce': f'{10 + i}:0{i}', 'goals': i % 2, 'assists': 1, 'shots': i}},
+        } for i, player_id in enumerate(range(first_id, first_id + 3))
+    }
+    # goalies have no skater stats and are left out of the player rows
+    players[f'ID{first_id + 9}'] = {'person': {'id': first_id + 9, 'fullName': f'Player {first_id + 9}'},
+                                   'stats': {'goalieStats': {'saves': 30}}}
+    return {'team': team, 'players': players,
+            'teamStats': {'teamSkaterStats': {'goals': goals, 'pim': 4, 'shots': 30, 'hits': 12}}}
+
+
+@pytest.fixture
+def game_feed():
+    """
+    Build a small feed/live document with plays that do and don't have players, strength, and coordinates.
+    """
+    def build(home_goals=3, away_goals=2, period=3, shootout=False):
+        plays = [
+            _play('Game Start', 1, '00:00', None, []),
+            _play('Faceoff', 1, '00:00', HOME, [(100, 'Winner'), (200, 'Loser')], coordinates={'x': 0, 'y': 0}),
+            _play('Shot', 1, '05:12', AWAY, [(201, 'Shooter'), (109, 'Goalie')], coordinates={'x': -60}),
+            _play('Goal', 2, '10:04', HOME, [(101, 'Scorer'), (100, 'Assist'), (209, 'Goalie')],
+                  result={'strength': {'name': 'Even'}, 'gameWinningGoal': True, 'emptyNet': False},
+                  coordinates={'x': 80, 'y': -3}),
+            _play('Goal', 3, '19:40', AWAY, [(202, 'Scorer')], result={'strength': {'name': 'Power Play'}}),
+            _play('Hit', 3, '19:55', HOME, [(102, 'Hitter'), (201, 'Hittee')]),
+        ]
+        return {
+            'gameData': {'teams': {'away': AWAY, 'home': HOME}, 'datetime': {'dateTime': '2015-10-07T23:00:00Z'},
+                         'status': {'abstractGameState': 'Final'}},
+            'liveData': {
+                'plays': {'allPlays': plays},
+                'boxscore': {'teams': {'away': _side(AWAY, 200, away_goals), 'home': _side(HOME, 100, home_goals)}},
+                'linescore': {'currentPeriod': period, 'hasShootout': shootout,
+                              'teams': {'home': {'goals': home_goals}, 'away': {'goals': away_goals}}},
+            },
+        }
+
+    return build
+
+
+@pytest.fixture
+def stand_in(tmp_path):
+    """
+    Start the fixtures stand-in server on a free port, serving the fixtures saved to tmp_path / 'fixtures'.
+    """
+    fixture_dir = str(tmp_path / 'fixtures')
+    servers = []
+
+    def start(error_rate=0.0, error_status=503):
+        server = ThreadingHTTPServer(('localhost', 0), fixtures._handler(fixture_dir, 0, error_rate, error_status))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f'http://localhost:{server.server_port}', fixture_dir
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def run_files(tmp_path, monkeypatch):
+    """
+    Keep the checkpoint, dead letter, and telemetry files main writes every run in tmp_path.
+    """
+    monkeypatch.setattr(checkpoint, 'Checkpoint',
+                        functools.partial(checkpoint.Checkpoint, filename=str(tmp_path / 'checkpoint.json')))
+    monkeypatch.setattr(dead_letter, 'load', functools.partial(dead_letter.load, str(tmp_path / 'dead_letter.json')))
+    monkeypatch.setattr(dead_letter, 'save', functools.partial(dead_letter.save, str(tmp_path / 'dead_letter.json')))
+    monkeypatch.setattr(dead_letter, '_failed', {})
+    monkeypatch.setattr(telemetry, 'save', functools.partial(telemetry.save, str(tmp_path / 'telemetry.json'), None))
+    return tmp_path
@@ -0,0 +1,96 @@
+import pandas as pd
+
+import aggregate
+import api_parse as api
+import main
+
+
+def _game(game_number, home_goals, away_goals, final_period=3, shootout=False, game_type='Regular Season'):
+    # boxscore goals don't count the shootout winner, the linescore final goals do
+    return [
+        {'Season': 20152016, 'Game Type': game_type, 'Game Number': game_number, 'Team': team, 'Goals': goals,
+         'Shots': 30, 'Final Goals': final, 'Final Period': final_period, 'Shootout': shootout}
+        for team, goals, final in [('Home', min(home_goals, away_goals) if shootout else home_goals, home_goals),
+                                   ('Away', min(home_goals, away_goals) if shootout else away_goals, away_goals)]
+    ]
+
+
+def _results(games):
+    return {(row['Game Number'], row['Team']): (row['Win'], row['Loss'], row['OTL'])
+            for row in games.to_dict('records')}
+
+
+def test_team_games_record():
+    team_df = pd.DataFrame(
+        _game(1, 4, 1) +
+        _game(2, 2, 3, final_period=4) +
+        _game(3, 3, 2, final_period=5, shootout=True) +
+        _game(4, 5, 0, game_type='Playoffs'))
+
+    games = aggregate.team_games(team_df)
+    assert _results(games) == {
+        (1, 'Home'): (True, False, False), (1, 'Away'): (False, True, False),
+        (2, 'Home'): (False, False, True), (2, 'Away'): (True, False, False),
+        (3, 'Home'): (True, False, False), (3, 'Away'): (False, False, True),
+    }
+    shootout = games[games['Game Number'] == 3].set_index('Team')
+    assert shootout.loc['Home', 'GF'] == 3 and shootout.loc['Home', 'GA'] == 2
+
+
+def test_team_games_without_linescore_columns():
+    team_df = pd.DataFrame(_game(1, 1, 2)).drop(columns=['Final Goals', 'Final Period', 'Shootout'])
+
+    games = aggregate.team_games(team_df)
+    assert _results(games) == {(1, 'Home'): (False, True, False), (1, 'Away'): (True, False, False)}
+
+
+def test_team_season_stats_without_powerplay_or_shot_stats(game_feed):
+    # the feed's boxscores only have goals, penalty minutes, shots, and hits
+    columns = api.GameColumns()
+    columns.add_game(game_feed(), '2015', '02', '0001')
+    event_df, team_df, player_df, _, _ = main._game_frames(columns)
+
+    stats = aggregate.team_season_stats(team_df, event_df, player_df).set_index('Team')
+    assert stats.loc['Boston Bruins', 'Wins'] == 1
+    assert stats.loc['Boston Bruins', 'Shots Per Game'] == 30
+    assert 'Powerplay %' not in stats.columns and 'PK %' not in stats.columns
+
+    stats = aggregate.team_season_stats(team_df.drop(columns=['Shots'])).set_index('Team')
+    assert stats.loc['Toronto Maple Leafs', 'Losses'] == 1
+    assert 'Shots Per Game' not in stats.columns and 'Save %' not in stats.columns
+
+
+def test_player_season_stats_keeps_players_sharing_a_name_apart():
+    player_df = pd.DataFrame([
+        {'Season': 20192020, 'Game Type': 'Regular Season', 'Game Number': game_number, 'Player ID': player_id,
+         'Player': 'Sebastian Aho', 'Team': team, 'Home': 'Carolina Hurricanes', 'Goals': goals, 'Assists': 1,
+         'Shots': 3, 'TOI': '15:30', 'Even Strength TOI': '12:00', 'SH TOI': '01:00', 'Powerplay TOI': '02:30',
+         **{col: 0 for col in aggregate._PLAYER_COLS if col not in ['Goals', 'Assists', 'Shots']}}
+        for game_number, player_id, team, goals in [(1, 8478427, 'Carolina Hurricanes', 2),
+                                                    (2, 8478427, 'Carolina Hurricanes', 1),
+                                                    (1, 8480222, 'New York Islanders', 0)]
+    ])
+
+    stats = aggregate.player_season_stats(player_df)
+    stats = stats.set_index(['Player ID', 'Stat Type'])
+    assert list(stats.columns[:2]) == ['Season', 'Player']
+    assert stats.loc[(8478427, 'Full Season'), 'Goals'] == 3
+    assert stats.loc[(8478427, 'Full Season'), 'Games'] == 2
+    assert stats.loc[(8478427, 'Full Season'), 'TOI'] == '31:00'
+    assert stats.loc[(8480222, 'Away'), 'Assists'] == 1
+    assert (8480222, 'Home') not in stats.index
+    assert stats.loc[(8480222, 'Full Season'), 'Player'] == 'Sebastian Aho'
+
+
+def test_player_season_stats_leaves_out_missing_stats():
+    player_df = pd.DataFrame([
+        {'Season': 20192020, 'Game Type': 'Regular Season', 'Game Number': game_number, 'Player ID': 8478427,
+         'Player': 'Sebastian Aho', 'Team': 'Carolina Hurricanes', 'Home': 'Carolina Hurricanes', 'Goals': 1,
+         'Assists': 2, 'Shots': 4, 'TOI': '18:00'} for game_number in [1, 2]
+    ])
+
+    stats = aggregate.player_season_stats(player_df).set_index('Stat Type')
+    assert stats.loc['Full Season', 'Points'] == 6
+    assert stats.loc['Full Season', 'Shot %'] == 25
+    assert stats.loc['Full Season', 'TOI per Game'] == '18:00'
+    assert not {'Hits', 'PIM', 'Powerplay Points', 'Faceoff %', 'SH TOI'} & set(stats.columns)
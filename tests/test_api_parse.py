@@ -0,0 +1,133 @@
+import pandas as pd
+import pytest
+
+import api_parse as api
+
+
+def _values(df):
+    # missing values are None in the columnar frames and NaN in frames built from row dicts
+    return df.astype(object).where(df.notna(), None)
+
+
+def test_game_columns_match_get_game_stats(monkeypatch, game_feed):
+    feeds = {'0001': game_feed(), '0002': game_feed(home_goals=1, away_goals=4)}
+    monkeypatch.setattr(api.client, 'get_json', lambda url: feeds[url.split('/')[-3][-4:]])
+
+    columns = api.GameColumns()
+    rows = [[], [], []]
+    for game_number, feed in feeds.items():
+        assert columns.add_game(feed, '2015', '02', game_number)
+        for table, game_rows in zip(rows, api.get_game_stats('2015', '02', game_number)):
+            table.extend(game_rows)
+
+    for df, table in zip(columns.to_frames(), rows):
+        expected = pd.DataFrame(table)
+        assert list(df.columns) == list(expected.columns)
+        pd.testing.assert_frame_equal(_values(df), _values(expected))
+
+
+def test_game_columns_rolls_back_a_failed_game(game_feed):
+    columns = api.GameColumns()
+    columns.add_game(game_feed(), '2015', '02', '0001')
+    broken = game_feed()
+    del broken['liveData']['boxscore']['teams']['home']['teamStats']
+    with pytest.raises(KeyError):
+        columns.add_game(broken, '2015', '02', '0002')
+
+    events_df, team_df, player_df = columns.to_frames()
+    assert len(columns) == 1
+    assert set(events_df['Game Number']) == {1}
+    assert len(team_df) == 2
+    assert len(player_df) == 6
+
+
+def test_game_columns_dimension_frames(game_feed):
+    columns = api.GameColumns()
+    columns.add_game(game_feed(), '2015', '02', '0001')
+    columns.add_game(game_feed(), '2015', '02', '0002')
+
+    player_info_df, team_info_df = columns.dimension_frames()
+    assert sorted(team_info_df['Team ID']) == [6, 10]
+    # every boxscore player once, goalies included
+    assert len(player_info_df) == 8
+    assert player_info_df['Player ID'].is_unique
+
+
+def test_season_rows_have_integer_seasons(monkeypatch):
+    split = {'stat': {'wins': 40}}
+    teams = {'teams': [{'id': 6, 'name': 'Boston Bruins', 'teamStats': [{'splits': [split, split]}]}]}
+    monkeypatch.setattr(api.client, 'get_json', lambda url: teams)
+    stats, ranks = api.get_league_team_stats('20152016')
+    assert stats[0]['Season'] == ranks[0]['Season'] == 20152016
+
+    player = {'stats': [{'type': {'displayName': 'statsSingleSeason'},
+                         'splits': [{'season': '20152016', 'stat': {'goals': 30}}]}]}
+    monkeypatch.setattr(api.client, 'get_json', lambda url: player)
+    assert [row['Season'] for row in api.get_player_stats_multi(8471214, '20152016', player_name='A')] == [20152016]
+
+
+def test_season_games_come_from_the_schedule(monkeypatch):
+    postponed = {'gamePk': 2015020002, 'gameDate': '2016-01-23T00:00:00Z', 'status': {'abstractGameState': 'Final'}}
+    schedule = {'dates': [
+        {'games': [{'gamePk': 2015020001, 'gameDate': '2015-10-07T23:00:00Z'}, postponed]},
+        {'games': [{'gamePk': 2015030111, 'gameDate': '2016-04-13T23:00:00Z'}]},
+        {'games': [postponed]},
+    ]}
+    urls = []
+    monkeypatch.setattr(api, '_game_schedule', {})
+    monkeypatch.setattr(api.client, 'get_json', lambda url: urls.append(url) or schedule)
+
+    # regular season and playoff games are listed once each, in game order
+    assert api.get_season_games(20152016) == [('2015', '02', '0001'), ('2015', '02', '0002'), ('2015', '03', '0111')]
+    assert urls == [f'{api.STATS_API}/schedule?season=20152016&gameType=R,P']
+    assert api._schedule_game('2015', '02', '0002') == {'dateTime': '2016-01-23T00:00:00Z',
+                                                        'abstractGameState': 'Final'}
+    assert len(urls) == 1
+
+
+def test_player_stats_of_every_split_come_from_one_request(monkeypatch):
+    def split(season, **stat):
+        return {'season': season, 'stat': stat}
+
+    player = {'stats': [
+        {'type': {'displayName': 'homeAndAway'}, 'splits': [split('20152016', goals=20), split('20152016', goals=10)]},
+        {'type': {'displayName': 'goalsByGameSituation'}, 'splits': [split('20152016', goalsInFirstPeriod=12)]},
+        # a split the player has no stats for is left out
+        {'type': {'displayName': 'statsSingleSeason'}, 'splits': []},
+    ]}
+    urls = []
+    monkeypatch.setattr(api.client, 'get_json', lambda url: urls.append(url) or player)
+
+    rows = api.get_player_stats_multi(8471214, '20152016', player_name='Alex Ovechkin')
+    assert urls == [f'{api.STATS_API}/people/8471214/stats?stats={",".join(api.PLAYER_STATS_BY)}&season=20152016']
+    assert [(row['Stat Type'], row.get('goals')) for row in rows] == [('Home', 20), ('Away', 10), ('Situation', None)]
+    assert {(row['Player ID'], row['Player'], row['Season']) for row in rows} == {(8471214, 'Alex Ovechkin', 20152016)}
+
+
+def test_league_requests_return_every_team(monkeypatch):
+    teams = {'teams': [
+        {'id': 6, 'name': 'Boston Bruins',
+         'teamStats': [{'splits': [{'stat': {'wins': 42}}, {'stat': {'wins': '9th'}}]}],
+         'roster': {'roster': [{'person': {'id': 8470638, 'fullName': 'Patrice Bergeron'}}]}},
+        # teams that didn't play in the season have no stats or roster
+        {'id': 10, 'name': 'Toronto Maple Leafs', 'teamStats': [{'splits': []}]},
+    ]}
+    urls = []
+    monkeypatch.setattr(api.client, 'get_json', lambda url: urls.append(url) or teams)
+
+    stats, ranks = api.get_league_team_stats('20152016')
+    assert [(row['Team'], row['wins']) for row in stats] == [('Boston Bruins', 42)]
+    assert [(row['Team'], row['wins']) for row in ranks] == [('Boston Bruins', '9th')]
+    assert api.get_league_rosters('20152016') == [{'ID': 8470638, 'Player': 'Patrice Bergeron'}]
+    assert urls == [f'{api.STATS_API}/teams?expand=team.stats&season=20152016',
+                    f'{api.STATS_API}/teams?expand=team.roster&season=20152016']
+
+
+def test_shifts_carry_player_and_team_ids():
+    shift = {'playerId': 8471214, 'firstName': 'Alex', 'lastName': 'Ovechkin', 'period': 1, 'shiftNumber': 1,
+             'startTime': '00:00', 'endTime': '00:45', 'duration': '00:45', 'teamId': 15,
+             'teamName': 'Washington Capitals'}
+    rows = api.parse_shift_data({'data': [shift]}, '2015', '02', '0001')
+    assert [(row['Player ID'], row['Player Name'], row['Team ID'], row['Team']) for row in rows] == [
+        (8471214, 'Alex Ovechkin', 15, 'Washington Capitals')]
+    assert api.parse_shift_data({}, '2015', '02', '0001') == []
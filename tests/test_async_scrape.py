@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import time
+
+import async_scrape
+
+
+def test_ordered_keeps_every_worker_busy_and_results_in_order():
+    lock = threading.Lock()
+    running = []
+    log = []
+
+    def fetch(game, seconds):
+        with lock:
+            running.append(game)
+            log.append(('start', game, len(running)))
+        time.sleep(seconds)
+        with lock:
+            running.remove(game)
+            log.append(('end', game, len(running)))
+        return game * 10
+
+    async def collect():
+        # the first game is slow, the others shouldn't wait for it
+        args = [(0, 0.3)] + [(game, 0.02) for game in range(1, 8)]
+        return [item async for item in async_scrape._ordered(fetch, args, 2)]
+
+    results = asyncio.run(collect())
+    assert [(args[0], result) for args, result in results] == [(game, game * 10) for game in range(8)]
+    assert max(count for _, _, count in log) == 2
+    slow_end = next(i for i, entry in enumerate(log) if entry[:2] == ('end', 0))
+    assert slow_end > next(i for i, entry in enumerate(log) if entry[:2] == ('start', 7))
+
+
+def test_game_stats_adds_games_in_order(monkeypatch, game_feed):
+    feeds = {'0001': game_feed(), '0002': game_feed(home_goals=1, away_goals=4), '0003': None}
+
+    def get_game_feed(season, game_type, game_number, fetch='full'):
+        time.sleep(0.1 if game_number == '0001' else 0)
+        if feeds[game_number] is None:
+            raise async_scrape.requests.exceptions.ConnectionError()
+        return feeds[game_number]
+
+    failed = []
+    monkeypatch.setattr(async_scrape.api, 'get_game_feed', get_game_feed)
+    monkeypatch.setattr(async_scrape.dead_letter, 'add', lambda kind, key: failed.append((kind, key)))
+    games = [('2015', '02', game_number) for game_number in feeds]
+    columns = asyncio.run(async_scrape.game_stats(games, concurrency=3, rate=100))
+
+    _, team_df, _ = columns.to_frames()
+    assert team_df['Game Number'].drop_duplicates().tolist() == [1, 2]
+    assert failed == [('game', {'season': '2015', 'game_type': '02', 'game_number': '0003'})]
@@ -0,0 +1,54 @@
+import os
+import time
+
+import pytest
+
+import cache
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, 'CACHE_DIR', str(tmp_path) + '/')
+    monkeypatch.setattr(cache, '_size', None)
+    monkeypatch.setattr(cache.utils, 'current_season', lambda: 2019)
+    return tmp_path
+
+
+def test_ttl(cache_dir):
+    final = {'gameData': {'status': {'abstractGameState': 'Final'}}}
+    assert cache.ttl('https://api/game/2019020001/feed/live', final) is None
+    assert cache.ttl('https://api/game/2019020001/feed/live', {}) == cache.CURRENT_TTL
+    assert cache.ttl('https://api/teams?season=20152016', {}) is None
+    assert cache.ttl('https://api/teams?season=20192020', {}) == cache.CURRENT_TTL
+    assert cache.ttl('https://api/teams', {}) == cache.CURRENT_TTL
+
+
+def test_expired_documents_are_misses(cache_dir, monkeypatch):
+    url = 'https://api/teams?season=20192020'
+    cache.put(url, {'teams': [1]})
+    assert cache.get(url) == {'teams': [1]}
+    later = time.time() + cache.CURRENT_TTL + 1
+    monkeypatch.setattr(cache.time, 'time', lambda: later)
+    assert cache.get(url) is None
+
+
+def test_overwriting_a_document_replaces_its_size(cache_dir):
+    url = 'https://api/teams?season=20152016'
+    for i in range(5):
+        cache.put(url, {'teams': list(range(100 * i))})
+    assert cache._size == cache._dir_size() == os.path.getsize(cache._path(url))
+    assert not list(cache_dir.glob('*.tmp'))
+
+
+def test_least_recently_used_documents_are_evicted(cache_dir, monkeypatch):
+    urls = [f'https://api/people/{i}/stats?season=20152016' for i in range(4)]
+    for i, url in enumerate(urls):
+        cache.put(url, {'stats': 'x' * 1000, 'id': i})
+        os.utime(cache._path(url), (i, i))
+    cache.get(urls[0])
+    monkeypatch.setattr(cache, 'MAX_BYTES', cache._dir_size())
+
+    cache.put('https://api/people/4/stats?season=20152016', {'stats': 'x' * 1000, 'id': 4})
+    assert cache.get(urls[0]) is not None
+    assert cache.get(urls[1]) is None
+    assert cache._size == cache._dir_size() <= cache.MAX_BYTES
@@ -0,0 +1,79 @@
+import sqlite3
+
+import api_parse as api
+import checkpoint
+import client
+import fixtures
+import main
+
+
+def test_only_committed_units_are_done(tmp_path):
+    filename = str(tmp_path / 'checkpoint.json')
+    done = checkpoint.Checkpoint('games.xlsx', 'game', filename)
+    done.mark(('2015', '02', '0001'))
+    assert not done.is_done(('2015', '02', '0001'))
+    assert not checkpoint.Checkpoint('games.xlsx', 'game', filename).is_done(('2015', '02', '0001'))
+
+    done.commit()
+    assert done.is_done(('2015', '02', '0001'))
+    assert checkpoint.Checkpoint('games.xlsx', 'game', filename).is_done('2015020001')
+
+
+def test_checkpoints_are_kept_per_output_and_kind(tmp_path):
+    filename = str(tmp_path / 'checkpoint.json')
+    games = checkpoint.Checkpoint('games.xlsx', 'game', filename)
+    shifts = checkpoint.Checkpoint('games.xlsx', 'shift', filename)
+    games.mark('2015020001')
+    shifts.mark('2015020002')
+    # each commit keeps what the others saved
+    games.commit()
+    shifts.commit()
+
+    assert checkpoint.Checkpoint('games.xlsx', 'game', filename).is_done('2015020001')
+    assert not checkpoint.Checkpoint('games.xlsx', 'game', filename).is_done('2015020002')
+    assert checkpoint.Checkpoint('games.xlsx', 'shift', filename).is_done('2015020002')
+    assert not checkpoint.Checkpoint('other.xlsx', 'game', filename).is_done('2015020001')
+
+    games.reset()
+    assert not games.is_done('2015020001')
+    assert not checkpoint.Checkpoint('games.xlsx', 'game', filename).is_done('2015020001')
+    assert checkpoint.Checkpoint('games.xlsx', 'shift', filename).is_done('2015020002')
+
+
+def _feed_url(game_number):
+    return f'{api.STATS_API}/game/201502{game_number}/feed/live'
+
+
+def test_resumed_run_only_scrapes_unfinished_games(run_files, game_feed, monkeypatch):
+    fixture_dir = str(run_files / 'fixtures')
+    schedule = {'dates': [{'games': [{'gamePk': 2015020001, 'gameDate': '2015-10-07T23:00:00Z'},
+                                     {'gamePk': 2015020002, 'gameDate': '2015-10-08T23:00:00Z'}]}]}
+    fixtures.save(f'{api.STATS_API}/schedule?season=20152016&gameType=R,P', schedule, fixture_dir=fixture_dir)
+    fixtures.save(_feed_url('0001'), game_feed(), fixture_dir=fixture_dir)
+
+    requested = []
+    get_game_feed = api.get_game_feed
+
+    def record(season, game_type, game_number, fetch='full'):
+        requested.append(game_number)
+        return get_game_feed(season, game_type, game_number, fetch)
+
+    monkeypatch.setattr(api, 'get_game_feed', record)
+    filename = str(run_files / 'games.db')
+
+    # the second game was never recorded so it fails in replay and is left for the next run
+    with client.configured(mode='replay', fixture_dir=fixture_dir, use_cache=False, rate=0):
+        main.write_game_stats(filename, 2015, output='sqlite')
+    assert (run_files / 'dead_letter.json').exists()
+
+    fixtures.save(_feed_url('0002'), game_feed(home_goals=1), fixture_dir=fixture_dir)
+    requested.clear()
+    with client.configured(mode='replay', fixture_dir=fixture_dir, use_cache=False, rate=0):
+        main.write_game_stats(filename, 2015, output='sqlite')
+
+    assert '0001' not in requested
+    assert '0002' in requested
+    assert not (run_files / 'dead_letter.json').exists()
+    with sqlite3.connect(filename) as con:
+        games = con.execute('SELECT DISTINCT "Game Number" FROM game_stats_teams ORDER BY 1').fetchall()
+    assert games == [(1,), (2,)]
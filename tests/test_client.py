@@ -0,0 +1,192 @@
+import email.utils
+import multiprocessing
+import threading
+import time
+import types
+
+import pytest
+import requests
+
+import client
+import fixtures
+
+
+@pytest.fixture(autouse=True)
+def settings():
+    # every test gets its own session and leaves the client settings as they were
+    with client.configured(use_cache=False, rate=0):
+        yield
+
+
+def test_session_is_reused_until_closed():
+    session = client.get_session()
+    assert client.get_session() is session
+    assert session.headers['Connection'] == 'keep-alive'
+    assert session.get_adapter('https://statsapi.web.nhl.com')._pool_maxsize == client.POOL_SIZE
+
+    client.close()
+    assert client.get_session() is not session
+
+
+def test_configured_restores_the_previous_settings():
+    session = client.get_session()
+    timeout, pool_size = client.TIMEOUT, client.POOL_SIZE
+    with client.configured(timeout=1, pool_size=50, headers={'X-Test': '1'}):
+        assert client.TIMEOUT == 1
+        assert client.get_session().headers['X-Test'] == '1'
+        assert client.get_session().get_adapter('https://api.nhle.com')._pool_maxsize == 50
+    assert (client.TIMEOUT, client.POOL_SIZE) == (timeout, pool_size)
+    assert 'X-Test' not in client.HEADERS
+    assert client.get_session() is not session
+    assert 'X-Test' not in client.get_session().headers
+
+
+
+def test_rate_limiter_allows_a_burst_then_the_rate():
+    limiter = client.RateLimiter(rate=50, burst=3)
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.acquire()
+    assert time.monotonic() - start < 0.05
+    for _ in range(5):
+        limiter.acquire()
+    assert time.monotonic() - start >= 0.09
+
+
+def test_rate_limiter_is_shared_by_threads():
+    limiter = client.RateLimiter(rate=100)
+    start = time.monotonic()
+    threads = [threading.Thread(target=limiter.acquire) for _ in range(11)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - start >= 0.09
+
+
+def test_rate_limiter_slows_down_to_a_minimum():
+    limiter = client.RateLimiter(rate=1)
+    limiter.slow_down()
+    assert limiter.rate == 0.5
+    for _ in range(10):
+        limiter.slow_down()
+    assert limiter.rate == 0.1
+
+
+
+def _acquire(limiter, count):
+    for _ in range(count):
+        limiter.acquire()
+
+
+def test_shared_rate_limiter_is_shared_by_processes():
+    limiter = client.SharedRateLimiter(rate=20, burst=2)
+    start = time.monotonic()
+    processes = [multiprocessing.Process(target=_acquire, args=(limiter, 3)) for _ in range(2)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    # 2 tokens in the burst then 4 more at 20 per second
+    assert time.monotonic() - start >= 0.19
+
+
+def test_shared_rate_limiter_slows_down_every_process():
+    limiter = client.SharedRateLimiter(rate=4)
+    process = multiprocessing.Process(target=limiter.slow_down)
+    process.start()
+    process.join()
+    assert limiter.rate == 2
+
+
+URL = 'https://statsapi.web.nhl.com/api/v1/teams?season=20152016'
+DOCUMENT = {'teams': [{'id': 6, 'name': 'Boston Bruins'}]}
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    # retries are recorded instead of slept, the stand-in server sleeps 0 seconds before every response
+    slept = []
+
+    def sleep(seconds):
+        if seconds:
+            slept.append(seconds)
+
+    monkeypatch.setattr(client.time, 'sleep', sleep)
+    return slept
+
+
+def _fail_first(monkeypatch, count):
+    # the stand-in server fails a request when random() is below its error rate
+    rolls = iter([0.0] * count)
+    monkeypatch.setattr(fixtures, 'random', types.SimpleNamespace(random=lambda: next(rolls, 1.0)))
+
+
+def test_errors_are_retried_after_the_retry_after_header(monkeypatch, stand_in, delays):
+    base_url, fixture_dir = stand_in(error_rate=0.5)
+    fixtures.save(URL, DOCUMENT, fixture_dir=fixture_dir)
+    _fail_first(monkeypatch, 2)
+    with client.configured(base_url=base_url):
+        assert client.get_json(URL) == DOCUMENT
+    assert delays == [1.0, 1.0]
+
+
+def test_too_many_requests_slows_the_client_down(monkeypatch, stand_in, delays):
+    base_url, fixture_dir = stand_in(error_rate=0.5, error_status=429)
+    fixtures.save(URL, DOCUMENT, fixture_dir=fixture_dir)
+    _fail_first(monkeypatch, 1)
+    with client.configured(base_url=base_url, rate=10):
+        assert client.get_json(URL) == DOCUMENT
+        assert client._rate_limiter.rate == 5
+
+
+def test_requests_fail_once_every_retry_is_used(monkeypatch, stand_in, delays):
+    base_url, _ = stand_in(error_rate=1.0)
+    monkeypatch.setattr(client, 'MAX_RETRIES', 2)
+    with client.configured(base_url=base_url), pytest.raises(requests.exceptions.HTTPError):
+        client.get_json(URL)
+    assert delays == [1.0, 1.0]
+
+
+def test_connection_errors_back_off_exponentially(monkeypatch, delays):
+    monkeypatch.setattr(client, 'MAX_RETRIES', 3)
+    monkeypatch.setattr(client.HTTPAdapter, 'send', _refuse)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.get_json(URL)
+    assert len(delays) == 3
+    for attempt, delay in enumerate(delays):
+        assert client.BACKOFF_BASE * 2 ** attempt / 2 <= delay <= client.BACKOFF_BASE * 2 ** attempt
+
+
+def _refuse(*args, **kwargs):
+    raise requests.exceptions.ConnectionError('refused')
+
+
+def test_retry_after_dates():
+    later = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 28 <= client._retry_after(types.SimpleNamespace(headers={'Retry-After': later})) <= 30
+    assert client._retry_after(types.SimpleNamespace(headers={'Retry-After': '2'})) == 2
+    assert client._retry_after(types.SimpleNamespace(headers={})) is None
+
+
+def test_base_url_keeps_the_api_host_and_query():
+    assert client._rewrite(URL) == URL
+    with client.configured(base_url='http://localhost:8765/'):
+        assert client._rewrite(URL) == 'http://localhost:8765/statsapi.web.nhl.com/api/v1/teams?season=20152016'
+    assert client._rewrite(URL) == URL
+
+
+def test_recorded_responses_are_replayed(tmp_path, monkeypatch, stand_in):
+    base_url, fixture_dir = stand_in()
+    fixtures.save(URL, DOCUMENT, fixture_dir=fixture_dir)
+    recorded = str(tmp_path / 'recorded')
+    with client.configured(base_url=base_url, mode='record', fixture_dir=recorded):
+        assert client.get_json(URL) == DOCUMENT
+    assert list(fixtures.iter_fixtures(recorded)) == [{'url': URL, 'status': 200, 'document': DOCUMENT}]
+
+    # nothing is requested in replay and urls that were never recorded fail like a dropped connection
+    monkeypatch.setattr(client.HTTPAdapter, 'send', _refuse)
+    with client.configured(mode='replay', fixture_dir=recorded):
+        assert client.get_json(URL) == DOCUMENT
+        with pytest.raises(requests.exceptions.ConnectionError):
+            client.get_json(URL.replace('20152016', '20162017'))
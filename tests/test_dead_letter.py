@@ -0,0 +1,68 @@
+import pytest
+import requests
+
+import dead_letter
+
+
+@pytest.fixture(autouse=True)
+def failed(monkeypatch):
+    monkeypatch.setattr(dead_letter, '_failed', {})
+
+
+def _game(season, game_number):
+    return {'season': season, 'game_type': '02', 'game_number': game_number}
+
+
+def test_pop_only_returns_the_given_seasons():
+    for key in [_game('2015', '0001'), _game('2016', '0001'), _game('2015', '0001')]:
+        dead_letter.add('game', key)
+
+    assert dead_letter.pop('game', ['20152016']) == [_game('2015', '0001')]
+    assert dead_letter.pop('game') == [_game('2016', '0001')]
+    assert dead_letter.pop('game') == []
+
+
+def test_retry_keeps_requests_that_fail_again():
+    dead_letter.add('game', _game('2015', '0001'))
+    dead_letter.add('game', _game('2015', '0002'))
+
+    def fetch(season, game_type, game_number):
+        if game_number == '0002':
+            raise requests.exceptions.ConnectionError()
+        return game_number
+
+    assert dead_letter.retry('game', fetch) == [(_game('2015', '0001'), '0001')]
+    assert dead_letter.pop('game') == [_game('2015', '0002')]
+
+
+def test_saved_requests_are_retried_by_the_next_run(tmp_path):
+    filename = str(tmp_path / 'dead_letter.json')
+    dead_letter.add('game', _game('2015', '0001'))
+    dead_letter.add('team', {'season': '20152016'})
+    dead_letter.save(filename)
+
+    dead_letter._failed.clear()
+    dead_letter.load(filename)
+    assert dead_letter.retry('team', lambda season: season) == [({'season': '20152016'}, '20152016')]
+    dead_letter.save(filename)
+    dead_letter._failed.clear()
+    dead_letter.load(filename)
+    assert dead_letter.pop('game') == [_game('2015', '0001')]
+    assert dead_letter.pop('team') == []
+
+    # nothing left to retry removes the file
+    dead_letter.save(filename)
+    assert not (tmp_path / 'dead_letter.json').exists()
+
+
+def test_retry_fits_keys_saved_by_older_fetchers():
+    # teams used to be requested one at a time and were saved with their team id
+    for team_id in [6, 10]:
+        dead_letter.add('team', {'team_id': team_id, 'season': '20152016'})
+    dead_letter.add('team', {'team_id': 6})
+
+    def fetch(season):
+        return season
+
+    assert dead_letter.retry('team', fetch) == [({'season': '20152016'}, '20152016')]
+    assert dead_letter.pop('team') == []
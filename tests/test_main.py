@@ -0,0 +1,32 @@
+import pandas as pd
+
+import api_parse as api
+import client
+import fixtures
+import main
+import sinks
+
+
+def test_parallel_scrape_writes_the_same_rows(run_files, game_feed, monkeypatch):
+    fixture_dir = str(run_files / 'fixtures')
+    game_numbers = ['0001', '0002', '0003', '0004', '0005']
+    schedule = {'dates': [{'games': [{'gamePk': int(f'201502{game_number}')} for game_number in game_numbers]}]}
+    fixtures.save(f'{api.STATS_API}/schedule?season=20152016&gameType=R,P', schedule, fixture_dir=fixture_dir)
+    for goals, game_number in enumerate(game_numbers):
+        fixtures.save(f'{api.STATS_API}/game/201502{game_number}/feed/live', game_feed(home_goals=goals),
+                      fixture_dir=fixture_dir)
+    # several chunks of games are in flight in the worker processes at once
+    monkeypatch.setattr(main, 'CHUNK_GAMES', 2)
+    monkeypatch.setattr(main, 'PROCESS_RATE', 1000)
+
+    with client.configured(mode='replay', fixture_dir=fixture_dir, use_cache=False, rate=0):
+        main.write_game_stats(str(run_files / 'serial'), 2015, output='parquet')
+        main.write_game_stats(str(run_files / 'parallel'), 2015, output='parquet', processes=2)
+
+    # every chunk is saved to its own file, files are read back in any order
+    for table in main.GAME_TABLES['full']:
+        key = sinks.TABLES[table]['key']
+        serial = sinks.load_table(str(run_files / 'serial'), table, 'parquet').sort_values(key, ignore_index=True)
+        parallel = sinks.load_table(str(run_files / 'parallel'), table, 'parquet').sort_values(key, ignore_index=True)
+        assert not serial.empty
+        pd.testing.assert_frame_equal(parallel, serial)
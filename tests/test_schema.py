@@ -0,0 +1,35 @@
+import pandas as pd
+
+import schema
+
+
+def test_apply_types_the_declared_columns():
+    df = pd.DataFrame({
+        'Season': [20152016, 20152016],
+        'Game Number': [1, 2],
+        'Team': ['Boston Bruins', 'Toronto Maple Leafs'],
+        'Team ID': [6, None],
+        'Game Time': ['2015-10-07T23:00:00Z', None],
+        'Shots': [30, 25],
+    })
+    df = schema.apply('game_stats_teams', df)
+
+    assert df.dtypes.astype(str).to_dict() == {
+        'Season': 'int32',
+        'Game Number': 'int16',
+        'Team': 'category',
+        'Team ID': 'Int16',
+        'Game Time': 'datetime64[us, UTC]',
+        # columns the schema doesn't declare are left alone
+        'Shots': 'int64',
+    }
+    assert df['Game Time'].iloc[0] == pd.Timestamp('2015-10-07 23:00', tz='UTC')
+    assert df['Team ID'].isna().tolist() == [False, True]
+
+
+def test_empty_categories_keep_string_values():
+    # boxscore rows have no game times or strengths, the columns are written next to rows that have them
+    df = schema.apply('game_stats_events', pd.DataFrame({'Strength': [None, None], 'Player': [None, 'A']}))
+    assert pd.api.types.is_string_dtype(df['Strength'].cat.categories)
+    assert pd.api.types.is_string_dtype(df['Player'].cat.categories)
+    pd.testing.assert_frame_equal(schema.apply('unknown', df), df)
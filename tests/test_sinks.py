@@ -0,0 +1,212 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import api_parse as api
+import main
+import sinks
+
+OUTPUTS = {'xlsx': 'games.xlsx', 'parquet': 'games', 'sqlite': 'games.db'}
+
+
+def _teams(game_numbers, shots):
+    return pd.DataFrame([
+        {'Season': 20152016, 'Game Type': 'Regular Season', 'Game Number': game_number, 'Team': team, 'Shots': shots}
+        for game_number in game_numbers for team in ['Boston Bruins', 'Toronto Maple Leafs']
+    ])
+
+
+def _write(filename, output, *frames):
+    sink = sinks.open_sink(filename, output)
+    for df in frames:
+        sink.write('game_stats_teams', df)
+    sink.close()
+
+
+@pytest.mark.parametrize('output', OUTPUTS)
+def test_upsert_replaces_rows_with_the_same_key(tmp_path, output):
+    filename = str(tmp_path / OUTPUTS[output])
+    _write(filename, output, _teams([1, 2], shots=20))
+    _write(filename, output, _teams([2, 3], shots=30))
+
+    df = sinks.load_table(filename, 'game_stats_teams', output)
+    df = df.sort_values(['Game Number', 'Team']).reset_index(drop=True)
+    assert df['Game Number'].tolist() == [1, 1, 2, 2, 3, 3]
+    assert df['Shots'].tolist() == [20, 20, 30, 30, 30, 30]
+
+
+@pytest.mark.parametrize('output', OUTPUTS)
+def test_upsert_matches_text_seasons(tmp_path, output):
+    # rows built from api responses had text seasons, the same rows are read back from a file as integers
+    filename = str(tmp_path / OUTPUTS[output])
+    stats = pd.DataFrame([{'Season': '20152016', 'Team': team, 'Wins': 40} for team in ['Boston Bruins', 'Ottawa']])
+    for wins in [40, 41]:
+        sink = sinks.open_sink(filename, output)
+        sink.write('team_season_stats', stats.assign(Wins=wins))
+        sink.close()
+
+    df = sinks.load_table(filename, 'team_season_stats', output)
+    assert len(df) == 2
+    assert df['Wins'].tolist() == [41, 41]
+
+
+@pytest.mark.parametrize('output', OUTPUTS)
+def test_load_table_filters_seasons(tmp_path, output):
+    filename = str(tmp_path / OUTPUTS[output])
+    later = _teams([1], shots=25).assign(Season=20162017)
+    _write(filename, output, _teams([1], shots=20), later)
+
+    df = sinks.load_table(filename, 'game_stats_teams', output, seasons=[20162017], columns=['Season', 'Shots'])
+    assert df['Season'].tolist() == [20162017, 20162017]
+    assert df['Shots'].tolist() == [25, 25]
+
+
+@pytest.mark.parametrize('output', OUTPUTS)
+def test_player_stats_are_keyed_by_id(tmp_path, output):
+    filename = str(tmp_path / OUTPUTS[output])
+    stats = pd.DataFrame([
+        {'Season': 20192020, 'Player ID': player_id, 'Player': 'Sebastian Aho', 'Stat Type': 'Full Season',
+         'Goals': goals} for player_id, goals in [(8478427, 38), (8480222, 2)]
+    ])
+    sink = sinks.open_sink(filename, output)
+    sink.write('player_season_stats', stats)
+    sink.close()
+    sink = sinks.open_sink(filename, output)
+    sink.write('player_season_stats', stats.iloc[[1]].assign(Goals=3))
+    sink.close()
+
+    df = sinks.load_table(filename, 'player_season_stats', output).sort_values('Player ID')
+    assert df['Player ID'].tolist() == [8478427, 8480222]
+    assert df['Goals'].tolist() == [38, 3]
+
+
+
+@pytest.mark.parametrize('output', OUTPUTS)
+def test_players_seen_in_every_chunk_are_written_once(tmp_path, output, game_feed):
+    filename = str(tmp_path / OUTPUTS[output])
+    sink = sinks.open_sink(filename, output)
+    # every chunk of games has its own builder, the same players turn up again in the next chunk
+    for game_number in ['0001', '0002']:
+        columns = api.GameColumns()
+        columns.add_game(game_feed(), '2015', '02', game_number)
+        main._write_game_stats(sink, main._game_frames(columns))
+    sink.close()
+
+    player_info = sinks.load_table(filename, 'player_info', output)
+    team_info = sinks.load_table(filename, 'team_info', output)
+    assert len(player_info) == 8
+    assert sorted(team_info['Team ID']) == [6, 10]
+    events = sinks.load_table(filename, 'game_stats_events', output)
+    assert set(events['Player ID'].dropna()) <= set(player_info['Player ID'])
+
+@pytest.mark.parametrize('output', OUTPUTS)
+def test_chunks_with_different_columns_round_trip(tmp_path, output, game_feed):
+    # the first chunk of games has no coordinates, strength, GWG, or empty net values
+    plain = game_feed()
+    for play in plain['liveData']['plays']['allPlays']:
+        play['result'] = {'event': play['result']['event']}
+        play.pop('coordinates', None)
+    filename = str(tmp_path / OUTPUTS[output])
+    sink = sinks.open_sink(filename, output)
+    for game_number, feed in [('0001', plain), ('0002', game_feed())]:
+        columns = api.GameColumns()
+        columns.add_game(feed, '2015', '02', game_number)
+        main._write_game_stats(sink, main._game_frames(columns))
+    sink.close()
+
+    df = sinks.load_table(filename, 'game_stats_events', output)
+    assert {'x', 'y', 'Strength', 'GWG', 'Empty Net'}.issubset(df.columns)
+    assert len(df.columns) == 23
+    goals = df[(df['Event'] == 'Goal') & (df['Game Number'] == 2)]
+    assert goals['Strength'].tolist() == ['Even', 'Even', 'Even', 'Power Play']
+    assert df.loc[df['Game Number'] == 1, 'x'].isna().all()
+    if output == 'parquet':
+        import pyarrow.dataset as ds
+
+        # every chunk's file has the same columns whatever order the reader finds them in
+        fragments = ds.dataset(tmp_path / OUTPUTS[output] / 'game_stats_events', partitioning='hive').get_fragments()
+        assert len({frozenset(fragment.physical_schema.names) for fragment in fragments}) == 1
+
+
+def _write_games(filename, output, fetch, games):
+    sink = sinks.open_sink(filename, output)
+    columns = api.GameColumns()
+    for game_number, parsed in games:
+        columns.add_game(parsed, '2015', '02', game_number)
+    main._write_game_stats(sink, main._game_frames(columns), fetch)
+    sink.close()
+
+
+@pytest.mark.parametrize('output', OUTPUTS)
+def test_boxscore_rows_keep_the_rows_of_a_full_fetch(tmp_path, output, game_feed, monkeypatch):
+    monkeypatch.setattr(api, '_schedule_game', lambda *game: {'dateTime': '2015-10-07T23:00:00Z'})
+    feed = game_feed()
+    boxscore = api._partial_feed(feed['liveData']['boxscore'], 'boxscore', '2015', '02', '0001')
+    filename = str(tmp_path / OUTPUTS[output])
+    _write_games(filename, output, 'full', [('0001', feed)])
+    _write_games(filename, output, 'boxscore', [('0001', boxscore)])
+
+    teams = sinks.load_table(filename, 'game_stats_teams', output).sort_values('Team')
+    assert teams['Final Goals'].tolist() == [3, 2]
+    boxscore_teams = sinks.load_table(filename, 'game_stats_teams_boxscore', output).sort_values('Team')
+    assert boxscore_teams['Hits'].tolist() == [12, 12]
+    assert 'Final Goals' not in boxscore_teams or boxscore_teams['Final Goals'].isna().all()
+    assert len(sinks.load_table(filename, 'game_stats_players_boxscore', output)) == 6
+
+
+@pytest.mark.parametrize('output', OUTPUTS)
+def test_load_game_table_fills_in_partial_fetches(tmp_path, output, game_feed, monkeypatch):
+    monkeypatch.setattr(api, '_schedule_game', lambda *game: {'dateTime': '2015-10-07T23:00:00Z'})
+    feed = game_feed()
+    teams = feed['gameData']['teams']
+    boxscore = feed['liveData']['boxscore']
+    linescore = {'currentPeriod': 4, 'hasShootout': False, 'currentPeriodTimeRemaining': 'Final',
+                 'teams': {side: {'team': team, 'goals': 2 if side == 'home' else 1, 'shotsOnGoal': 20}
+                           for side, team in teams.items()}}
+    filename = str(tmp_path / OUTPUTS[output])
+    # game 1 is fetched in full, game 2 only has its boxscore and linescore
+    _write_games(filename, output, 'full', [('0001', feed)])
+    _write_games(filename, output, 'boxscore', [
+        (game_number, api._partial_feed(boxscore, 'boxscore', '2015', '02', game_number))
+        for game_number in ['0001', '0002']])
+    _write_games(filename, output, 'linescore',
+                 [('0002', api._partial_feed(linescore, 'linescore', '2015', '02', '0002'))])
+
+    df = sinks.load_game_table(filename, 'game_stats_teams', output).sort_values(['Game Number', 'Team'])
+    assert df['Game Number'].tolist() == [1, 1, 2, 2]
+    assert df['Hits'].tolist() == [12, 12, 12, 12]
+    assert df['Final Goals'].tolist() == [3, 2, 2, 1]
+    assert df['Final Period'].tolist() == [3, 3, 4, 4]
+
+    players = sinks.load_game_table(filename, 'game_stats_players', output, columns=['Game Number', 'Player'])
+    assert list(players.columns) == ['Game Number', 'Player']
+    assert players['Game Number'].value_counts().to_dict() == {1: 6, 2: 6}
+
+
+def test_read_table_merges_the_columns_of_every_file(tmp_path):
+    # files are read in name order, the first one is missing a column
+    path = tmp_path / 'games' / 'players'
+    path.mkdir(parents=True)
+    pd.DataFrame({'ID': [1], 'Player': ['A']}).to_parquet(path / 'a.parquet', index=False)
+    pd.DataFrame({'ID': [2], 'Player': ['B'], 'Shoots': ['L']}).to_parquet(path / 'b.parquet', index=False)
+
+    df = sinks.read_table(str(tmp_path / 'games'), 'players').sort_values('ID')
+    assert df['Shoots'].tolist()[1] == 'L'
+    assert pd.isna(df['Shoots'].tolist()[0])
+
+
+def test_sqlite_tables_are_indexed_for_the_dashboard(tmp_path):
+    filename = str(tmp_path / 'games.db')
+    _write(filename, 'sqlite', _teams([1], shots=20))
+    # columns added by later writes get their indexes too
+    _write(filename, 'sqlite', _teams([2], shots=20).assign(Home='Boston Bruins', Away='Toronto Maple Leafs'))
+
+    with sqlite3.connect(filename) as con:
+        assert con.execute('PRAGMA journal_mode').fetchone() == ('wal',)
+        indexes = {
+            name: [col for _, _, col in con.execute(f'PRAGMA index_info("{name}")')]
+            for _, name, *_ in con.execute('PRAGMA index_list(game_stats_teams)')
+        }
+    assert sorted(indexes.values()) == sorted(
+        [sinks.TABLES['game_stats_teams']['key']] + sinks.SQLITE_INDEXES['game_stats_teams'])
@@ -0,0 +1,59 @@
+import pytest
+
+import telemetry
+
+FEED = 'https://statsapi.web.nhl.com/api/v1/game/2015020001/feed/live'
+
+
+@pytest.fixture(autouse=True)
+def metrics():
+    telemetry.reset()
+    yield
+    telemetry.reset()
+
+
+def test_requests_are_grouped_by_endpoint():
+    assert telemetry.endpoint(FEED) == '/api/v1/game/{id}/feed/live'
+    telemetry.observe_request(FEED, 0.2, 100)
+    telemetry.observe_request(FEED.replace('0001', '0002'), 3, 50, error=True)
+    telemetry.observe_request(FEED, 90)
+
+    stats = telemetry.snapshot()['requests']['/api/v1/game/{id}/feed/live']
+    assert (stats['count'], stats['errors'], stats['bytes']) == (3, 1, 150)
+    assert stats['buckets']['0.25'] == stats['buckets']['5'] == stats['buckets']['+Inf'] == 1
+    assert 'nhl_request_seconds_bucket{endpoint="/api/v1/game/{id}/feed/live",le="+Inf"} 3' in telemetry.prometheus()
+
+
+def test_worker_metrics_are_merged_into_the_parent():
+    telemetry.count('retries')
+    with telemetry.timer('parse'):
+        pass
+    telemetry.add_rows('game_stats_teams', 2)
+    # a worker process sends back what it recorded since its last collect
+    worker = telemetry.collect()
+    assert telemetry.snapshot()['counters'] == {}
+
+    telemetry.count('retries', 2)
+    telemetry.merge(worker)
+    telemetry.merge(worker)
+    metrics = telemetry.snapshot()
+    assert metrics['counters'] == {'retries': 4}
+    assert metrics['stages']['parse']['count'] == 2
+    assert metrics['rows'] == {'game_stats_teams': 4}
+
+
+def test_progress_is_printed_when_due(capsys, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(telemetry.time, 'time', lambda: now[0])
+    progress = telemetry.Progress('2015 games', 100)
+
+    progress.update(10)
+    assert capsys.readouterr().out == ''
+
+    now[0] += telemetry.PROGRESS_INTERVAL
+    progress.update(10)
+    assert capsys.readouterr().out == '2015 games: 20/100 (2.0/s, ETA 0:40)\n'
+
+    # the last update is always printed
+    progress.update(80)
+    assert capsys.readouterr().out == '2015 games: 100/100 (10.0/s, ETA 0:00)\n'
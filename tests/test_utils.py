@@ -0,0 +1,49 @@
+import os
+
+import pandas as pd
+
+import utils
+
+
+def test_clock_to_seconds():
+    seconds = utils.clock_to_seconds(pd.Series(['00:35', '12:04', '20:00', '1637:23', None, 'Final', '1:2:3']))
+    assert seconds.dtype == 'Int64'
+    assert seconds.tolist() == [35, 724, 1200, 98243, pd.NA, pd.NA, pd.NA]
+
+
+def test_seconds_to_clock():
+    clock = utils.seconds_to_clock(pd.Series([35, 724, 98243, 59.6, None]))
+    assert clock.tolist() == ['00:35', '12:04', '1637:23', '01:00', None]
+
+
+def test_clock_round_trip():
+    clock = pd.Series(['00:00', '05:09', '19:59', '65:00'])
+    assert utils.seconds_to_clock(utils.clock_to_seconds(clock)).tolist() == clock.tolist()
+
+
+def test_elapsed_seconds_widens_small_periods():
+    period = pd.Series([1, 2, 3, 4], dtype='int8')
+    seconds = pd.Series([10, 10, 10, 10], dtype='Int16')
+    assert utils.elapsed_seconds(period, seconds).tolist() == [10, 1210, 2410, 3610]
+
+
+def test_player_registry_reads_the_spreadsheet_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, '_player_registry', {})
+    xlsx = str(tmp_path / 'players.xlsx')
+    pd.DataFrame({'ID': [8471214, 8478402], 'Player': ['Alex Ovechkin', 'Connor McDavid']}).to_excel(xlsx, index=False)
+    reads = []
+    read_excel = pd.read_excel
+    monkeypatch.setattr(pd, 'read_excel', lambda *args, **kwargs: reads.append(args) or read_excel(*args, **kwargs))
+
+    assert utils.players_by_id(xlsx) == {8471214: 'Alex Ovechkin', 8478402: 'Connor McDavid'}
+    assert utils.players_by_name(xlsx)['Connor McDavid'] == 8478402
+    assert utils.load_player_ids(xlsx) == [8471214, 8478402]
+    assert utils.load_player_names(xlsx) == ['Alex Ovechkin', 'Connor McDavid']
+    assert len(reads) == 1
+
+    # a modified spreadsheet is read again
+    pd.DataFrame({'ID': [8471214], 'Player': ['Alex Ovechkin']}).to_excel(xlsx, index=False)
+    mtime = os.path.getmtime(xlsx) + 10
+    os.utime(xlsx, (mtime, mtime))
+    assert utils.players_by_id(xlsx) == {8471214: 'Alex Ovechkin'}
+    assert len(reads) == 2
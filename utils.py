@@ -1,5 +1,17 @@
+import datetime
+import os
+import threading
+
 import pandas as pd
 
+# spreadsheet of player names and ids created with main.write_player_ids
+PLAYERS_FILE = os.getcwd() + '/NHL_players.xlsx'
+# length of a regulation period, used to turn period clocks into seconds since the start of the game
+PERIOD_SECONDS = 20 * 60
+
+_player_registry = {}
+_player_registry_lock = threading.Lock()
+
 
 def convert_season(season):
     """
@@ -14,6 +26,18 @@ def convert_season(season):
     return int(f'{season}{season + 1}')
 
 
+def current_season():
+    """
+    Returns the starting year of the season currently being played, or the most recent season if
+    in the off-season. Seasons are treated as starting in September.
+
+    :return: Year of the start of the current season.
+    :rtype: int
+    """
+    today = datetime.date.today()
+    return today.year if today.month >= 9 else today.year - 1
+
+
 def get_season_list(start, stop):
     """
     Returns a list of the full season numbers from start to stop (inclusive).
@@ -35,6 +59,87 @@ def get_season_list(start, stop):
     return [f'{i}{i + 1}' for i in range(int(start), int(stop) + 1)]
 
 
+def clock_to_seconds(clock):
+    """
+    Converts a column of 'mm:ss' clock strings to integer seconds, parsing the whole column at once.
+    Missing or malformed clocks become <NA>.
+
+    Example:
+        clock_to_seconds(pd.Series(['00:35', '12:04', None])) will return
+        pd.Series([35, 724, <NA>], dtype='Int64')
+
+    :param clock: Column of 'mm:ss' strings.
+    :type clock: pd.Series
+    :return: Column of seconds.
+    :rtype: pd.Series
+    """
+    parts = clock.astype('string').str.extract(r'^(\d+):(\d{1,2})$')
+    minutes = pd.to_numeric(parts[0], errors='coerce')
+    seconds = pd.to_numeric(parts[1], errors='coerce')
+    return (minutes * 60 + seconds).astype('Int64')
+
+
+def seconds_to_clock(seconds):
+    """
+    Converts a column of seconds to 'mm:ss' clock strings, the reverse of clock_to_seconds.
+    Minutes aren't wrapped into hours so season totals look like the api's e.g. '1637:23' or '00:45'.
+
+    :param seconds: Column of seconds.
+    :type seconds: pd.Series
+    :return: Column of 'mm:ss' strings, missing seconds stay missing.
+    :rtype: pd.Series
+    """
+    seconds = pd.to_numeric(seconds, errors='coerce').round().astype('Int64')
+    clock = (seconds // 60).astype('string').str.zfill(2) + ':' + (seconds % 60).astype('string').str.zfill(2)
+    return clock.astype(object).where(seconds.notna(), None)
+
+
+def elapsed_seconds(period, seconds):
+    """
+    Converts seconds into a period to seconds since the start of the game.
+    Every period before the given one is counted as a full PERIOD_SECONDS period.
+
+    :param period: Column of period numbers.
+    :type period: pd.Series
+    :param seconds: Column of seconds into the period e.g. from clock_to_seconds.
+    :type seconds: pd.Series
+    :return: Column of seconds since the start of the game.
+    :rtype: pd.Series
+    """
+    # widen first, periods can be stored as small ints that would overflow
+    period = pd.to_numeric(period, errors='coerce').astype('Int64')
+    return ((period - 1) * PERIOD_SECONDS + seconds).astype('Int64')
+
+
+def add_clock_seconds(df, clocks):
+    """
+    Adds an integer seconds column next to every 'mm:ss' clock column in a DataFrame, plus a seconds since
+    the start of the game column for clocks that are measured from the start of their period.
+    Originals are kept as they are. DataFrames missing the clock columns are returned unchanged.
+
+    Example:
+        add_clock_seconds(event_df, {'Period Time': ('Period Seconds', 'Game Seconds')})
+        adds 'Period Seconds' and 'Game Seconds' columns after 'Period Time'.
+
+    :param df: Pandas DataFrame with a 'Period' column.
+    :type df: pd.DataFrame
+    :param clocks: Clock column name to (seconds column name, game seconds column name or None).
+    :type clocks: dict
+    :return: DataFrame with the seconds columns added.
+    :rtype: pd.DataFrame
+    """
+    df = df.copy()
+    for clock, (seconds_col, game_col) in clocks.items():
+        if clock not in df.columns:
+            continue
+        seconds = clock_to_seconds(df[clock])
+        position = df.columns.get_loc(clock) + 1
+        df.insert(position, seconds_col, seconds)
+        if game_col is not None and 'Period' in df.columns:
+            df.insert(position + 1, game_col, elapsed_seconds(df['Period'], seconds))
+    return df
+
+
 def update_cols(df, first_order):
     """
     Helper function to re-order dataframe columns. Useful for ordering before exporting and writing data.
@@ -53,7 +158,8 @@ def update_cols(df, first_order):
             cols.remove(col)
         except ValueError:
             pass
-    cols = first_order + cols
+    # empty scrapes e.g. every game already checkpointed have none of the columns
+    cols = [col for col in first_order if col in df.columns] + cols
     df = df[cols]
     return df
 
@@ -183,23 +289,47 @@ def rename_cols(df):
     return df
 
 
+def player_registry(xlsx):
+    """
+    Load a player spreadsheet once per process and return the cached player lookups.
+    The spreadsheet is only read again if the file has been modified since it was last loaded.
+    Returned objects are shared between callers and should not be modified.
+
+    :param xlsx: Path to a spreadsheet with 'ID' and 'Player' columns.
+    :type xlsx: str
+    :return: Player DataFrame, dict of player id to name, and dict of player name to id.
+    :rtype: (pd.DataFrame, dict, dict)
+    """
+    mtime = os.path.getmtime(xlsx)
+    with _player_registry_lock:
+        entry = _player_registry.get(xlsx)
+        if entry is None or entry['mtime'] != mtime:
+            df = pd.read_excel(xlsx)
+            entry = {
+                'mtime': mtime,
+                'df': df,
+                'by_id': df.set_index('ID')['Player'].to_dict(),
+                'by_name': df.set_index('Player')['ID'].to_dict(),
+            }
+            _player_registry[xlsx] = entry
+    return entry['df'], entry['by_id'], entry['by_name']
+
+
 def load_player_ids(xlsx):
-    df = pd.read_excel(xlsx)
+    df, _, _ = player_registry(xlsx)
     return df['ID'].values.tolist()
 
 
 def load_player_names(xlsx):
-    df = pd.read_excel(xlsx)
+    df, _, _ = player_registry(xlsx)
     return df['Player'].values.tolist()
 
 
 def players_by_id(xlsx):
-    df = pd.read_excel(xlsx)
-    ids = df.set_index('ID')['Player'].to_dict()
+    _, ids, _ = player_registry(xlsx)
     return ids
 
 
 def players_by_name(xlsx):
-    df = pd.read_excel(xlsx)
-    names = df.set_index('Player')['ID'].to_dict()
+    _, _, names = player_registry(xlsx)
     return names